@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+検索経路のインデックス有無による実行計画・レイテンシ比較ベンチマーク
+
+使用方法:
+    python bench_indexes.py [--students 10000] [--exams 60] [--repeat 5]
+
+DATABASE_URL のデータベースに一時スキーマ bench_indexes を作成し、
+合成データでインデックス追加前後の実行計画と実行時間を比較した後、スキーマを削除します。
+（本番テーブルには触れません）
+"""
+import argparse
+import json
+import statistics
+from sqlalchemy import text
+from flaskr import create_app, db
+
+SCHEMA = "bench_indexes"
+
+DDL = [
+    "CREATE TABLE students (student_id integer PRIMARY KEY, name varchar NOT NULL)",
+    "CREATE TABLE exams (exam_id integer PRIMARY KEY, exam_code integer NOT NULL,"
+    " exam_year integer NOT NULL, exam_type varchar NOT NULL)",
+    "CREATE TABLE exam_results (result_id integer PRIMARY KEY, student_id integer NOT NULL, exam_id integer NOT NULL)",
+    "CREATE TABLE subject_scores (score_id integer PRIMARY KEY, result_id integer NOT NULL,"
+    " subject_code integer NOT NULL, score integer NOT NULL, deviation_value numeric(5,2) NOT NULL)",
+    "CREATE TABLE universities (university_id integer PRIMARY KEY, university_name varchar NOT NULL UNIQUE)",
+    "CREATE TABLE faculties (faculty_id integer PRIMARY KEY, university_id integer NOT NULL, faculty_name varchar NOT NULL)",
+    "CREATE TABLE departments (department_id integer PRIMARY KEY, faculty_id integer NOT NULL, department_name varchar NOT NULL)",
+    "CREATE TABLE exam_judgements (judgement_id integer PRIMARY KEY, result_id integer NOT NULL,"
+    " preference_order integer, department_id integer, judgement_kyote varchar)",
+]
+
+DATA = [
+    "INSERT INTO students SELECT s, 'student' || s FROM generate_series(1, :students) s",
+    "INSERT INTO exams SELECT e, e % 40 + 1, 2000 + e / 40, CASE WHEN e % 2 = 0 THEN '共テ' ELSE '記述' END"
+    " FROM generate_series(1, :exams) e",
+    # 各模試を生徒の約3割が受験
+    "INSERT INTO exam_results SELECT row_number() OVER (), s, e"
+    " FROM generate_series(1, :exams) e, generate_series(1, :students) s WHERE random() < 0.3",
+    "INSERT INTO subject_scores SELECT row_number() OVER (), r.result_id, 100 + k, (random() * 100)::int,"
+    " (30 + random() * 45)::numeric(5,2) FROM exam_results r, generate_series(1, 6) k",
+    "INSERT INTO universities SELECT u, 'univ' || u FROM generate_series(1, 800) u",
+    "INSERT INTO faculties SELECT row_number() OVER (), u, 'fac' || f FROM generate_series(1, 800) u, generate_series(1, 8) f",
+    "INSERT INTO departments SELECT row_number() OVER (), f, 'dep' || d"
+    " FROM generate_series(1, 6400) f, generate_series(1, 5) d",
+    "INSERT INTO exam_judgements SELECT row_number() OVER (), r.result_id, p, 1 + (random() * 31999)::int, 'A'"
+    " FROM exam_results r, generate_series(1, 5) p",
+]
+
+# マイグレーション add_lookup_indexes と同じ定義
+INDEXES = [
+    "ALTER TABLE faculties ADD CONSTRAINT uq_faculties_university_id_faculty_name UNIQUE (university_id, faculty_name)",
+    "ALTER TABLE departments ADD CONSTRAINT uq_departments_faculty_id_department_name UNIQUE (faculty_id, department_name)",
+    "ALTER TABLE exams ADD CONSTRAINT uq_exams_exam_code_exam_year_exam_type UNIQUE (exam_code, exam_year, exam_type)",
+    "ALTER TABLE exam_results ADD CONSTRAINT uq_exam_results_student_id_exam_id UNIQUE (student_id, exam_id)",
+    "ALTER TABLE subject_scores ADD CONSTRAINT uq_subject_scores_result_id_subject_code UNIQUE (result_id, subject_code)",
+    "ALTER TABLE exam_judgements ADD CONSTRAINT uq_exam_judgements_result_id_preference_order"
+    " UNIQUE (result_id, preference_order)",
+    "CREATE INDEX ix_exam_results_exam_id ON exam_results (exam_id)",
+]
+
+# (名前, SQL) — 各サービスで実際に発行される絞り込みに相当
+QUERIES = [
+    ("模試詳細: exam_results(exam_id)",
+     "SELECT r.student_id, j.preference_order FROM exam_results r"
+     " JOIN exam_judgements j ON j.result_id = r.result_id WHERE r.exam_id = :exam_id"),
+    ("生徒詳細: exam_results(student_id)",
+     "SELECT result_id FROM exam_results WHERE student_id = :student_id"),
+    ("生徒詳細: subject_scores(result_id)",
+     "SELECT * FROM subject_scores WHERE result_id = ANY(:result_ids)"),
+    ("生徒詳細: exam_judgements(result_id)",
+     "SELECT * FROM exam_judgements WHERE result_id = ANY(:result_ids)"),
+    ("インポート: exam_results(student_id, exam_id)",
+     "SELECT result_id FROM exam_results WHERE student_id = :student_id AND exam_id = :exam_id"),
+    ("インポート: exams(exam_code, exam_year, exam_type)",
+     "SELECT exam_id FROM exams WHERE exam_code = :exam_code AND exam_year = :exam_year AND exam_type = :exam_type"),
+    ("インポート: faculties(university_id, faculty_name)",
+     "SELECT faculty_id FROM faculties WHERE university_id = 400 AND faculty_name = 'fac3'"),
+    ("インポート: departments(faculty_id, department_name)",
+     "SELECT department_id FROM departments WHERE faculty_id = 3200 AND department_name = 'dep2'"),
+]
+
+
+def _plan_summary(plan):
+    """実行計画の走査ノード（Seq Scan / Index Scan 等）を列挙"""
+    nodes = []
+
+    def walk(node):
+        if "Scan" in node["Node Type"]:
+            nodes.append(f"{node['Node Type']}({node.get('Relation Name', '')})")
+        for child in node.get("Plans", []):
+            walk(child)
+    walk(plan)
+    return ", ".join(nodes)
+
+
+def _measure(conn, sql, params, repeat):
+    times, summary = [], ""
+    for _ in range(repeat):
+        raw = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()
+        plan = raw[0] if isinstance(raw, list) else json.loads(raw)[0]
+        times.append(plan["Execution Time"])
+        summary = _plan_summary(plan["Plan"])
+    return statistics.median(times), summary
+
+
+def _run_queries(conn, params, repeat):
+    return {name: _measure(conn, sql, params, repeat) for name, sql in QUERIES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--exams", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context(), db.engine.connect() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        try:
+            print("合成データを作成中...")
+            for stmt in DDL:
+                conn.execute(text(stmt))
+            for stmt in DATA:
+                conn.execute(text(stmt), {"students": args.students, "exams": args.exams})
+            conn.execute(text("ANALYZE"))
+            counts = {
+                t: conn.execute(text(f"SELECT COUNT(*) FROM {t}")).scalar()
+                for t in ("exam_results", "subject_scores", "exam_judgements", "departments")
+            }
+            print("件数:", counts)
+
+            sid = args.students // 2
+            result_ids = [r for (r,) in conn.execute(
+                text("SELECT result_id FROM exam_results WHERE student_id = :sid"), {"sid": sid}
+            )]
+            exam_id, exam_code, exam_year, exam_type = conn.execute(
+                text("SELECT exam_id, exam_code, exam_year, exam_type FROM exams WHERE exam_id = :e"),
+                {"e": args.exams // 2},
+            ).one()
+            params = {
+                "exam_id": exam_id, "student_id": sid, "result_ids": result_ids,
+                "exam_code": exam_code, "exam_year": exam_year, "exam_type": exam_type,
+            }
+
+            before = _run_queries(conn, params, args.repeat)
+            for stmt in INDEXES:
+                conn.execute(text(stmt))
+            conn.execute(text("ANALYZE"))
+            after = _run_queries(conn, params, args.repeat)
+
+            print()
+            print(f"{'クエリ':<48} {'追加前(ms)':>10} {'追加後(ms)':>10} {'倍率':>8}")
+            for name, _ in QUERIES:
+                (t0, p0), (t1, p1) = before[name], after[name]
+                ratio = t0 / t1 if t1 else float("inf")
+                print(f"{name:<48} {t0:>10.3f} {t1:>10.3f} {ratio:>7.1f}x")
+                print(f"    追加前: {p0}")
+                print(f"    追加後: {p1}")
+        finally:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,24 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
+import logging
 import os
 import pathlib
+from .db_engine import engine_options
+from . import query_metrics, metrics
 
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
 
-def create_app():
+def create_app(import_process=False):
+    """import_process: インポート専用のプロセス（process モードの子プロセス・import_worker.py）用に作る場合は True"""
     load_dotenv(dotenv_path=pathlib.Path(__file__).resolve().parents[1] / ".env", override=True)
+    # アプリのログ（インポートの計測結果・遅いリクエストなど）を標準エラーへ出す（既にハンドラーがあれば何もしない）
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
     app = Flask(__name__)
 
     db_url = os.getenv("DATABASE_URL", "").strip()
@@ -23,6 +32,8 @@ def create_app():
 
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # コネクションプールの設定（DB_POOL_SIZE 等の環境変数、未指定はワーカー数・スレッド数から自動で決める）
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(db_url, import_process=import_process)
     
     # JWT設定
     app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
@@ -31,12 +42,17 @@ def create_app():
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    # リクエストごとの SQL 件数・DB 時間の計測（Server-Timing ヘッダー・遅いリクエストのログ）
+    query_metrics.init_app(app, db)
+    # Prometheus 形式のメトリクス（GET /metrics）
+    metrics.init_app(app)
     # CORS設定: Authorizationヘッダーを許可
     # 開発環境ではすべてのオリジンからアクセスを許可
     CORS(
         app, 
         supports_credentials=True, 
         allow_headers=["Content-Type", "Authorization"],
+        expose_headers=["X-Total-Count", "X-Next-Cursor", "X-Exam-Year"],
         origins="*"  # 開発環境用（本番環境では適切なオリジンを指定）
     )
     
@@ -45,11 +61,15 @@ def create_app():
     from .routes.exams import exams_bp
     from .routes.imports import imports_bp
     from .routes.auth import auth_bp
+    from .routes.metrics import metrics_bp, exposition_bp
 
     app.register_blueprint(students_bp, url_prefix="/api")
     app.register_blueprint(exams_bp, url_prefix="/api")
     app.register_blueprint(imports_bp, url_prefix="/api")
     app.register_blueprint(auth_bp, url_prefix="/api")
+    app.register_blueprint(metrics_bp, url_prefix="/api")
+    if metrics.ENABLED:
+        app.register_blueprint(exposition_bp)
     
     # 開発環境でのみseedエンドポイントを有効化
     if os.getenv("FLASK_ENV") == "development" or os.getenv("ENABLE_SEED") == "true":
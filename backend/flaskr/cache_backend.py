@@ -0,0 +1,385 @@
+# backend/flaskr/cache_backend.py
+# 参照データ（模試・科目・大学マスタ等）のキャッシュバックエンド
+# - CACHE_BACKEND で保存先を選ぶ
+#     local: プロセス内 LRU（ワーカーごとに保持）
+#     mmap:  同一ホストの全ワーカーで共有するファイル（/dev/shm 等）。世代番号は mmap した固定長テーブル
+#     redis: Redis 互換サーバー（redis パッケージが必要。テストでは fakeredis 等のクライアントを渡せる）
+# - 値のキーには依存データの世代番号（data_versions）を含める。インポート等で bump_data_version した
+#   トランザクションがコミットされると、新しい世代番号を共有ストアへ書き込む（バージョンスタンプ）ため、
+#   全ワーカーが次回参照時から新しいキーを使い、古い値は二度と読まれない
+# - 共有ストアの世代番号は CACHE_STAMP_RESYNC 秒ごとに DB と突き合わせる（書き込み漏れ・ストア再起動対策）
+# - キャッシュの読み書きに失敗しても DB から読み直して処理を続ける
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from . import metrics
+from .services import data_version
+
+logger = logging.getLogger(__name__)
+
+BACKEND = os.getenv("CACHE_BACKEND", "local").strip().lower()
+# local: プロセス内 LRU の最大エントリ数 / mmap: 保持するファイル数の上限
+CACHE_SIZE = int(os.getenv("CACHE_SIZE", "128"))
+# local: 世代番号を DB から読み直す間隔（秒）。他ワーカーでのインポートはこの時間内に反映される
+VERSION_TTL = float(os.getenv("CACHE_VERSION_TTL", "2"))
+# mmap / redis: 共有ストアの世代番号を DB と突き合わせる間隔（秒）
+STAMP_RESYNC = float(os.getenv("CACHE_STAMP_RESYNC", "30"))
+MMAP_DIR = os.getenv("CACHE_MMAP_DIR") or (
+    "/dev/shm/manavis_cache" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "manavis_cache")
+)
+REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "manavis:")
+
+
+class LocalBackend:
+    """プロセス内 LRU（値はオブジェクトのまま保持）"""
+
+    shared = False
+
+    def __init__(self, max_entries=CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class MmapBackend:
+    """
+    同一ホストのワーカー間で共有するストア
+    - 世代番号: stamps ファイルを mmap した固定長テーブル（名前 32 バイト + 番号 8 バイト）を flock で排他して読み書き
+      （flock は同じファイルを開いた同一プロセス内のスレッド同士を排他しないため、スレッド間はロックを併用する）
+    - 値: キーごとのファイル（pickle）。一時ファイルへ書いてから rename するため読み手が書きかけを見ることはない
+    - 世代番号が進んだら古い世代の値ファイルは削除する
+    """
+
+    shared = True
+    STAMP_SLOTS = 64
+    _slot = struct.Struct("<32sq")
+
+    def __init__(self, directory=MMAP_DIR, max_entries=CACHE_SIZE):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        size = self.STAMP_SLOTS * self._slot.size
+        # flock はオープンしたファイル単位のため、プロセスごとに開き直す（get_backend 参照）
+        self._fd = os.open(os.path.join(directory, "stamps"), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._stamps = mmap.mmap(self._fd, size)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self, operation):
+        with self._thread_lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _value_path(self, key):
+        return os.path.join(self.directory, "v-" + hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._value_path(key), "rb") as f:
+                return pickle.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def set(self, key, value):
+        path = self._value_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        os.replace(tmp, path)
+        self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._value_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _value_files(self):
+        with os.scandir(self.directory) as it:
+            return [e for e in it if e.name.startswith("v-") and not e.name.endswith(".tmp")]
+
+    def _evict(self):
+        files = self._value_files()
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda e: e.stat().st_mtime)
+        for e in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(e.path)
+            except FileNotFoundError:
+                pass
+
+    def _read_slots(self):
+        for i in range(self.STAMP_SLOTS):
+            raw, version = self._slot.unpack_from(self._stamps, i * self._slot.size)
+            yield i, raw.rstrip(b"\0").decode(), version
+
+    def get_stamps(self, names):
+        with self._locked(fcntl.LOCK_SH):
+            found = {name: version for _, name, version in self._read_slots() if name}
+        return tuple(found.get(name) for name in names)
+
+    def publish_stamps(self, stamps):
+        """世代番号を書き込む（既存より大きい場合のみ）。いずれかが進んだら True"""
+        changed = False
+        with self._locked(fcntl.LOCK_EX):
+            slots = {name: (i, version) for i, name, version in self._read_slots() if name}
+            free = [i for i, name, _ in self._read_slots() if not name]
+            for name, version in stamps.items():
+                if name in slots:
+                    i, current = slots[name]
+                    if current >= version:
+                        continue
+                elif free:
+                    i = free.pop(0)
+                else:
+                    raise RuntimeError("世代番号テーブルに空きがありません")
+                self._slot.pack_into(self._stamps, i * self._slot.size, name.encode(), version)
+                changed = True
+        if changed:
+            for e in self._value_files():
+                try:
+                    os.remove(e.path)
+                except FileNotFoundError:
+                    pass
+        return changed
+
+
+class RedisBackend:
+    """
+    Redis 互換サーバー上のストア
+    - client は redis.Redis 互換のオブジェクト（get / set / delete / mget / transaction を使う）
+    - 値は VALUE_TTL 秒で失効させ、古い世代のキーは自然に消える
+    """
+
+    shared = True
+    VALUE_TTL = 24 * 60 * 60
+
+    def __init__(self, client, prefix=KEY_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url=REDIS_URL, prefix=KEY_PREFIX):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis には redis パッケージが必要です（pip install redis）") from e
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def _value_key(self, key):
+        return f"{self.prefix}v:{key}"
+
+    def _stamp_key(self, name):
+        return f"{self.prefix}stamp:{name}"
+
+    def get(self, key):
+        raw = self.client.get(self._value_key(key))
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(self._value_key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=self.VALUE_TTL)
+
+    def delete(self, key):
+        self.client.delete(self._value_key(key))
+
+    def get_stamps(self, names):
+        raw = self.client.mget([self._stamp_key(name) for name in names])
+        return tuple(None if v is None else int(v) for v in raw)
+
+    def publish_stamps(self, stamps):
+        """世代番号を書き込む（既存より大きい場合のみ、WATCH で競合を検知して再試行）。いずれかが進んだら True"""
+        changed = False
+        for name, version in stamps.items():
+            key = self._stamp_key(name)
+
+            def raise_stamp(pipe):
+                current = pipe.get(key)
+                if current is not None and int(current) >= version:
+                    return False
+                pipe.multi()
+                pipe.set(key, version)
+                return True
+
+            changed |= self.client.transaction(raise_stamp, key, value_from_callable=True)
+        return changed
+
+
+def _create_backend():
+    if BACKEND == "local":
+        return LocalBackend()
+    if BACKEND == "mmap":
+        return MmapBackend()
+    if BACKEND == "redis":
+        return RedisBackend.from_url()
+    raise RuntimeError(f"CACHE_BACKEND の値が不正です: {BACKEND}")
+
+
+_lock = threading.Lock()
+_backend = None
+_backend_pid = None
+_synced = {}   # 依存データ名タプル -> (確認時刻, 世代番号タプル)
+_values = {}   # 値の名前 -> (キー, 値)  共有ストアから読んだ値のプロセス内コピー
+
+
+def get_backend():
+    """このプロセスのバックエンド（fork 後のワーカーでは作り直す）"""
+    global _backend, _backend_pid
+    pid = os.getpid()
+    if _backend is None or _backend_pid != pid:
+        with _lock:
+            if _backend is None or _backend_pid != pid:
+                _backend = _create_backend()
+                _backend_pid = pid
+                _synced.clear()
+                _values.clear()
+    return _backend
+
+
+def set_backend(backend):
+    """バックエンドを差し替える（RedisBackend にテスト用クライアントを渡す場合など）"""
+    global _backend, _backend_pid
+    with _lock:
+        _backend = backend
+        _backend_pid = os.getpid()
+        _synced.clear()
+        _values.clear()
+
+
+def current_versions(names):
+    """依存データの世代番号タプル（names の順）"""
+    names = tuple(names)
+    backend = get_backend()
+    now = time.monotonic()
+    memo = _synced.get(names)
+    if not backend.shared:
+        if memo is not None and now - memo[0] < VERSION_TTL:
+            return memo[1]
+    elif memo is not None and now - memo[0] < STAMP_RESYNC:
+        try:
+            stamps = backend.get_stamps(names)
+        except Exception:
+            logger.exception("キャッシュの世代番号を取得できませんでした")
+            stamps = None
+        # 未登録（ストア再起動直後など）は DB と突き合わせる
+        if stamps is not None and None not in stamps:
+            return stamps
+
+    versions = data_version.get_data_versions(names)
+    if backend.shared:
+        try:
+            backend.publish_stamps(dict(zip(names, versions)))
+        except Exception:
+            logger.exception("キャッシュの世代番号を書き込めませんでした")
+    _synced[names] = (now, versions)
+    return versions
+
+
+def _value_key(name, depends):
+    return name + ":" + ":".join(str(v) for v in current_versions(depends))
+
+
+def cached_value(name, depends, loader):
+    """
+    depends（data_versions 上の名前）の世代番号単位でキャッシュした値を返す
+    - 無ければ loader() で DB から読み込んで保存する（値は変更しないこと）
+    """
+    key = _value_key(name, depends)
+    memo = _values.get(name)
+    if memo is not None and memo[0] == key:
+        metrics.CACHE_REQUESTS.labels("value", "hit").inc()
+        return memo[1]
+    backend = get_backend()
+    try:
+        value = backend.get(key)
+    except Exception:
+        logger.exception("キャッシュを読み込めませんでした: %s", key)
+        value = None
+    if value is None:
+        metrics.CACHE_REQUESTS.labels("value", "miss").inc()
+        value = loader()
+        store_value(name, depends, value, key=key)
+    else:
+        metrics.CACHE_REQUESTS.labels("value", "hit").inc()
+        _values[name] = (key, value)
+    return value
+
+
+def store_value(name, depends, value, key=None):
+    """現在の世代番号で値を保存する（コミット後に自プロセスで組み立てた値を共有する場合など）"""
+    key = key or _value_key(name, depends)
+    try:
+        get_backend().set(key, value)
+    except Exception:
+        logger.exception("キャッシュへ書き込めませんでした: %s", key)
+    _values[name] = (key, value)
+
+
+def invalidate_value(name, depends):
+    """現在の世代番号の値を破棄し、次回参照時に読み込み直させる"""
+    key = _value_key(name, depends)
+    _values.pop(name, None)
+    try:
+        get_backend().delete(key)
+    except Exception:
+        logger.exception("キャッシュを削除できませんでした: %s", key)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_versions(session):
+    """bump_data_version したトランザクションのコミット後、新しい世代番号を共有ストアへ書き込む"""
+    bumped = session.info.pop(data_version.PENDING_VERSIONS_KEY, None)
+    if not bumped:
+        return
+    backend = get_backend()
+    if backend.shared:
+        try:
+            backend.publish_stamps(bumped)
+        except Exception:
+            logger.exception("キャッシュの世代番号を書き込めませんでした")
+    # 自プロセスは次回参照時に読み直す
+    _synced.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_versions(session):
+    session.info.pop(data_version.PENDING_VERSIONS_KEY, None)
@@ -0,0 +1,212 @@
+# backend/flaskr/db_engine.py
+# SQLAlchemy エンジン（コネクションプール）の設定と、プールからの接続取得の待ち時間の計測
+# - 設定は環境変数から読み、未指定のプールサイズはワーカーのスレッド数・インポートのスレッド数から決める
+# - DB_MAX_CONNECTIONS（アプリ全体で使ってよい接続数）を指定すると、全ワーカープロセスの合計がそれを超えないように割り当てる
+# - DB_POOLER=pgbouncer では外部のコネクションプーラーに任せ、アプリ側ではプールしない（NullPool）
+# - 接続の取得待ち時間はプロセスごとに集計し、pool_stats() で返す
+import bisect
+import logging
+import os
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, QueuePool
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name, "").strip()
+    return int(value) if value else default
+
+
+def _env_bool(name, default):
+    value = os.getenv(name, "").strip().lower()
+    return default if not value else value in ("1", "true", "yes", "on")
+
+
+# プールの設定（未指定の DB_POOL_SIZE / DB_MAX_OVERFLOW は自動で決める）
+POOL_SIZE = _env_int("DB_POOL_SIZE")
+MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW")
+# API サーバーの全ワーカープロセスとインポート用の別プロセスで使ってよい接続数（マネージド PostgreSQL の上限から管理用の分を引いた値など）
+MAX_CONNECTIONS = _env_int("DB_MAX_CONNECTIONS")
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# 接続を使い回す上限（秒）。サーバー・LB 側のアイドル切断より短くする
+POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+# 取得時に接続の生存を確認する（アイドル後の切断を検知して張り直す）
+POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+# 1文あたりの実行時間の上限（ミリ秒、0 で無制限）
+STATEMENT_TIMEOUT = _env_int("DB_STATEMENT_TIMEOUT", 0)
+# none: アプリ側でプールする / pgbouncer: 外部プーラー経由（アプリ側はプールしない）
+POOLER = os.getenv("DB_POOLER", "none").strip().lower()
+
+# インポート1件が同時に使う接続数（本体・進捗更新・heartbeat）
+IMPORT_JOB_CONNECTIONS = 3
+
+# 取得待ち時間の度数分布の区切り（秒）
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _process_concurrency():
+    """1プロセスで同時に接続を使いうる数（リクエストのスレッド + thread モードのインポート1件あたり IMPORT_JOB_CONNECTIONS）"""
+    worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+    threads = _env_int("GUNICORN_THREADS", 4) if worker_class == "gthread" else 1
+    # process / external モードのインポートは別プロセス（そのプロセスのプールを使う）
+    import_workers = _env_int("IMPORT_JOB_WORKERS", 1) if os.getenv("IMPORT_JOB_MODE", "process") == "thread" else 0
+    return threads + IMPORT_JOB_CONNECTIONS * import_workers
+
+
+def _import_process_connections(workers):
+    """
+    DB_MAX_CONNECTIONS から先に差し引く、インポート用の別プロセスが使う接続数
+    - process: API のワーカープロセスごとに IMPORT_JOB_WORKERS 個の子プロセス
+    - external: import_worker.py を IMPORT_JOB_WORKERS 個起動する想定
+    """
+    mode = os.getenv("IMPORT_JOB_MODE", "process")
+    import_workers = _env_int("IMPORT_JOB_WORKERS", 1)
+    if mode == "process":
+        return IMPORT_JOB_CONNECTIONS * import_workers * workers
+    if mode == "external":
+        return IMPORT_JOB_CONNECTIONS * import_workers
+    return 0
+
+
+def pool_sizing():
+    """
+    (pool_size, max_overflow) を返す
+    - 既定: pool_size = 同時に使いうる接続数、max_overflow = 同数（ストリーミング等の一時的な超過用）
+    - DB_MAX_CONNECTIONS 指定時: インポート用の別プロセスの分を差し引き、ワーカープロセス数で割った値を1プロセスの上限にする
+    """
+    need = _process_concurrency()
+    pool_size = POOL_SIZE if POOL_SIZE is not None else need
+    max_overflow = MAX_OVERFLOW if MAX_OVERFLOW is not None else need
+    if MAX_CONNECTIONS:
+        workers = max(1, _env_int("GUNICORN_WORKERS", 1))
+        budget = MAX_CONNECTIONS - _import_process_connections(workers)
+        if budget < workers:
+            logger.warning("DB_MAX_CONNECTIONS=%d ではインポート用のプロセスの分を除くと API のワーカーに割り当てる接続が足りません", MAX_CONNECTIONS)
+        per_process = max(1, budget // workers)
+        pool_size = min(pool_size, per_process)
+        max_overflow = max(0, min(max_overflow, per_process - pool_size))
+    return pool_size, max_overflow
+
+
+class _PoolWaitStats:
+    """プロセス内の接続取得の待ち時間の集計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_sum = 0.0
+            self.wait_max = 0.0
+            self.buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def observe(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_sum += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.buckets[bisect.bisect_left(WAIT_BUCKETS, seconds)] += 1
+        metrics.POOL_WAIT_SECONDS.observe(seconds)
+
+    def timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+        metrics.POOL_TIMEOUTS.inc()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_sum": self.wait_sum,
+                "wait_seconds_max": self.wait_max,
+                # 上限（秒、最後は None = 上限なし）ごとの件数（累積ではない）
+                "wait_seconds_buckets": [
+                    [le, count] for le, count in zip((*WAIT_BUCKETS, None), self.buckets)
+                ],
+            }
+
+
+wait_stats = _PoolWaitStats()
+
+
+class _TimedPoolMixin:
+    """Pool.connect() の所要時間（空き待ち・新規接続・pre-ping を含む）を記録する"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            # 空き待ちのタイムアウト
+            wait_stats.timed_out()
+            raise
+        wait_stats.observe(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+def engine_options(db_url, import_process=False):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS に渡す設定（PostgreSQL 以外は既定のまま）
+    - import_process: インポート専用のプロセス（process モードの子プロセス・import_worker.py）。
+      DB_MAX_CONNECTIONS で差し引いた分に収まるよう、プールを IMPORT_JOB_CONNECTIONS 本に固定する
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() != "postgresql":
+        return {}
+
+    options = {}
+    if POOLER == "pgbouncer":
+        # トランザクション単位のプーラーでは接続をまたいだ状態（SET など）が別クライアントへ漏れるため、
+        # アプリ側ではプールせず、接続ごとの設定も送らない（statement_timeout はロール・プーラー側で設定する）
+        options["poolclass"] = TimedNullPool
+        if STATEMENT_TIMEOUT:
+            logger.warning("DB_POOLER=pgbouncer では DB_STATEMENT_TIMEOUT を使用しません（ロールまたはプーラー側で設定してください）")
+        return options
+
+    pool_size, max_overflow = (IMPORT_JOB_CONNECTIONS, 0) if import_process else pool_sizing()
+    options.update({
+        "poolclass": TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    })
+    if STATEMENT_TIMEOUT:
+        # 接続時のパラメーターで設定する（ロールバック等で解除されない）
+        options["connect_args"] = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT}"}
+    return options
+
+
+def pool_stats(engine):
+    """このプロセスのプールの状態と接続取得の待ち時間"""
+    pool = engine.pool
+    stats = {"pid": os.getpid(), "pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "pool_size": pool.size(),
+            # engine_options() でプールに渡した設定値
+            "max_overflow": pool_sizing()[1],
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(0, pool.overflow()),
+        })
+    stats.update(wait_stats.snapshot())
+    return stats
@@ -0,0 +1,113 @@
+# backend/flaskr/metrics.py
+# Prometheus 形式のメトリクス（GET /metrics）
+# - API: エンドポイントごとのレイテンシ・DB 時間・SQL 件数、コネクションプールの取得待ち、レスポンス／参照データのキャッシュのヒット率
+# - インポート: フェーズ（read / reshape / resolve / persist / rebuild）ごとの処理行数と所要時間、スキップした行数、ジョブの件数・所要時間
+# - PROMETHEUS_MULTIPROC_DIR を指定するとワーカープロセスごとの値をそのディレクトリのファイルに書き、
+#   /metrics はどのワーカーが応答しても全プロセスの合計を返す（gunicorn_config.py が既定値を設定し、起動時に空にする）
+# - PROMETHEUS_MULTIPROC_DIR は prometheus_client の import 前に環境変数で指定すること（.env では反映されない）
+import os
+import time
+from contextlib import contextmanager
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+
+# 秒の度数分布の区切り（リクエスト・DB 時間・接続の取得待ち）
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 1リクエストあたりの SQL 件数の区切り
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# インポート1件の所要時間の区切り（秒）
+IMPORT_SECONDS_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+REQUEST_SECONDS = Histogram(
+    "manavis_http_request_duration_seconds", "リクエストの処理時間",
+    ["method", "endpoint", "status"], buckets=SECONDS_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "manavis_http_request_db_seconds", "1リクエストあたりの SQL の実行時間の合計",
+    ["endpoint"], buckets=SECONDS_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "manavis_http_request_queries", "1リクエストあたりの SQL の件数",
+    ["endpoint"], buckets=QUERY_COUNT_BUCKETS,
+)
+POOL_WAIT_SECONDS = Histogram(
+    "manavis_db_pool_checkout_seconds", "コネクションプールからの接続の取得にかかった時間",
+    buckets=SECONDS_BUCKETS,
+)
+POOL_TIMEOUTS = Counter("manavis_db_pool_checkout_timeouts_total", "コネクションプールの空き待ちのタイムアウト")
+CACHE_REQUESTS = Counter(
+    "manavis_cache_requests_total", "キャッシュの参照（cache: response / value、result: hit / miss / not_modified）",
+    ["cache", "result"],
+)
+IMPORT_PHASE_ROWS = Counter(
+    "manavis_import_phase_rows_total", "インポートのフェーズごとの処理行数", ["kind", "phase"],
+)
+IMPORT_PHASE_SECONDS = Counter(
+    "manavis_import_phase_seconds_total", "インポートのフェーズごとの所要時間", ["kind", "phase"],
+)
+IMPORT_SKIPPED_ROWS = Counter(
+    "manavis_import_skipped_rows_total",
+    "インポートで取り込まなかった行（reason: student_not_found / parse_error / no_admission_date）",
+    ["kind", "reason"],
+)
+IMPORT_JOBS = Counter("manavis_import_jobs_total", "終了したインポートジョブ", ["kind", "status"])
+IMPORT_JOB_SECONDS = Histogram(
+    "manavis_import_job_duration_seconds", "インポートジョブの所要時間",
+    ["kind"], buckets=IMPORT_SECONDS_BUCKETS,
+)
+
+
+class _Phase:
+    """import_phase() のブロック内で処理行数（rows）を設定する"""
+
+    __slots__ = ("rows",)
+
+    def __init__(self):
+        self.rows = 0
+
+
+@contextmanager
+def import_phase(kind, phase):
+    """ブロックの所要時間と処理行数をインポートのフェーズとして記録する"""
+    p = _Phase()
+    start = time.perf_counter()
+    try:
+        yield p
+    finally:
+        IMPORT_PHASE_SECONDS.labels(kind, phase).inc(time.perf_counter() - start)
+        IMPORT_PHASE_ROWS.labels(kind, phase).inc(p.rows)
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _finish_request(response):
+    started = g.pop("metrics_started", None)
+    if started is not None:
+        REQUEST_SECONDS.labels(
+            request.method, request.endpoint or "(unmatched)", str(response.status_code)
+        ).observe(time.perf_counter() - started)
+    return response
+
+
+def render():
+    """(本文, Content-Type)。PROMETHEUS_MULTIPROC_DIR 指定時は全プロセスの値を合計する"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_app(app):
+    """リクエストのレイテンシを記録するフックを登録する（METRICS_ENABLED=false なら何もしない）"""
+    if not ENABLED:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -25,6 +25,9 @@ class ExamMaster(db.Model):
 
 class Exams(db.Model):
     __tablename__ = 'exams'
+    __table_args__ = (
+        db.UniqueConstraint('exam_code', 'exam_year', 'exam_type', name='uq_exams_exam_code_exam_year_exam_type'),
+    )
 
     exam_id = db.Column(db.Integer, primary_key=True)
     exam_code = db.Column(db.Integer, db.ForeignKey('exam_master.exam_code'), nullable=False)
@@ -36,6 +39,10 @@ class Exams(db.Model):
 
 class ExamResults(db.Model):
     __tablename__ = 'exam_results'
+    __table_args__ = (
+        db.UniqueConstraint('student_id', 'exam_id', name='uq_exam_results_student_id_exam_id'),
+        db.Index('ix_exam_results_exam_id', 'exam_id'),
+    )
 
     result_id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('students.student_id'), nullable=False)
@@ -54,6 +61,9 @@ class SubjectMaster(db.Model):
 
 class SubjectScores(db.Model):
     __tablename__ = 'subject_scores'
+    __table_args__ = (
+        db.UniqueConstraint('result_id', 'subject_code', name='uq_subject_scores_result_id_subject_code'),
+    )
 
     score_id = db.Column(db.Integer, primary_key=True)
     result_id = db.Column(db.Integer, db.ForeignKey('exam_results.result_id'), nullable=False)
@@ -74,6 +84,9 @@ class Universities(db.Model):
 
 class Faculties(db.Model):
     __tablename__ = 'faculties'
+    __table_args__ = (
+        db.UniqueConstraint('university_id', 'faculty_name', name='uq_faculties_university_id_faculty_name'),
+    )
 
     faculty_id = db.Column(db.Integer, primary_key=True)
     university_id = db.Column(db.Integer, db.ForeignKey('universities.university_id'), nullable=False)
@@ -84,6 +97,9 @@ class Faculties(db.Model):
 
 class Departments(db.Model):
     __tablename__ = 'departments'
+    __table_args__ = (
+        db.UniqueConstraint('faculty_id', 'department_name', name='uq_departments_faculty_id_department_name'),
+    )
 
     department_id = db.Column(db.Integer, primary_key=True)
     faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.faculty_id'), nullable=False)
@@ -94,6 +110,9 @@ class Departments(db.Model):
 
 class ExamJudgements(db.Model):
     __tablename__ = 'exam_judgements'
+    __table_args__ = (
+        db.UniqueConstraint('result_id', 'preference_order', name='uq_exam_judgements_result_id_preference_order'),
+    )
 
     judgement_id = db.Column(db.Integer, primary_key=True)
     result_id = db.Column(db.Integer, db.ForeignKey('exam_results.result_id'), nullable=False)
@@ -120,4 +139,118 @@ class AcademicYearUpdate(db.Model):
     __tablename__ = 'academic_year_updates'
     
     academic_year = db.Column(db.Integer, primary_key=True)
-    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
\ No newline at end of file
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class ImportJobs(db.Model):
+    __tablename__ = 'import_jobs'
+
+    job_id = db.Column(db.String, primary_key=True)
+    kind = db.Column(db.String, nullable=False)  # exams_xlsx / students
+    status = db.Column(db.String, nullable=False, default='queued')  # queued/running/succeeded/failed
+    filename = db.Column(db.String, nullable=True)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    progress = db.Column(db.JSON, nullable=True)  # 途中経過（テーブル別の登録件数・スキップ件数）
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.String, nullable=True)
+    error_type = db.Column(db.String, nullable=True)  # 失敗時の例外クラス名（ValueError なら入力不備）
+    profile = db.Column(db.String, nullable=True)  # ジョブ単位のプロファイル指定（cprofile / pyinstrument）
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # 実行中のジョブの最終更新（途絶えたジョブを failed にする判定用）
+
+class DataVersions(db.Model):
+    __tablename__ = 'data_versions'
+
+    name = db.Column(db.String, primary_key=True)  # 対象データ名（students など）
+    version = db.Column(db.BigInteger, nullable=False, default=0)  # 更新のたびに +1
+
+class ExamSnapshots(db.Model):
+    __tablename__ = 'exam_snapshots'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.exam_id'), primary_key=True)
+    num_students = db.Column(db.Integer, nullable=False)
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ExamSnapshotRows(db.Model):
+    __tablename__ = 'exam_snapshot_rows'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam_snapshots.exam_id'), primary_key=True)
+    student_id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    school_name = db.Column(db.String, nullable=False)
+    preferences = db.Column(db.JSON, nullable=False)  # 志望順位（文字列）-> 大学・学部・学科名と判定
+
+
+class ExamStats(db.Model):
+    __tablename__ = 'exam_stats'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.exam_id'), primary_key=True)
+    num_students = db.Column(db.Integer, nullable=False)
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ExamSubjectStats(db.Model):
+    __tablename__ = 'exam_subject_stats'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam_stats.exam_id'), primary_key=True)
+    subject_code = db.Column(db.Integer, primary_key=True)
+    group_by = db.Column(db.String, primary_key=True)  # all / school / grade
+    group_value = db.Column(db.String, primary_key=True)  # 高校名・学年（all は空文字）
+    num_students = db.Column(db.Integer, nullable=False)
+    score_mean = db.Column(db.Float, nullable=False)
+    score_stddev = db.Column(db.Float, nullable=False)
+    score_min = db.Column(db.Integer, nullable=False)
+    score_max = db.Column(db.Integer, nullable=False)
+    score_p25 = db.Column(db.Float, nullable=False)
+    score_p50 = db.Column(db.Float, nullable=False)
+    score_p75 = db.Column(db.Float, nullable=False)
+    deviation_mean = db.Column(db.Float, nullable=False)
+    deviation_stddev = db.Column(db.Float, nullable=False)
+    deviation_min = db.Column(db.Float, nullable=False)
+    deviation_max = db.Column(db.Float, nullable=False)
+    deviation_p25 = db.Column(db.Float, nullable=False)
+    deviation_p50 = db.Column(db.Float, nullable=False)
+    deviation_p75 = db.Column(db.Float, nullable=False)
+    deviation_histogram = db.Column(db.JSON, nullable=False)  # 偏差値帯ごとの人数
+
+
+class ExamJudgementStats(db.Model):
+    __tablename__ = 'exam_judgement_stats'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exam_stats.exam_id'), primary_key=True)
+    university_id = db.Column(db.Integer, primary_key=True)
+    group_by = db.Column(db.String, primary_key=True)  # all / school / grade
+    group_value = db.Column(db.String, primary_key=True)  # 高校名・学年（all は空文字）
+    kind = db.Column(db.String, primary_key=True)  # kyote / niji / sougou
+    count_a = db.Column(db.Integer, nullable=False, default=0)
+    count_b = db.Column(db.Integer, nullable=False, default=0)
+    count_c = db.Column(db.Integer, nullable=False, default=0)
+    count_d = db.Column(db.Integer, nullable=False, default=0)
+    count_e = db.Column(db.Integer, nullable=False, default=0)
+    count_other = db.Column(db.Integer, nullable=False, default=0)  # A〜E 以外の判定（H など）
+
+
+class UniversityRollups(db.Model):
+    __tablename__ = 'university_rollups'
+
+    exam_year = db.Column(db.Integer, primary_key=True)
+    exam_type = db.Column(db.String, primary_key=True)
+    university_id = db.Column(db.Integer, db.ForeignKey('universities.university_id'), primary_key=True)
+    faculty_id = db.Column(db.Integer, db.ForeignKey('faculties.faculty_id'), primary_key=True)
+    preference_order = db.Column(db.Integer, primary_key=True)
+    num_students = db.Column(db.Integer, nullable=False, default=0)  # その志望順位に挙げた人数（模試ごとに延べ）
+    count_a = db.Column(db.Integer, nullable=False, default=0)
+    count_b = db.Column(db.Integer, nullable=False, default=0)
+    count_c = db.Column(db.Integer, nullable=False, default=0)
+    count_d = db.Column(db.Integer, nullable=False, default=0)
+    count_e = db.Column(db.Integer, nullable=False, default=0)
+    count_other = db.Column(db.Integer, nullable=False, default=0)  # A〜E 以外・判定なし
+
+
+class UniversityRollupExams(db.Model):
+    __tablename__ = 'university_rollup_exams'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.exam_id'), primary_key=True)
+    rolled_up_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
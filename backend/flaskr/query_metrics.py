@@ -0,0 +1,162 @@
+# backend/flaskr/query_metrics.py
+# リクエストごとの SQL 実行回数・DB 時間の計測
+# - SQLAlchemy の before/after_cursor_execute で1文ごとの実行時間を測り、リクエスト中の件数・合計・遅い文を記録する
+# - レスポンスに Server-Timing ヘッダー（db: DB 時間と件数 / app: リクエスト全体）を付ける
+# - 遅い文（QUERY_SLOW_MS 以上）や文の多いリクエスト（QUERY_COUNT_WARN 以上）は JSON 1行のログに出す
+# - エンドポイントごとの件数・DB 時間の度数分布をプロセス内で集計し、endpoint_stats.snapshot() で返す
+# - ストリーミングのレスポンス（CSV/XLSX エクスポート等）は本文の生成中の文を含まない
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("QUERY_METRICS", "true").strip().lower() in ("1", "true", "yes", "on")
+# この時間（ミリ秒）以上かかった文を含むリクエストをログに出す
+SLOW_QUERY_MS = float(os.getenv("QUERY_SLOW_MS", "200"))
+# この件数以上の文を実行したリクエストをログに出す（N+1 の検出用）
+QUERY_COUNT_WARN = int(os.getenv("QUERY_COUNT_WARN", "50"))
+# リクエストごと・エンドポイントごとに保持する遅い文の数
+SLOWEST_KEPT = 3
+# ログ・集計に残す SQL の長さの上限
+STATEMENT_MAX_LENGTH = 300
+
+# 度数分布の区切り（1リクエストあたりの文の数 / DB 時間の秒数）
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+DB_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _keep_slowest(slowest, seconds, statement):
+    """(秒, SQL) を遅い順に SLOWEST_KEPT 件まで保持する"""
+    if len(slowest) < SLOWEST_KEPT or seconds > slowest[-1][0]:
+        slowest.append((seconds, statement))
+        slowest.sort(key=lambda s: -s[0])
+        del slowest[SLOWEST_KEPT:]
+
+
+class _EndpointStats:
+    """プロセス内のエンドポイントごとの集計"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def observe(self, endpoint, count, db_seconds, slowest):
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    "requests": 0,
+                    "queries_sum": 0,
+                    "queries_max": 0,
+                    "db_seconds_sum": 0.0,
+                    "db_seconds_max": 0.0,
+                    "query_count_buckets": [0] * (len(QUERY_COUNT_BUCKETS) + 1),
+                    "db_seconds_buckets": [0] * (len(DB_SECONDS_BUCKETS) + 1),
+                    "slowest": [],
+                }
+            stats["requests"] += 1
+            stats["queries_sum"] += count
+            stats["queries_max"] = max(stats["queries_max"], count)
+            stats["db_seconds_sum"] += db_seconds
+            stats["db_seconds_max"] = max(stats["db_seconds_max"], db_seconds)
+            stats["query_count_buckets"][bisect.bisect_left(QUERY_COUNT_BUCKETS, count)] += 1
+            stats["db_seconds_buckets"][bisect.bisect_left(DB_SECONDS_BUCKETS, db_seconds)] += 1
+            for seconds, statement in slowest:
+                _keep_slowest(stats["slowest"], seconds, statement)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {
+                    **{k: v for k, v in stats.items() if not k.endswith("_buckets") and k != "slowest"},
+                    # 上限（最後は None = 上限なし）ごとの件数（累積ではない）
+                    "query_count_buckets": [
+                        [le, c] for le, c in zip((*QUERY_COUNT_BUCKETS, None), stats["query_count_buckets"])
+                    ],
+                    "db_seconds_buckets": [
+                        [le, c] for le, c in zip((*DB_SECONDS_BUCKETS, None), stats["db_seconds_buckets"])
+                    ],
+                    "slowest": [{"ms": round(s * 1000, 1), "statement": st} for s, st in stats["slowest"]],
+                }
+                for endpoint, stats in self._endpoints.items()
+            }
+
+
+endpoint_stats = _EndpointStats()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # 1接続で文が入れ子に実行されることはないため、開始時刻は1つだけ持つ（失敗した文の分は次の文で上書きされる）
+    conn.info["query_start_time"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # リクエスト外（インポートのスレッド・CLI など）は記録しない
+    if not has_request_context():
+        return
+    stats = g.get("query_stats")
+    if stats is None:
+        return
+    seconds = time.perf_counter() - conn.info["query_start_time"]
+    stats["count"] += 1
+    stats["db_seconds"] += seconds
+    _keep_slowest(stats["slowest"], seconds, " ".join(statement.split())[:STATEMENT_MAX_LENGTH])
+
+
+def _start_request():
+    g.query_stats = {"count": 0, "db_seconds": 0.0, "slowest": [], "started": time.perf_counter()}
+
+
+def _finish_request(response):
+    stats = g.pop("query_stats", None)
+    if stats is None:
+        return response
+    total_seconds = time.perf_counter() - stats["started"]
+    db_ms = stats["db_seconds"] * 1000
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={db_ms:.1f};desc="{stats["count"]} queries", app;dur={total_seconds * 1000:.1f}',
+    )
+
+    endpoint = request.endpoint or "(unmatched)"
+    endpoint_stats.observe(endpoint, stats["count"], stats["db_seconds"], stats["slowest"])
+    metrics.REQUEST_QUERIES.labels(endpoint).observe(stats["count"])
+    metrics.REQUEST_DB_SECONDS.labels(endpoint).observe(stats["db_seconds"])
+
+    slow = stats["slowest"] and stats["slowest"][0][0] * 1000 >= SLOW_QUERY_MS
+    if slow or stats["count"] >= QUERY_COUNT_WARN:
+        logger.warning(json.dumps({
+            "event": "slow_request_queries",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": endpoint,
+            "status": response.status_code,
+            "queries": stats["count"],
+            "db_ms": round(db_ms, 1),
+            "total_ms": round(total_seconds * 1000, 1),
+            "slowest": [{"ms": round(s * 1000, 1), "statement": st} for s, st in stats["slowest"]],
+        }, ensure_ascii=False))
+    return response
+
+
+def init_app(app, db):
+    """エンジンのイベントとリクエストのフックを登録する（QUERY_METRICS=false なら何もしない）"""
+    if not ENABLED:
+        return
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
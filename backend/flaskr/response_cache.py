@@ -0,0 +1,88 @@
+# backend/flaskr/response_cache.py
+# 参照系APIのレスポンスキャッシュ
+# - キャッシュキー・ETag は (パス, クエリ, データ世代番号) から作るため、インポート・年度更新で世代番号が
+#   変わるまでは同じ ETag になり、If-None-Match が一致すれば DB に触れずに 304 を返す
+# - 世代番号は cache_backend から取得する（共有バックエンドならコミット直後に全ワーカーへ反映される）
+# - 本文（シリアライズ済み JSON）はプロセス内 LRU に保持し、2回目以降はビュー関数を実行しない
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, make_response, request
+from . import cache_backend, metrics
+from .services import data_version
+
+# LRU の最大エントリ数（0 でキャッシュ無効）
+CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+# キャッシュ対象のデータ（いずれかの世代番号が変われば全エントリが無効になる）
+CACHED_DATA = (data_version.EXAMS_DATA, data_version.STUDENTS_DATA)
+# 本文と一緒に保存・再送するヘッダー
+CACHED_HEADERS = ("X-Total-Count", "X-Next-Cursor", "X-Exam-Year")
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # キー -> (本文 bytes, ヘッダー)
+_versions = None          # エントリ作成時の世代番号タプル
+
+
+def _current_versions():
+    global _versions
+    versions = cache_backend.current_versions(CACHED_DATA)
+    if versions != _versions:
+        with _lock:
+            if versions != _versions:
+                # 古い世代のエントリは二度と使われないため破棄
+                _entries.clear()
+                _versions = versions
+    return versions
+
+
+def clear_response_cache():
+    global _versions
+    with _lock:
+        _entries.clear()
+        _versions = None
+
+
+def _finish(resp, etag):
+    resp.set_etag(etag)
+    # ブラウザには保存させつつ、毎回 If-None-Match で再検証させる
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def cached_response(view):
+    """GET の JSON レスポンスをデータ世代番号単位でキャッシュするデコレーター"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if CACHE_SIZE <= 0 or request.method != "GET":
+            return view(*args, **kwargs)
+
+        key = (request.path, tuple(sorted(request.args.items(multi=True))), _current_versions())
+        etag = hashlib.sha1(repr(key).encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            metrics.CACHE_REQUESTS.labels("response", "not_modified").inc()
+            return _finish(make_response("", 304), etag)
+
+        with _lock:
+            entry = _entries.get(key)
+            if entry is not None:
+                _entries.move_to_end(key)
+        if entry is not None:
+            metrics.CACHE_REQUESTS.labels("response", "hit").inc()
+            body, headers = entry
+            return _finish(current_app.response_class(body, mimetype="application/json", headers=headers), etag)
+
+        metrics.CACHE_REQUESTS.labels("response", "miss").inc()
+        resp = make_response(view(*args, **kwargs))
+        # エラー応答（404 等）は保存しない
+        if resp.status_code != 200 or resp.mimetype != "application/json":
+            return resp
+        headers = {h: resp.headers[h] for h in CACHED_HEADERS if h in resp.headers}
+        with _lock:
+            _entries[key] = (resp.get_data(), headers)
+            _entries.move_to_end(key)
+            while len(_entries) > CACHE_SIZE:
+                _entries.popitem(last=False)
+        return _finish(resp, etag)
+    return wrapper
@@ -1,24 +1,31 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from ..services.exam_service import (
     list_years, list_exam_types, list_exam_names,
     search_exams, get_exam_results, filter_exam_results,
-    list_top_universities,
+    list_top_universities, iter_filtered_exam_results,
 )
+from ..services.exam_stats_service import get_exam_stats
+from ..services.university_rollup_service import rank_universities
+from ..services.export_service import EXPORT_FORMATS, EXPORT_MIMETYPES, stream_csv, stream_xlsx
+from ..response_cache import cached_response
 
 exams_bp = Blueprint("exams", __name__)
 
 @exams_bp.route("/exams/years", methods=["GET"])
+@cached_response
 def years_route():
     return jsonify(list_years())
 
 
 @exams_bp.route("/exams/types", methods=["GET"])
+@cached_response
 def types_route():
     year = request.args.get("year", type=int)
     return jsonify(list_exam_types(year))
 
 
 @exams_bp.route("/exams/names", methods=["GET"])
+@cached_response
 def names_route():
     year = request.args.get("year", type=int)
     exam_type = request.args.get("exam_type")
@@ -26,21 +33,78 @@ def names_route():
 
 
 @exams_bp.route("/exams/search", methods=["GET"])
+@cached_response
 def search_exams_route():
     year = request.args.get("year", type=int)
     exam_type = request.args.get("exam_type")
     exam_name = request.args.get("name")
-    return jsonify(search_exams(year, exam_type, exam_name))
+    limit = request.args.get("limit", type=int)
+    offset = request.args.get("offset", default=0, type=int)
+    results, total = search_exams(year, exam_type, exam_name, limit, offset)
+    resp = jsonify(results)
+    # 総件数はヘッダーで返す（本文は従来どおり配列）
+    resp.headers["X-Total-Count"] = str(total)
+    return resp
+
+def _paged_response(results, total, next_cursor):
+    resp = jsonify(results)
+    # 総人数・次ページのカーソルはヘッダーで返す（本文は従来どおり配列）
+    resp.headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        resp.headers["X-Next-Cursor"] = next_cursor
+    return resp
 
 @exams_bp.route("/exams/<int:exam_id>", methods=["GET"])
+@cached_response
 def get_exam_results_route(exam_id):
-    return jsonify(get_exam_results(exam_id))
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor")
+    try:
+        results, total, next_cursor = get_exam_results(exam_id, limit, cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _paged_response(results, total, next_cursor)
+
+@exams_bp.route("/exams/<int:exam_id>/stats", methods=["GET"])
+@cached_response
+def exam_stats_route(exam_id):
+    group_by = request.args.get("group_by", default="all")
+    subject_code = request.args.get("subject_code", type=int)
+    university_id = request.args.get("university_id", type=int)
+    try:
+        stats = get_exam_stats(exam_id, group_by, subject_code, university_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if stats is None:
+        return jsonify({"error": "Exam not found"}), 404
+    return jsonify(stats)
+
+@exams_bp.route("/exams/universities/ranking", methods=["GET"])
+@cached_response
+def university_ranking_route():
+    year = request.args.get("year", type=int)
+    exam_type = request.args.get("exam_type")
+    level = request.args.get("level", default="university")
+    preference_max = request.args.get("preference_max", type=int)
+    limit = request.args.get("limit", type=int)
+    try:
+        results, total, year = rank_universities(year, exam_type, level, preference_max, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    resp = jsonify(results)
+    # 対象件数・集計した年度（省略時は最新年度）はヘッダーで返す
+    resp.headers["X-Total-Count"] = str(total)
+    if year is not None:
+        resp.headers["X-Exam-Year"] = str(year)
+    return resp
 
 @exams_bp.route("/exams/universities/top", methods=["GET"])
+@cached_response
 def top_universities_route():
     return jsonify(list_top_universities())
 
 @exams_bp.route("/exams/filter", methods=["GET"])
+@cached_response
 def filter_exam_results_route():
     exam_id = request.args.get("exam_id", type=int)
     name = request.args.get("name")
@@ -51,4 +115,30 @@ def filter_exam_results_route():
     order_max = request.args.get("order_max", type=int)
     include_top = request.args.get("include_top_universities", default="false")
     include_top = str(include_top).lower() in ("1", "true", "yes")
-    return jsonify(filter_exam_results(exam_id, name, university, university_id, faculty, order_min, order_max, include_top))
+    # format=csv / xlsx 指定時は同じ条件の全件をファイルとしてストリーミングで返す
+    export_format = request.args.get("format")
+    if export_format:
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format は {' / '.join(EXPORT_FORMATS)} で指定してください"}), 400
+        return _export_response(
+            export_format, exam_id,
+            iter_filtered_exam_results(exam_id, name, university, university_id, faculty, order_min, order_max, include_top),
+        )
+
+    limit = request.args.get("limit", type=int)
+    cursor = request.args.get("cursor")
+    try:
+        results, total, next_cursor = filter_exam_results(
+            exam_id, name, university, university_id, faculty, order_min, order_max, include_top,
+            limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _paged_response(results, total, next_cursor)
+
+def _export_response(export_format, exam_id, exam_results):
+    num_preferences, students = exam_results
+    stream = stream_csv if export_format == "csv" else stream_xlsx
+    resp = Response(stream_with_context(stream(num_preferences, students)), mimetype=EXPORT_MIMETYPES[export_format])
+    resp.headers["Content-Disposition"] = f'attachment; filename="exam_{exam_id}_results.{export_format}"'
+    return resp
@@ -1,47 +1,81 @@
 from flask import Blueprint, request, jsonify
-from ..services import import_service, academic_year_service
+from ..services import import_job_service, academic_year_service
 from .. import db
 
 imports_bp = Blueprint("imports", __name__)
 
-@imports_bp.route("/imports/students", methods=["POST"])
-def import_students():
+
+def _run_import(kind):
+    """
+    インポートをジョブと同じワーカー（専用スレッドプール / import_worker.py）で実行し、完了まで待って結果を返す
+    - 入力不備（ValueError）は 400、それ以外の失敗は 500
+    - IMPORT_JOB_SYNC_TIMEOUT 秒以内に終わらない場合は 202 でジョブ情報を返す（以降は /imports/jobs/<job_id> で確認する）
+    """
     file = request.files.get("file")
     if not file:
-        return jsonify({"error": "file がありません"}), 400
-
+        return None, (jsonify({"error": "file がありません"}), 400)
     try:
-        result = import_service.import_students_from_csv(file)
-        return jsonify({
-            "ok": True,
-            **result,
-            "marked_resigned": True,
-        })
+        job = import_job_service.run_import_job(kind, file, request.form.get("profile"))
     except ValueError as e:
-        return jsonify({"error": str(e)}), 400
+        return None, (jsonify({"error": str(e)}), 400)
     except Exception as e:
         db.session.rollback()
-        return jsonify({"error": str(e)}), 500
+        return None, (jsonify({"error": str(e)}), 500)
+    if job["status"] in ("queued", "running"):
+        return None, (jsonify(job), 202)
+    if job["status"] != "succeeded":
+        return None, (jsonify({"error": job["error"]}), 400 if job["error_type"] == "ValueError" else 500)
+    return job["result"], None
+
+
+@imports_bp.route("/imports/students", methods=["POST"])
+def import_students():
+    result, error = _run_import("students")
+    if error:
+        return error
+    return jsonify({
+        "ok": True,
+        **result,
+        "marked_resigned": True,
+    })
 
 @imports_bp.route("/imports/exams_xlsx", methods=["POST"])
 def import_exams_xlsx():
+    result, error = _run_import("exams_xlsx")
+    if error:
+        return error
+    return jsonify({
+        "ok": True,
+        **result
+    })
+
+
+# ------------------------
+# バックグラウンドインポート（ジョブIDを即時返却し、進捗はポーリングで取得）
+# ------------------------
+@imports_bp.route("/imports/jobs/<kind>", methods=["POST"])
+def submit_import_job(kind):
     file = request.files.get("file")
     if not file:
         return jsonify({"error": "file がありません"}), 400
     try:
-        result = import_service.import_exams_from_xlsx(file)
-        return jsonify({
-            "ok": True,
-            **result
-        })
+        job = import_job_service.submit_import_job(kind, file, request.form.get("profile"))
+        return jsonify(job), 202
     except ValueError as e:
-        db.session.rollback()
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 
+@imports_bp.route("/imports/jobs/<job_id>", methods=["GET"])
+def import_job_status(job_id):
+    job = import_job_service.get_import_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
 @imports_bp.route("/imports/academic_year_status", methods=["GET"])
 def academic_year_status():
     """
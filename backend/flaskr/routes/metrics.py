@@ -0,0 +1,32 @@
+import os
+from flask import Blueprint, Response, jsonify
+from .. import metrics
+from .. import db
+from ..db_engine import pool_stats
+from ..query_metrics import endpoint_stats
+
+metrics_bp = Blueprint("metrics", __name__)
+# /api を付けずに登録する（Prometheus のスクレイプ先）
+exposition_bp = Blueprint("exposition", __name__)
+
+
+@metrics_bp.route("/metrics/db_pool", methods=["GET"])
+def get_db_pool_metrics():
+    """
+    応答したワーカープロセスのコネクションプールの状態と、接続取得の待ち時間の集計
+    （値はプロセスごと。複数ワーカーの場合は pid で区別する）
+    """
+    return jsonify(pool_stats(db.engine))
+
+
+@metrics_bp.route("/metrics/queries", methods=["GET"])
+def get_query_metrics():
+    """応答したワーカープロセスのエンドポイントごとの SQL 件数・DB 時間の集計と遅い文"""
+    return jsonify({"pid": os.getpid(), "endpoints": endpoint_stats.snapshot()})
+
+
+@exposition_bp.route("/metrics", methods=["GET"])
+def get_prometheus_metrics():
+    """Prometheus のテキスト形式のメトリクス（PROMETHEUS_MULTIPROC_DIR 指定時は全ワーカーの合計）"""
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
@@ -1,7 +1,10 @@
 # backend/routes/students.py
-from flask import Blueprint, request, jsonify
-from ..services.students_service import search_students, get_student_detail
-
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from ..services.students_service import search_students, get_student_detail, iter_student_details
+from ..services.analytics_service import (
+    get_student_trends, rank_cohort_by_improvement, DEFAULT_WINDOW, DEFAULT_COHORT_STATUS, DEFAULT_COHORT_GRADE,
+)
+from ..response_cache import cached_response
 
 students_bp = Blueprint("students", __name__)
 
@@ -9,6 +12,7 @@ students_bp = Blueprint("students", __name__)
 # 生徒検索（名前・高校名・マナビス生番号で部分一致）
 # ------------------------
 @students_bp.route("/students/search", methods=["GET"])
+@cached_response
 def search_students_api():
     keyword = request.args.get("q", "")
     # 複数指定可能: /students/search?status=在籍&status=既卒
@@ -21,8 +25,74 @@ def search_students_api():
 # 生徒詳細情報
 # ------------------------
 @students_bp.route("/students/<int:student_id>", methods=["GET"])
+@cached_response
 def student_detail_api(student_id):
     detail = get_student_detail(student_id)
     if not detail:
         return jsonify({"error": "Student not found"}), 404
-    return jsonify(detail)
\ No newline at end of file
+    return jsonify(detail)
+
+# ------------------------
+# 生徒詳細の一括取得（面談シート等の帳票作成用）
+# - GET:  /students/details?student_id=1&student_id=2 または ?status=在籍&grade=高3&school_name=...
+# - POST: {"student_ids": [...]} または {"status": [...], "grade": [...], "school_name": "..."}
+# - 1行1生徒の NDJSON（/students/<id> と同じ形式）をストリーミングで返す
+# ------------------------
+@students_bp.route("/students/details", methods=["GET", "POST"])
+def student_details_api():
+    if request.method == "POST":
+        body = request.get_json(silent=True) or {}
+        student_ids = body.get("student_ids")
+        statuses = body.get("status")
+        grades = body.get("grade")
+        school_name = body.get("school_name")
+        # 単一値でも受け付ける
+        student_ids = [student_ids] if isinstance(student_ids, (str, int)) else student_ids
+        statuses = [statuses] if isinstance(statuses, str) else statuses
+        grades = [grades] if isinstance(grades, str) else grades
+    else:
+        student_ids = request.args.getlist("student_id") or request.args.getlist("student_id[]")
+        statuses = request.args.getlist("status") or request.args.getlist("status[]")
+        grades = request.args.getlist("grade") or request.args.getlist("grade[]")
+        school_name = request.args.get("school_name")
+    try:
+        details = iter_student_details(student_ids, statuses, grades, school_name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        for detail in details:
+            yield current_app.json.dumps(detail) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# ------------------------
+# 科目別の偏差値推移（傾き・移動平均・最高/最低・前回比）
+# ------------------------
+@students_bp.route("/students/<int:student_id>/trends", methods=["GET"])
+@cached_response
+def student_trends_api(student_id):
+    window = request.args.get("window", default=DEFAULT_WINDOW, type=int)
+    try:
+        trends = get_student_trends(student_id, window)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if trends is None:
+        return jsonify({"error": "Student not found"}), 404
+    return jsonify(trends)
+
+# ------------------------
+# 学年単位の偏差値の伸びランキング（既定は在籍の高3）
+# ------------------------
+@students_bp.route("/students/trends", methods=["GET"])
+@cached_response
+def cohort_trends_api():
+    status = request.args.get("status", DEFAULT_COHORT_STATUS)
+    grade = request.args.get("grade", DEFAULT_COHORT_GRADE)
+    subject_code = request.args.get("subject_code", type=int)
+    limit = request.args.get("limit", type=int)
+    results, total = rank_cohort_by_improvement(status, grade, subject_code, limit)
+    resp = jsonify(results)
+    # 対象人数はヘッダーで返す（本文は配列）
+    resp.headers["X-Total-Count"] = str(total)
+    return resp
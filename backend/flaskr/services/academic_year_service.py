@@ -1,6 +1,8 @@
 from datetime import date, datetime
 from .. import db
-from ..models import Students, AcademicYearUpdate
+from ..models import Students, ExamResults, AcademicYearUpdate
+from .data_version import bump_data_version, STUDENTS_DATA
+from .exam_stats_service import invalidate_exam_stats
 
 def get_academic_year(target_date=None):
     """
@@ -80,6 +82,7 @@ def execute_academic_year_update():
     
     updated_count = 0
     graduated_count = 0
+    updated_ids = []
     
     # 退会者以外の全生徒を取得
     students = Students.query.filter(Students.status != "退会").all()
@@ -94,10 +97,12 @@ def execute_academic_year_update():
                 student.status = "既卒"
                 graduated_count += 1
                 updated_count += 1
+                updated_ids.append(student.student_id)
         # その他の学年は1つ上げる
         elif current_grade in grade_map:
             student.grade = grade_map[current_grade]
             updated_count += 1
+            updated_ids.append(student.student_id)
         # 既卒やその他の学年はそのまま
     
     # 更新日時を記録
@@ -115,6 +120,15 @@ def execute_academic_year_update():
         )
         db.session.add(update_record)
     
+    # 学年が変わった生徒が受験した模試の集計（学年別の内訳）を破棄する（次回参照時に作り直す）
+    # スナップショットは学年・在籍状況を持たないため破棄しない
+    if updated_ids:
+        exam_ids = db.session.execute(
+            db.select(ExamResults.exam_id).where(ExamResults.student_id.in_(updated_ids)).distinct()
+        ).scalars().all()
+        invalidate_exam_stats(exam_ids)
+
+    bump_data_version(STUDENTS_DATA)
     db.session.commit()
     
     return {
@@ -0,0 +1,240 @@
+# backend/flaskr/services/analytics_service.py
+# 科目別の偏差値推移の分析（生徒単位・学年単位）
+# - 対象生徒の偏差値を1回のクエリで配列として取得し、(生徒, 科目, 受験順) に並べて NumPy の配列演算でまとめて計算する
+# - (生徒, 科目) の連続区間を1グループとし、グループ内の受験順を x として集計する
+import numpy as np
+from sqlalchemy import Float, asc, cast, select
+from .. import db
+from ..models import Students, Exams, ExamResults, ExamMaster, SubjectScores, SubjectMaster
+
+# 移動平均の既定の区間（直近 N 回）
+DEFAULT_WINDOW = 3
+# 学年単位の分析の既定の対象
+DEFAULT_COHORT_STATUS = "在籍"
+DEFAULT_COHORT_GRADE = "高3"
+
+
+def _student_score_rows(student_id):
+    """生徒1人の偏差値の行（科目 → 受験順、模試情報付き）"""
+    return db.session.execute(
+        select(
+            SubjectScores.subject_code,
+            cast(SubjectScores.deviation_value, Float),
+            SubjectMaster.subject_name,
+            Exams.exam_id,
+            Exams.exam_year,
+            Exams.exam_type,
+            ExamMaster.exam_name,
+        )
+        .join(ExamResults, ExamResults.result_id == SubjectScores.result_id)
+        .join(Exams, Exams.exam_id == ExamResults.exam_id)
+        .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code)
+        .join(SubjectMaster, SubjectMaster.subject_code == SubjectScores.subject_code)
+        .where(ExamResults.student_id == student_id)
+        # 受験順は生徒詳細と同じ（年度 → 開催順 → exam_id）
+        .order_by(SubjectScores.subject_code, asc(Exams.exam_year), asc(ExamMaster.sort_key), asc(Exams.exam_id))
+    ).all()
+
+
+def _cohort_score_arrays(status, grade, subject_code=None):
+    """
+    学年単位の偏差値を (生徒, 科目, 受験順) に並べた配列で返す
+    - 大量行の並べ替え・マスタの結合は DB で行わず、模試の受験順（小さな表）だけ別に取得して NumPy で並べる
+    - 行は ORM・Row を通さずに取得し、数値の2次元配列にする
+    - 戻り値: (student_ids, subject_codes, deviations)
+    """
+    exam_order = db.session.execute(
+        select(Exams.exam_id)
+        .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code)
+        .order_by(asc(Exams.exam_year), asc(ExamMaster.sort_key), asc(Exams.exam_id))
+    ).scalars().all()
+    query = (
+        select(
+            ExamResults.student_id,
+            SubjectScores.subject_code,
+            ExamResults.exam_id,
+            cast(SubjectScores.deviation_value, Float),
+        )
+        .join(ExamResults, ExamResults.result_id == SubjectScores.result_id)
+        .join(Students, Students.student_id == ExamResults.student_id)
+        .where(Students.status == status, Students.grade == grade)
+    )
+    if subject_code is not None:
+        query = query.where(SubjectScores.subject_code == subject_code)
+    # 列はすべて数値で型変換が不要なため、Row を組み立てずに DBAPI のカーソルから tuple のまま受け取る
+    result = db.session.connection().execute(query)
+    try:
+        rows = result.cursor.fetchall()
+    finally:
+        result.close()
+    if not rows or not exam_order:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty
+
+    data = np.array(rows, dtype=np.float64)
+    student_ids = data[:, 0].astype(np.int64)
+    subject_codes = data[:, 1].astype(np.int64)
+    exam_ids = data[:, 2].astype(np.int64)
+    # exam_id -> 受験順
+    exam_rank = np.zeros(max(exam_order) + 1, dtype=np.int64)
+    exam_rank[exam_order] = np.arange(len(exam_order))
+    order = np.lexsort((exam_rank[exam_ids], subject_codes, student_ids))
+    return student_ids[order], subject_codes[order], data[order, 3]
+
+
+def _compute_trends(student_ids, subject_codes, deviations, window):
+    """
+    (生徒, 科目) ごとに並んだ偏差値の配列から推移指標を計算する
+    - 行単位: 移動平均（直近 window 回）、前回比
+    - グループ単位: 回数、傾き（最小二乗法、受験1回あたり）、最高・最低、最新値、最新の前回比
+    """
+    n_rows = len(deviations)
+    is_start = np.ones(n_rows, dtype=bool)
+    is_start[1:] = (student_ids[1:] != student_ids[:-1]) | (subject_codes[1:] != subject_codes[:-1])
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], n_rows)
+    group = np.cumsum(is_start) - 1
+    counts = ends - starts
+    x = np.arange(n_rows) - starts[group]
+
+    # 前回比（グループ先頭は NaN）
+    change = np.full(n_rows, np.nan)
+    change[1:] = deviations[1:] - deviations[:-1]
+    change[is_start] = np.nan
+
+    # 直近 window 回の移動平均（累積和の差分）
+    cumsum = np.concatenate(([0.0], np.cumsum(deviations)))
+    lo = np.maximum(np.arange(n_rows) - window + 1, starts[group])
+    moving_average = (cumsum[np.arange(n_rows) + 1] - cumsum[lo]) / (np.arange(n_rows) + 1 - lo)
+
+    # 傾き = (nΣxy - ΣxΣy) / (nΣx² - (Σx)²)、1回のみのグループは NaN
+    sum_x = np.bincount(group, weights=x)
+    sum_y = np.bincount(group, weights=deviations)
+    sum_xx = np.bincount(group, weights=x * x)
+    sum_xy = np.bincount(group, weights=x * deviations)
+    denominator = counts * sum_xx - sum_x * sum_x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(counts > 1, (counts * sum_xy - sum_x * sum_y) / denominator, np.nan)
+
+    return {
+        "starts": starts,
+        "ends": ends,
+        "counts": counts,
+        "slope": slope,
+        "best": np.maximum.reduceat(deviations, starts),
+        "worst": np.minimum.reduceat(deviations, starts),
+        "latest": deviations[ends - 1],
+        "latest_change": change[ends - 1],
+        "moving_average": moving_average,
+        "change": change,
+    }
+
+
+def _number(value):
+    """JSON 用（NaN は None、小数2桁）"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, 2)
+
+
+def get_student_trends(student_id, window=DEFAULT_WINDOW):
+    """
+    生徒1人の科目別の偏差値推移（window: 移動平均の区間、1以上でなければ ValueError）
+    - 戻り値: {"student_id", "subjects": [{subject_code, subject_name, num_exams, slope, best, worst,
+      latest, latest_change, moving_average, exams: [{exam_id, exam_name, exam_year, exam_type,
+      deviation_value, moving_average, change}]}]}、生徒が存在しない場合は None
+    """
+    if window < 1:
+        raise ValueError("window は1以上で指定してください")
+    if db.session.get(Students, student_id) is None:
+        return None
+    rows = _student_score_rows(student_id)
+    if not rows:
+        return {"student_id": student_id, "subjects": []}
+
+    subject_codes = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    deviations = np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows))
+    student_ids = np.zeros(len(rows), dtype=np.int64)
+    t = _compute_trends(student_ids, subject_codes, deviations, window)
+
+    subjects = []
+    for g, (start, end) in enumerate(zip(t["starts"], t["ends"])):
+        subjects.append({
+            "subject_code": int(subject_codes[start]),
+            "subject_name": rows[start][2],
+            "num_exams": int(t["counts"][g]),
+            "slope": _number(t["slope"][g]),
+            "best": _number(t["best"][g]),
+            "worst": _number(t["worst"][g]),
+            "latest": _number(t["latest"][g]),
+            "latest_change": _number(t["latest_change"][g]),
+            "moving_average": _number(t["moving_average"][end - 1]),
+            "exams": [
+                {
+                    "exam_id": rows[i][3],
+                    "exam_year": rows[i][4],
+                    "exam_type": rows[i][5],
+                    "exam_name": rows[i][6],
+                    "deviation_value": _number(deviations[i]),
+                    "moving_average": _number(t["moving_average"][i]),
+                    "change": _number(t["change"][i]),
+                }
+                for i in range(start, end)
+            ],
+        })
+    return {"student_id": student_id, "subjects": subjects}
+
+
+def rank_cohort_by_improvement(status=DEFAULT_COHORT_STATUS, grade=DEFAULT_COHORT_GRADE, subject_code=None, limit=None):
+    """
+    学年単位で偏差値の伸び（傾き）の大きい順に生徒を並べる
+    - 改善度 = 2回以上受験した科目の傾きの平均（subject_code 指定時はその科目の傾き）
+    - 2回以上受験した科目がない生徒は対象外。同じ改善度は student_id 順
+    - 戻り値: (一覧, 対象人数)
+    """
+    student_ids, subject_codes, deviations = _cohort_score_arrays(status, grade, subject_code)
+    if not len(deviations):
+        return [], 0
+    t = _compute_trends(student_ids, subject_codes, deviations, DEFAULT_WINDOW)
+
+    # グループ（生徒×科目）→ 生徒へ集約
+    valid = ~np.isnan(t["slope"])
+    group_students = student_ids[t["starts"]]
+    unique_students, student_index = np.unique(group_students, return_inverse=True)
+    num_subjects = np.bincount(student_index, weights=valid, minlength=len(unique_students))
+    slope_sum = np.bincount(student_index, weights=np.where(valid, t["slope"], 0.0), minlength=len(unique_students))
+    change_valid = ~np.isnan(t["latest_change"])
+    change_sum = np.bincount(student_index, weights=np.where(change_valid, t["latest_change"], 0.0), minlength=len(unique_students))
+    num_changes = np.bincount(student_index, weights=change_valid, minlength=len(unique_students))
+    num_exams = np.bincount(student_index, weights=t["counts"], minlength=len(unique_students))
+
+    ranked = np.flatnonzero(num_subjects > 0)
+    improvement = slope_sum[ranked] / num_subjects[ranked]
+    # 改善度の降順 → student_id の昇順
+    order = np.lexsort((unique_students[ranked], -improvement))
+    ranked = ranked[order]
+    improvement = improvement[order]
+    total = len(ranked)
+    if limit:
+        ranked = ranked[:limit]
+        improvement = improvement[:limit]
+
+    ids = [int(s) for s in unique_students[ranked]]
+    students = {
+        s.student_id: s for s in
+        db.session.query(Students.student_id, Students.name, Students.school_name).filter(Students.student_id.in_(ids))
+    } if ids else {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_change = change_sum / num_changes
+    return [
+        {
+            "rank": rank,
+            "student_id": sid,
+            "name": students[sid].name,
+            "school_name": students[sid].school_name,
+            "improvement": _number(improvement[rank - 1]),
+            "latest_change": _number(mean_change[i]),
+            "num_subjects": int(num_subjects[i]),
+            "num_scores": int(num_exams[i]),
+        }
+        for rank, (sid, i) in enumerate(zip(ids, ranked), start=1)
+    ], total
@@ -0,0 +1,95 @@
+# backend/flaskr/services/bulk_ops.py
+# 集合単位の取得/作成・UPSERT（インポート処理で共用）
+from sqlalchemy import text, insert, update, tuple_
+from sqlalchemy.exc import IntegrityError
+from .. import db
+
+
+def sync_seq(table: str, id_col: str):
+    """PostgreSQLのシーケンスを最大IDへ合わせる（コミットしないためトランザクション内で使用可）"""
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}','{id_col}'), "
+        f"(SELECT COALESCE(MAX({id_col}),0) FROM {table}))"
+    ))
+
+
+def _is_primary_key_violation(e: IntegrityError, table) -> bool:
+    """主キーの一意制約違反（シーケンスのズレで採番済みのIDと衝突した場合）か"""
+    orig = e.orig
+    if getattr(orig, "pgcode", None) != "23505":  # unique_violation
+        return False
+    diag = getattr(orig, "diag", None)
+    # 制約名を付けていない主キーは PostgreSQL の既定名（<テーブル名>_pkey）
+    return getattr(diag, "constraint_name", None) == (table.primary_key.name or f"{table.name}_pkey")
+
+
+def insert_returning(model, rows: list, returning: list):
+    """複数行INSERTをまとめて発行し、RETURNINGの結果を返す。
+    PKシーケンスのズレによる主キーの一意制約違反はセーブポイント内で補正して1回だけ再試行する
+    （自然キーの重複・外部キー・NOT NULL 等の違反はそのまま送出する）。
+    """
+    if not rows:
+        return []
+    stmt = insert(model).returning(*returning)
+    table = model.__table__
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(stmt, rows).all()
+    except IntegrityError as e:
+        if not _is_primary_key_violation(e, table):
+            raise
+        sync_seq(table.name, table.primary_key.columns.values()[0].name)
+        with db.session.begin_nested():
+            return db.session.execute(stmt, rows).all()
+
+
+def get_or_create_many(model, key_cols: list, id_col, keys, defaults=None):
+    """キー列の組 → ID を集合演算で解決する。
+    既存行は1回のSELECTで取得し、不足分は1回の複数行INSERTで作成する。
+    戻り値: ({キータプル: ID}, 新規作成件数)
+    """
+    keys = {tuple(k) for k in keys}
+    if not keys:
+        return {}, 0
+    if len(key_cols) == 1:
+        cond = key_cols[0].in_([k[0] for k in keys])
+    else:
+        cond = tuple_(*key_cols).in_(list(keys))
+    found = {}
+    for row in db.session.query(id_col, *key_cols).filter(cond):
+        found[tuple(row[1:])] = row[0]
+
+    missing = [k for k in keys if k not in found]
+    rows = []
+    for k in missing:
+        rec = dict(defaults or {})
+        rec.update({c.key: v for c, v in zip(key_cols, k)})
+        rows.append(rec)
+    for row in insert_returning(model, rows, [id_col, *key_cols]):
+        found[tuple(row[1:])] = row[0]
+    return found, len(missing)
+
+
+def upsert_many(model, key_cols: list, pk_col, records: list, value_keys: list):
+    """キー列で一致する既存行は UPDATE、無ければ INSERT（いずれも一括実行）。
+    records は後勝ちで重複排除済みであること。戻り値: 新規作成件数
+    """
+    if not records:
+        return 0
+    names = [c.key for c in key_cols]
+    keys = [tuple(r[n] for n in names) for r in records]
+    existing = {}
+    for row in db.session.query(pk_col, *key_cols).filter(tuple_(*key_cols).in_(keys)):
+        existing[tuple(row[1:])] = row[0]
+
+    to_insert, to_update = [], []
+    for k, r in zip(keys, records):
+        if k in existing:
+            to_update.append({pk_col.key: existing[k], **{v: r[v] for v in value_keys}})
+        else:
+            to_insert.append(r)
+    if to_update:
+        db.session.execute(update(model), to_update)
+    insert_returning(model, to_insert, [pk_col])
+    return len(to_insert)
+
@@ -0,0 +1,45 @@
+# backend/flaskr/services/data_version.py
+# データ更新の世代番号（プロセス内キャッシュの鮮度確認用）
+from sqlalchemy import update
+from .. import db
+from ..models import DataVersions
+
+# data_versions 上の名前
+STUDENTS_DATA = "students"  # 生徒（生徒インポート・年度更新）
+EXAMS_DATA = "exams"        # 模試・成績・マスタ（模試インポート・マスタ投入）
+
+# セッションの info に積む、コミット待ちの世代番号（名前 -> 番号）
+# コミット後に cache_backend が共有ストアへ書き込む
+PENDING_VERSIONS_KEY = "pending_data_versions"
+
+
+def get_data_version(name):
+    """現在の世代番号を返す（未登録なら 0）"""
+    version = db.session.query(DataVersions.version).filter(DataVersions.name == name).scalar()
+    return version or 0
+
+
+def get_data_versions(names):
+    """複数データの世代番号を1回のクエリで取得し、names の順のタプルで返す（未登録は 0）"""
+    versions = dict(
+        db.session.query(DataVersions.name, DataVersions.version).filter(DataVersions.name.in_(names))
+    )
+    return tuple(versions.get(name, 0) for name in names)
+
+
+def bump_data_version(name):
+    """
+    世代番号を +1 する（呼び出し元のトランザクション内で実行し、コミットは呼び出し元で行う）
+    他ワーカーのキャッシュは次回参照時に番号の変化で再構築される
+    """
+    version = db.session.execute(
+        update(DataVersions)
+        .where(DataVersions.name == name)
+        .values(version=DataVersions.version + 1)
+        .returning(DataVersions.version)
+    ).scalar()
+    if version is None:
+        version = 1
+        db.session.add(DataVersions(name=name, version=version))
+        db.session.flush()
+    db.session.info.setdefault(PENDING_VERSIONS_KEY, {})[name] = version
@@ -1,10 +1,17 @@
+import base64
+import json
+from datetime import datetime
 from ..models import (
     Exams, ExamResults, Students,
-    ExamJudgements, Departments, Faculties, Universities, ExamMaster
+    ExamJudgements, Departments, Faculties, Universities, ExamMaster,
+    ExamSnapshots, ExamSnapshotRows, SubjectMaster
 )
 from .. import db
+from ..cache_backend import cached_value
+from .data_version import EXAMS_DATA
 from sqlalchemy.orm import joinedload
-from sqlalchemy import or_, asc, desc
+from sqlalchemy import or_, asc, desc, func, case, select, tuple_, insert, delete
+from sqlalchemy.exc import IntegrityError
 
 # 難関10大学の名称リスト（データベースに存在するもののみ取得）
 TOP_UNIVERSITY_NAMES = [
@@ -20,6 +27,15 @@ TOP_UNIVERSITY_NAMES = [
     "神戸"
 ]
 
+# 模試検索の1回あたりの最大取得件数
+MAX_SEARCH_LIMIT = 500
+
+# 模試詳細・絞り込みの1ページあたりの最大人数
+MAX_RESULT_LIMIT = 500
+
+# エクスポート時にサーバーサイドカーソルから1度に読み込む判定行数
+EXPORT_FETCH_SIZE = 2000
+
 def list_years():
     rows = (
         db.session.query(Exams.exam_year)
@@ -51,41 +67,67 @@ def list_exam_names(year=None, exam_type=None):
     return [n for (n,) in rows]
 
 
-def search_exams(year=None, exam_type=None, exam_name=None):
-    query = (
-        db.session.query(Exams, ExamMaster)
-        .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code)
-    )
-
+def _filter_exams(query, year=None, exam_type=None, exam_name=None):
     if year:
         query = query.filter(Exams.exam_year == year)
     if exam_type:
         query = query.filter(Exams.exam_type == exam_type)
     if exam_name:
         query = query.filter(ExamMaster.exam_name == exam_name)
+    return query
 
-    exams = query.order_by(
+
+def search_exams(year=None, exam_type=None, exam_name=None, limit=None, offset=0):
+    """
+    模試一覧（受験者数付き）を1回のクエリで取得
+    - limit/offset 指定時はその範囲のみ返す（limit は MAX_SEARCH_LIMIT まで）
+    - 総件数はページ内の行に付けた count() over() から取る（offset が末尾以降で行が無い場合のみ別途数える）
+    - 戻り値: (一覧, 条件に合致する総件数)
+    """
+    num_students = func.count(ExamResults.result_id).label("num_students")
+    total_count = func.count().over().label("total_count")
+    query = (
+        db.session.query(Exams, ExamMaster, num_students, total_count)
+        .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code)
+        .outerjoin(ExamResults, ExamResults.exam_id == Exams.exam_id)
+    )
+    query = _filter_exams(query, year, exam_type, exam_name)
+
+    query = query.group_by(Exams.exam_id, ExamMaster.exam_code).order_by(
         desc(Exams.exam_year),
         desc(ExamMaster.sort_key),
         asc(ExamMaster.exam_name),
         asc(Exams.exam_id),
-    ).all()
+    )
+    if limit:
+        query = query.limit(min(limit, MAX_SEARCH_LIMIT))
+    if offset:
+        query = query.offset(offset)
+    exams = query.all()
 
     results = []
-    for ex, em in exams:
-        num_students = db.session.query(ExamResults).filter(ExamResults.exam_id == ex.exam_id).count()
+    total = 0
+    for ex, em, n, total in exams:
         results.append({
             "exam_id": ex.exam_id,
             "exam_year": ex.exam_year,
             "exam_type": ex.exam_type,
             "exam_name": em.exam_name,
-            "num_students": num_students,
+            "num_students": n,
             "link": f"/api/exams/{ex.exam_id}",
         })
-    return results
+    if not exams and offset:
+        # ページが空でも総件数は条件に合致する模試の数を返す（ページャーの表示用）
+        total = _filter_exams(
+            db.session.query(func.count(Exams.exam_id))
+            .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code),
+            year, exam_type, exam_name,
+        ).scalar()
+    return results, total
 
-def get_exam_results(exam_id):
-    rows = (
+def _exam_results_query(exam_id):
+    """模試受験者の志望校判定行（生徒 × 志望順位）の基本クエリ"""
+    return (
         db.session.query(
             Students.student_id,
             Students.name,
@@ -96,7 +138,8 @@ def get_exam_results(exam_id):
             ExamJudgements.judgement_sougou,
             Departments.department_name,
             Faculties.faculty_name,
-            Universities.university_name
+            Universities.university_name,
+            Universities.university_id
         )
         .join(ExamResults, ExamResults.student_id == Students.student_id)
         .join(ExamJudgements, ExamJudgements.result_id == ExamResults.result_id)
@@ -104,13 +147,19 @@ def get_exam_results(exam_id):
         .outerjoin(Faculties, Faculties.faculty_id == Departments.faculty_id)
         .outerjoin(Universities, Universities.university_id == Faculties.university_id)
         .filter(ExamResults.exam_id == exam_id)
-        .order_by(Students.student_id, ExamJudgements.preference_order)
-        .all()
     )
-    return _format_exam_results(rows)
 
-def list_top_universities():
-    """難関10大学の一覧を取得（大学名ベースで検索）"""
+def get_exam_results(exam_id, limit=None, cursor=None):
+    """
+    模試受験者の志望校一覧（student_id 順）
+    - 戻り値: (一覧, 総人数, 次ページのカーソル)
+    """
+    snapshot_results = _fetch_snapshot_results(exam_id, limit, cursor)
+    if snapshot_results is not None:
+        return snapshot_results
+    return _fetch_exam_results(exam_id, _exam_results_query(exam_id), [], limit, cursor)
+
+def _load_top_universities():
     universities = (
         db.session.query(Universities.university_id, Universities.university_name)
         .filter(Universities.university_name.in_(TOP_UNIVERSITY_NAMES))
@@ -120,36 +169,28 @@ def list_top_universities():
     return [{"university_id": u.university_id, "university_name": u.university_name} for u in universities]
 
 
-def filter_exam_results(exam_id, name=None, university=None, university_id=None, faculty=None, order_min=None, order_max=None, include_top_universities=False):
-    # 模試タイプを取得
-    exam = db.session.query(Exams).filter(Exams.exam_id == exam_id).first()
-    exam_type = exam.exam_type if exam else None
-    
-    query = (
-        db.session.query(
-            Students.student_id,
-            Students.name,
-            Students.school_name,
-            ExamJudgements.preference_order,
-            ExamJudgements.judgement_kyote,
-            ExamJudgements.judgement_niji,
-            ExamJudgements.judgement_sougou,
-            Departments.department_name,
-            Faculties.faculty_name,
-            Universities.university_name,
-            Universities.university_id
-        )
-        .join(ExamResults, ExamResults.student_id == Students.student_id)
-        .join(ExamJudgements, ExamJudgements.result_id == ExamResults.result_id)
-        .outerjoin(Departments, Departments.department_id == ExamJudgements.department_id)
-        .outerjoin(Faculties, Faculties.faculty_id == Departments.faculty_id)
-        .outerjoin(Universities, Universities.university_id == Faculties.university_id)
-        .filter(ExamResults.exam_id == exam_id)
-    )
+def list_top_universities():
+    """難関10大学の一覧を取得（大学名ベースで検索、模試データの世代番号単位でキャッシュ）"""
+    return [dict(u) for u in cached_value("top_universities", (EXAMS_DATA,), _load_top_universities)]
 
-    # 検索条件に合致する大学が指定されているかどうかを判定
-    has_university_filter = include_top_universities or university_id or university
-    
+
+def get_exam_master():
+    """模試マスタ exam_code -> {"exam_name", "sort_key"}（コミット済みの内容、模試データの世代番号単位でキャッシュ）"""
+    return cached_value("exam_master", (EXAMS_DATA,), lambda: {
+        code: {"exam_name": name, "sort_key": sort_key}
+        for code, name, sort_key in db.session.query(ExamMaster.exam_code, ExamMaster.exam_name, ExamMaster.sort_key)
+    })
+
+
+def get_subject_master():
+    """科目マスタ subject_code -> subject_name（コミット済みの内容、模試データの世代番号単位でキャッシュ）"""
+    return cached_value("subject_master", (EXAMS_DATA,), lambda: dict(
+        db.session.query(SubjectMaster.subject_code, SubjectMaster.subject_name)
+    ))
+
+
+def _apply_result_filters(query, name=None, university=None, university_id=None, faculty=None, order_min=None, order_max=None, include_top_universities=False):
+    """/exams/filter の絞り込み条件を _exam_results_query に適用する"""
     if name:
         query = query.filter(Students.name.ilike(f"%{name}%"))
     if include_top_universities:
@@ -165,247 +206,196 @@ def filter_exam_results(exam_id, name=None, university=None, university_id=None,
         query = query.filter(Faculties.faculty_name.ilike(f"%{faculty}%"))
     if order_min and order_max:
         query = query.filter(ExamJudgements.preference_order.between(order_min, order_max))
+    return query
+
+
+def _judgement_rank(column):
+    """判定の優先順位を数値化（A=1, B=2, C=3, D=4, E=5, その他=6）"""
+    return case(
+        (column == "A", 1),
+        (column == "B", 2),
+        (column == "C", 3),
+        (column == "D", 4),
+        (column == "E", 5),
+        else_=6
+    )
+
+
+def _judgement_priority(exam_type):
+    """
+    並び替えに使う判定値
+    模試タイプが「共テ」の場合はjudgement_kyoteを優先、なければjudgement_niji
+    それ以外の場合はjudgement_niji優先
+    """
+    whens = []
+    if exam_type == "共テ":
+        whens.append((ExamJudgements.judgement_kyote.isnot(None), _judgement_rank(ExamJudgements.judgement_kyote)))
+    whens.append((ExamJudgements.judgement_niji.isnot(None), _judgement_rank(ExamJudgements.judgement_niji)))
+    return case(*whens, else_=6)
+
+
+def _student_sort_keys(exam_id):
+    """
+    大学絞り込み時の生徒単位の並び替えキー（最小志望順位, その志望順位での最良判定）
+    ウィンドウ関数で判定行の同じ走査内に求める
+    """
+    exam_type = db.session.query(Exams.exam_type).filter(Exams.exam_id == exam_id).scalar()
+    order_key = func.coalesce(ExamJudgements.preference_order, 9999)
+    # 志望順位なしの行は最良判定の対象外（従来どおり 6 扱い）
+    judgement_key = case(
+        (ExamJudgements.preference_order.is_(None), 6),
+        else_=_judgement_priority(exam_type)
+    )
+    min_pref_order = func.min(order_key).over(partition_by=Students.student_id)
+    best_judgement = func.first_value(judgement_key).over(
+        partition_by=Students.student_id,
+        order_by=(order_key, judgement_key)
+    )
+    return [min_pref_order, best_judgement]
+
+
+def _encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, size):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("cursor が不正です")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, int) for v in values):
+        raise ValueError("cursor が不正です")
+    return values
+
+
+def _fetch_exam_results(exam_id, query, sort_keys, limit=None, cursor=None):
+    """
+    判定行のクエリを生徒単位で並べ替え・ページングして整形する（志望列数は模試単位で _preference_columns）
+    - sort_keys: 生徒単位の並び替えキー（student_id の前に置く）
+    - limit 指定時は (sort_keys..., student_id) のキーセットで limit 人分だけ返す
+      cursor は前ページ末尾の生徒のキー値（_encode_cursor 済み）
+    - 戻り値: (一覧, 総人数, 次ページのカーソル or None)
+    """
+    row_order = (*sort_keys, Students.student_id, ExamJudgements.preference_order)
+    num_preferences = _preference_columns(exam_id)
+    if not limit:
+        results = _format_exam_results(query.order_by(*row_order).all(), num_preferences)
+        return results, len(results), None
+
+    limit = min(limit, MAX_RESULT_LIMIT)
+    # 判定行 → 生徒単位のキー（総人数は GROUP BY 後の COUNT(*) OVER() で同じクエリ内に求める）
+    key_cols = [k.label(f"sort_key_{i}") for i, k in enumerate(sort_keys)]
+    key_cols.append(Students.student_id.label("student_id"))
+    per_row = query.with_entities(*key_cols).subquery()
+    row_keys = [per_row.c[c.name] for c in key_cols]
+    per_student = (
+        select(*row_keys, func.count().over().label("total"))
+        .group_by(*row_keys)
+        .subquery()
+    )
+    keys = [per_student.c[c.name] for c in key_cols]
+
+    page_query = select(*keys, per_student.c.total)
+    if cursor:
+        page_query = page_query.where(tuple_(*keys) > tuple_(*_decode_cursor(cursor, len(keys))))
+    page = db.session.execute(page_query.order_by(*keys).limit(limit + 1)).all()
+
+    has_more = len(page) > limit
+    page = page[:limit]
+    if not page:
+        # カーソルが末尾を越えた場合のみ総人数を別途数える
+        total = db.session.execute(select(func.count()).select_from(per_student)).scalar()
+        return [], total, None
+    total = page[0].total
+
+    # ページ内の生徒の判定行のみ取得（ウィンドウは生徒単位なので絞り込んでもキーは変わらない）
+    student_ids = [r.student_id for r in page]
+    rows = query.filter(Students.student_id.in_(student_ids)).order_by(*row_order).all()
+    next_cursor = _encode_cursor(list(page[-1][:len(keys)])) if has_more else None
+    return _format_exam_results(rows, num_preferences), total, next_cursor
+
+
+def filter_exam_results(exam_id, name=None, university=None, university_id=None, faculty=None, order_min=None, order_max=None, include_top_universities=False, limit=None, cursor=None):
+    """
+    絞り込み条件付きの模試受験者の志望校一覧
+    - 大学指定時はその大学の志望度順（最小志望順位 → 最良判定 → student_id）、それ以外は student_id 順
+    - 戻り値: (一覧, 総人数, 次ページのカーソル)
+    """
+    if not (name or university or university_id or faculty or (order_min and order_max) or include_top_universities):
+        # 絞り込みなしは模試詳細と同じ（スナップショットから返す）
+        return get_exam_results(exam_id, limit, cursor)
+
+    query, sort_keys = _filtered_results_query(
+        exam_id, name, university, university_id, faculty, order_min, order_max, include_top_universities,
+    )
+    return _fetch_exam_results(exam_id, query, sort_keys, limit, cursor)
+
+
+def _filtered_results_query(exam_id, name=None, university=None, university_id=None, faculty=None, order_min=None, order_max=None, include_top_universities=False):
+    """絞り込み条件を適用した判定行クエリと、生徒単位の並び替えキー"""
+    query = _apply_result_filters(
+        _exam_results_query(exam_id),
+        name=name, university=university, university_id=university_id, faculty=faculty,
+        order_min=order_min, order_max=order_max, include_top_universities=include_top_universities,
+    )
 
     # 検索条件に合致する大学が指定されている場合、その大学の志望度順にソート
-    if has_university_filter:
-        # 各生徒の検索条件に合致する大学の最小志望順位を計算してソート
-        from sqlalchemy import func, case
-        
-        # サブクエリ用のクエリを作成（フィルタ条件は同じ）
-        subquery_base = (
-            db.session.query(
-                Students.student_id,
-                ExamJudgements.preference_order
-            )
-            .join(ExamResults, ExamResults.student_id == Students.student_id)
-            .join(ExamJudgements, ExamJudgements.result_id == ExamResults.result_id)
-            .outerjoin(Departments, Departments.department_id == ExamJudgements.department_id)
-            .outerjoin(Faculties, Faculties.faculty_id == Departments.faculty_id)
-            .outerjoin(Universities, Universities.university_id == Faculties.university_id)
-            .filter(ExamResults.exam_id == exam_id)
-        )
-        
-        # メインクエリと同じフィルタ条件を適用
-        if name:
-            subquery_base = subquery_base.filter(Students.name.ilike(f"%{name}%"))
-        if include_top_universities:
-            # 大学名ベースでフィルタリング
-            subquery_base = subquery_base.filter(Universities.university_name.in_(TOP_UNIVERSITY_NAMES))
-        elif university_id:
-            subquery_base = subquery_base.filter(Universities.university_id == university_id)
-        elif university:
-            subquery_base = subquery_base.filter(Universities.university_name.ilike(f"%{university}%"))
-        if faculty:
-            subquery_base = subquery_base.filter(Faculties.faculty_name.ilike(f"%{faculty}%"))
-        if order_min and order_max:
-            subquery_base = subquery_base.filter(ExamJudgements.preference_order.between(order_min, order_max))
-        
-        # 判定の優先順位を数値化（A=1, B=2, C=3, D=4, E=5, その他=6）
-        def judgment_priority(judgment):
-            if not judgment:
-                return 6
-            judgment_upper = str(judgment).strip().upper()
-            if judgment_upper == "A":
-                return 1
-            elif judgment_upper == "B":
-                return 2
-            elif judgment_upper == "C":
-                return 3
-            elif judgment_upper == "D":
-                return 4
-            elif judgment_upper == "E":
-                return 5
-            else:
-                return 6
-        
-        # 各生徒の最小志望順位と、その志望順位での最良判定を計算
-        min_pref_order = func.min(
-            case(
-                (ExamJudgements.preference_order.isnot(None), ExamJudgements.preference_order),
-                else_=9999
-            )
-        ).label('min_pref_order')
-        
-        # 判定の優先順位を数値化
-        # 模試タイプが「共テ」の場合はjudgement_kyoteを優先、なければjudgement_niji
-        # それ以外の場合はjudgement_niji優先
-        if exam_type == "共テ":
-            judgment_value = case(
-                (ExamJudgements.judgement_kyote.isnot(None),
-                 case(
-                     (ExamJudgements.judgement_kyote == "A", 1),
-                     (ExamJudgements.judgement_kyote == "B", 2),
-                     (ExamJudgements.judgement_kyote == "C", 3),
-                     (ExamJudgements.judgement_kyote == "D", 4),
-                     (ExamJudgements.judgement_kyote == "E", 5),
-                     else_=6
-                 )),
-                (ExamJudgements.judgement_niji.isnot(None),
-                 case(
-                     (ExamJudgements.judgement_niji == "A", 1),
-                     (ExamJudgements.judgement_niji == "B", 2),
-                     (ExamJudgements.judgement_niji == "C", 3),
-                     (ExamJudgements.judgement_niji == "D", 4),
-                     (ExamJudgements.judgement_niji == "E", 5),
-                     else_=6
-                 )),
-                else_=6
-            )
-        else:
-            # それ以外の場合はjudgement_niji優先
-            judgment_value = case(
-                (ExamJudgements.judgement_niji.isnot(None),
-                 case(
-                     (ExamJudgements.judgement_niji == "A", 1),
-                     (ExamJudgements.judgement_niji == "B", 2),
-                     (ExamJudgements.judgement_niji == "C", 3),
-                     (ExamJudgements.judgement_niji == "D", 4),
-                     (ExamJudgements.judgement_niji == "E", 5),
-                     else_=6
-                 )),
-                else_=6
-            )
-        
-        # まず最小志望順位を取得するサブクエリ
-        min_order_subquery = (
-            subquery_base.with_entities(
-                Students.student_id, 
-                min_pref_order
-            )
-            .group_by(Students.student_id)
-            .subquery()
-        )
-        
-        # 次に、最小志望順位での判定を取得するサブクエリ
-        # 判定の優先順位を数値化
-        # 模試タイプが「共テ」の場合はjudgement_kyoteを優先、なければjudgement_niji
-        # それ以外の場合はjudgement_niji優先
-        # A=1, B=2, C=3, D=4, E=5, その他=6
-        if exam_type == "共テ":
-            judgment_value_for_subquery = case(
-                (ExamJudgements.judgement_kyote.isnot(None),
-                 case(
-                     (ExamJudgements.judgement_kyote == "A", 1),
-                     (ExamJudgements.judgement_kyote == "B", 2),
-                     (ExamJudgements.judgement_kyote == "C", 3),
-                     (ExamJudgements.judgement_kyote == "D", 4),
-                     (ExamJudgements.judgement_kyote == "E", 5),
-                     else_=6
-                 )),
-                (ExamJudgements.judgement_niji.isnot(None),
-                 case(
-                     (ExamJudgements.judgement_niji == "A", 1),
-                     (ExamJudgements.judgement_niji == "B", 2),
-                     (ExamJudgements.judgement_niji == "C", 3),
-                     (ExamJudgements.judgement_niji == "D", 4),
-                     (ExamJudgements.judgement_niji == "E", 5),
-                     else_=6
-                 )),
-                else_=6
-            )
-        else:
-            # それ以外の場合はjudgement_niji優先
-            judgment_value_for_subquery = case(
-                (ExamJudgements.judgement_niji.isnot(None),
-                 case(
-                     (ExamJudgements.judgement_niji == "A", 1),
-                     (ExamJudgements.judgement_niji == "B", 2),
-                     (ExamJudgements.judgement_niji == "C", 3),
-                     (ExamJudgements.judgement_niji == "D", 4),
-                     (ExamJudgements.judgement_niji == "E", 5),
-                     else_=6
-                 )),
-                else_=6
-            )
-        
-        judgment_subquery_base = (
-            db.session.query(
-                Students.student_id,
-                ExamJudgements.preference_order,
-                judgment_value_for_subquery.label('judgment_priority')
-            )
-            .join(ExamResults, ExamResults.student_id == Students.student_id)
-            .join(ExamJudgements, ExamJudgements.result_id == ExamResults.result_id)
-            .outerjoin(Departments, Departments.department_id == ExamJudgements.department_id)
-            .outerjoin(Faculties, Faculties.faculty_id == Departments.faculty_id)
-            .outerjoin(Universities, Universities.university_id == Faculties.university_id)
-            .filter(ExamResults.exam_id == exam_id)
-        )
-        
-        # メインクエリと同じフィルタ条件を適用
-        if name:
-            judgment_subquery_base = judgment_subquery_base.filter(Students.name.ilike(f"%{name}%"))
-        if include_top_universities:
-            # 大学名ベースでフィルタリング
-            judgment_subquery_base = judgment_subquery_base.filter(Universities.university_name.in_(TOP_UNIVERSITY_NAMES))
-        elif university_id:
-            judgment_subquery_base = judgment_subquery_base.filter(Universities.university_id == university_id)
-        elif university:
-            judgment_subquery_base = judgment_subquery_base.filter(Universities.university_name.ilike(f"%{university}%"))
-        if faculty:
-            judgment_subquery_base = judgment_subquery_base.filter(Faculties.faculty_name.ilike(f"%{faculty}%"))
-        if order_min and order_max:
-            judgment_subquery_base = judgment_subquery_base.filter(ExamJudgements.preference_order.between(order_min, order_max))
-        
-        # 最小志望順位での最良判定を取得
-        best_judgment = func.min(judgment_value_for_subquery).label('best_judgment')
-        
-        judgment_subquery = (
-            judgment_subquery_base
-            .join(min_order_subquery, Students.student_id == min_order_subquery.c.student_id)
-            .filter(ExamJudgements.preference_order == min_order_subquery.c.min_pref_order)
-            .with_entities(Students.student_id, best_judgment)
-            .group_by(Students.student_id)
-            .subquery()
-        )
-        
-        # メインクエリに両方のサブクエリを結合してソート
-        rows = (
-            query
-            .join(min_order_subquery, Students.student_id == min_order_subquery.c.student_id)
-            .outerjoin(judgment_subquery, Students.student_id == judgment_subquery.c.student_id)
-            .order_by(
-                min_order_subquery.c.min_pref_order,
-                func.coalesce(judgment_subquery.c.best_judgment, 6),
-                Students.student_id,
-                ExamJudgements.preference_order
-            )
-            .all()
-        )
-    else:
-        # 検索条件に合致する大学が指定されていない場合は従来通り
-        rows = query.order_by(Students.student_id, ExamJudgements.preference_order).all()
-    
-    return _format_exam_results(rows)
+    has_university_filter = include_top_universities or university_id or university
+    sort_keys = _student_sort_keys(exam_id) if has_university_filter else []
+    return query, sort_keys
+
+
+def iter_filtered_exam_results(exam_id, name=None, university=None, university_id=None, faculty=None, order_min=None, order_max=None, include_top_universities=False):
+    """
+    エクスポート用: filter_exam_results と同じ条件・並び順の生徒を1人ずつ返す
+    - 判定行はサーバーサイドカーソル（yield_per）で EXPORT_FETCH_SIZE 行ずつ読み、生徒が切り替わるたびに返す
+    - 戻り値: (志望列数, 生徒のイテレーター)。生徒は _group_exam_rows と同じ形式
+    """
+    query, sort_keys = _filtered_results_query(
+        exam_id, name, university, university_id, faculty, order_min, order_max, include_top_universities,
+    )
+    # 志望列数は画面の一覧と同じ（模試単位）
+    num_preferences = _preference_columns(exam_id)
+    rows = query.order_by(*sort_keys, Students.student_id, ExamJudgements.preference_order).yield_per(EXPORT_FETCH_SIZE)
+
+    def students():
+        # 同じ生徒の判定行は連続して届く
+        current = []
+        for row in rows:
+            if current and row[0] != current[0][0]:
+                yield from _group_exam_rows(current)
+                current = []
+            current.append(row)
+        yield from _group_exam_rows(current)
+
+    return num_preferences, students()
 
 
 # 共通整形関数
-def _format_exam_results(rows):
+def _group_exam_rows(rows):
+    """判定行を生徒単位にまとめる（志望: 志望順位 -> 大学・学部・学科名と判定）"""
     grouped = {}
-    max_order = 0
-    
-    for r in rows:
-        sid = r.student_id
-        if r.preference_order and r.preference_order > max_order:
-            max_order = r.preference_order
-        
+
+    # 行は _exam_results_query の列順（属性アクセスより位置での展開の方が高速なため）
+    for (sid, name, school_name, order, kyote, niji, sougou,
+         department_name, faculty_name, university_name, _) in rows:
         if sid not in grouped:
             grouped[sid] = {
                 "student_id": sid,
-                "name": r.name,
-                "school_name": r.school_name,
+                "name": name,
+                "school_name": school_name,
                 "志望": {}
             }
 
-        uni = (r.university_name or "").strip()
-        fac = (r.faculty_name or "").strip()
-        dep = (r.department_name or "").strip()
-        jk = (r.judgement_kyote or "").strip()
-        jn = (r.judgement_niji or "").strip()
-        js = (r.judgement_sougou or "").strip()
+        uni = (university_name or "").strip()
+        fac = (faculty_name or "").strip()
+        dep = (department_name or "").strip()
+        jk = (kyote or "").strip()
+        jn = (niji or "").strip()
+        js = (sougou or "").strip()
         
-        if r.preference_order:
-            grouped[sid]["志望"][r.preference_order] = {
+        if order:
+            grouped[sid]["志望"][order] = {
                 "university_name": uni,
                 "faculty_name": fac,
                 "department_name": dep,
@@ -414,11 +404,29 @@ def _format_exam_results(rows):
                 "judgement_sougou": js
             }
 
-    # 最大順位まで列を生成（最低でも5まで、最大順位が5より大きい場合はそれまで）
-    max_cols = max(max_order, 5) if max_order > 0 else 5
-    
+    return list(grouped.values())
+
+
+def _preference_columns(exam_id):
+    """
+    模試の第N志望の列数（全受験者の最大志望順位、最低5列。模試データの世代番号単位でキャッシュ）
+    - ページ・絞り込み・エクスポートで列が変わらないよう、表示中の行ではなく模試全体から決める
+    """
+    def load():
+        max_order = (
+            db.session.query(func.max(ExamJudgements.preference_order))
+            .join(ExamResults, ExamResults.result_id == ExamJudgements.result_id)
+            .filter(ExamResults.exam_id == exam_id)
+            .scalar()
+        )
+        return max(max_order or 0, 5)
+    return cached_value(f"preference_columns:{exam_id}", (EXAMS_DATA,), load)
+
+
+def _pivot_preferences(students, max_cols):
+    """生徒単位の志望を第1〜max_cols志望の列に展開する"""
     result = []
-    for s in grouped.values():
+    for s in students:
         row = {
             "student_id": s["student_id"],
             "name": s["name"],
@@ -430,3 +438,121 @@ def _format_exam_results(rows):
         result.append(row)
 
     return result
+
+
+def _format_exam_results(rows, num_preferences):
+    return _pivot_preferences(_group_exam_rows(rows), num_preferences)
+
+
+# ------------------------
+# 模試ごとの整形済みスナップショット
+# ------------------------
+# 取り込み済みの模試結果は重複取り込みが拒否されるため基本的に変化しない。
+# 絞り込みなしの一覧は exam_snapshot_rows（生徒1行・志望は JSON）から直接返す。
+# - 模試インポート時: 取り込んだ模試を同じトランザクション内で作り直す
+# - 生徒インポートで氏名・高校名が変わった場合: 該当生徒が受験した模試を破棄
+# - 未作成の模試は初回参照時に作成する
+def rebuild_exam_snapshots(exam_ids):
+    """指定模試のスナップショットを作り直す（コミットは呼び出し元で行う）"""
+    exam_ids = sorted(set(exam_ids))
+    if not exam_ids:
+        return
+    invalidate_exam_snapshots(exam_ids)
+    now = datetime.utcnow()
+    for exam_id in exam_ids:
+        rows = (
+            _exam_results_query(exam_id)
+            .order_by(Students.student_id, ExamJudgements.preference_order)
+            .all()
+        )
+        students = _group_exam_rows(rows)
+        db.session.execute(insert(ExamSnapshots), [
+            {"exam_id": exam_id, "num_students": len(students), "built_at": now}
+        ])
+        if students:
+            db.session.execute(insert(ExamSnapshotRows), [
+                {
+                    "exam_id": exam_id,
+                    "student_id": st["student_id"],
+                    "name": st["name"],
+                    "school_name": st["school_name"],
+                    # JSON のキーは文字列になるため志望順位は文字列で保存する
+                    "preferences": {str(order): pref for order, pref in st["志望"].items()},
+                }
+                for st in students
+            ])
+
+
+def invalidate_exam_snapshots(exam_ids=None):
+    """
+    スナップショットを破棄する（次回参照時に作り直される）
+    exam_ids 省略時は全模試（大学・学部・学科名をDBで直接修正した場合など）
+    """
+    rows_delete = delete(ExamSnapshotRows)
+    snapshots_delete = delete(ExamSnapshots)
+    if exam_ids is not None:
+        exam_ids = list(exam_ids)
+        if not exam_ids:
+            return
+        rows_delete = rows_delete.where(ExamSnapshotRows.exam_id.in_(exam_ids))
+        snapshots_delete = snapshots_delete.where(ExamSnapshots.exam_id.in_(exam_ids))
+    db.session.execute(rows_delete)
+    db.session.execute(snapshots_delete)
+
+
+def _get_or_build_snapshot(exam_id):
+    snapshot = db.session.get(ExamSnapshots, exam_id)
+    if snapshot is not None:
+        return snapshot
+    if db.session.get(Exams, exam_id) is None:
+        return None
+    try:
+        rebuild_exam_snapshots([exam_id])
+        db.session.commit()
+    except IntegrityError:
+        # 別リクエストが同時に作成した場合はそちらを使う
+        db.session.rollback()
+    return db.session.get(ExamSnapshots, exam_id)
+
+
+def _fetch_snapshot_results(exam_id, limit=None, cursor=None):
+    """
+    スナップショットから絞り込みなしの一覧を返す（student_id 順、カーソルは _fetch_exam_results と共通）
+    - 戻り値: (一覧, 総人数, 次ページのカーソル)、模試が存在しない場合は None
+    """
+    snapshot = _get_or_build_snapshot(exam_id)
+    if snapshot is None:
+        return None
+    query = (
+        db.session.query(
+            ExamSnapshotRows.student_id,
+            ExamSnapshotRows.name,
+            ExamSnapshotRows.school_name,
+            ExamSnapshotRows.preferences,
+        )
+        .filter(ExamSnapshotRows.exam_id == exam_id)
+        .order_by(ExamSnapshotRows.student_id)
+    )
+    next_cursor = None
+    if limit:
+        limit = min(limit, MAX_RESULT_LIMIT)
+        if cursor:
+            (after,) = _decode_cursor(cursor, 1)
+            query = query.filter(ExamSnapshotRows.student_id > after)
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor([rows[-1].student_id])
+    else:
+        rows = query.all()
+
+    students = [
+        {
+            "student_id": sid,
+            "name": name,
+            "school_name": school_name,
+            "志望": {int(order): pref for order, pref in preferences.items()},
+        }
+        for sid, name, school_name, preferences in rows
+    ]
+    return _pivot_preferences(students, _preference_columns(exam_id)), snapshot.num_students, next_cursor
@@ -0,0 +1,267 @@
+# backend/flaskr/services/exam_stats_service.py
+# 模試ごとの集計（科目別の得点・偏差値の分布、大学別の判定人数）
+# - 模試インポート時に取り込んだ模試分を同じトランザクション内で作り直し、exam_*_stats に保存する
+# - 集計は全体（all）・高校別（school）・学年別（grade）の3通りを持ち、参照時は保存済みの行を返すだけにする
+# - 高校名・学年は現在の生徒情報に合わせる（生徒インポート・年度更新で高校名・学年が変わった生徒が受験した模試分を破棄し、次回参照時に作り直す）
+# - 未作成の模試は初回参照時に作成する
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import Float, cast, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models import (
+    Students, Exams, ExamResults, SubjectScores, ExamJudgements,
+    Departments, Faculties, Universities,
+    ExamStats, ExamSubjectStats, ExamJudgementStats,
+)
+from .exam_service import get_subject_master
+
+GROUP_BY = ("all", "school", "grade")
+# 集計の内訳に使う生徒の列
+GROUP_COLUMNS = {"school": "school_name", "grade": "grade"}
+# 偏差値の度数分布の区切り（35未満, 35〜40未満, …, 75以上 の10区間）
+DEVIATION_EDGES = (35, 40, 45, 50, 55, 60, 65, 70, 75)
+JUDGEMENT_KINDS = ("kyote", "niji", "sougou")
+JUDGEMENT_LETTERS = ("A", "B", "C", "D", "E")
+
+
+def _with_groups(df):
+    """行を all / school / grade の3通りに複製し、group_by・group_value 列を付ける"""
+    frames = [df.assign(group_by="all", group_value="")]
+    for group_by, column in GROUP_COLUMNS.items():
+        frames.append(df.assign(group_by=group_by, group_value=df[column].fillna("")))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _fetch_tuples(query):
+    """集計用の行を Row を組み立てずに DBAPI のカーソルから tuple のまま受け取る（列は型変換の不要なものに限る）"""
+    result = db.session.connection().execute(query)
+    try:
+        return result.cursor.fetchall()
+    finally:
+        result.close()
+
+
+def _subject_stats_records(exam_id):
+    rows = _fetch_tuples(
+        select(
+            Students.school_name,
+            Students.grade,
+            SubjectScores.subject_code,
+            SubjectScores.score,
+            cast(SubjectScores.deviation_value, Float).label("deviation"),
+        )
+        .join(ExamResults, ExamResults.result_id == SubjectScores.result_id)
+        .join(Students, Students.student_id == ExamResults.student_id)
+        .where(ExamResults.exam_id == exam_id)
+    )
+    if not rows:
+        return []
+    df = _with_groups(pd.DataFrame(rows, columns=["school_name", "grade", "subject_code", "score", "deviation"]))
+    df["bucket"] = np.searchsorted(DEVIATION_EDGES, df["deviation"].to_numpy(), side="right")
+
+    keys = ["subject_code", "group_by", "group_value"]
+    grouped = df.groupby(keys, sort=True)
+    summary = grouped.agg(
+        num_students=("score", "size"),
+        score_mean=("score", "mean"),
+        score_min=("score", "min"),
+        score_max=("score", "max"),
+        deviation_mean=("deviation", "mean"),
+        deviation_min=("deviation", "min"),
+        deviation_max=("deviation", "max"),
+    )
+    # 標準偏差は母標準偏差（1人のみの内訳は 0）
+    summary["score_stddev"] = grouped["score"].std(ddof=0)
+    summary["deviation_stddev"] = grouped["deviation"].std(ddof=0)
+    quantiles = grouped[["score", "deviation"]].quantile([0.25, 0.5, 0.75]).unstack()
+    for column in ("score", "deviation"):
+        for q, name in ((0.25, "p25"), (0.5, "p50"), (0.75, "p75")):
+            summary[f"{column}_{name}"] = quantiles[(column, q)]
+    histogram = (
+        df.groupby(keys + ["bucket"]).size()
+        .unstack(fill_value=0)
+        .reindex(columns=range(len(DEVIATION_EDGES) + 1), fill_value=0)
+    )
+
+    records = []
+    for key, s in zip(summary.index, summary.itertuples(index=False)):
+        subject_code, group_by, group_value = key
+        record = {"exam_id": exam_id, "subject_code": int(subject_code), "group_by": group_by, "group_value": group_value}
+        for column, value in s._asdict().items():
+            record[column] = int(value) if column in ("num_students", "score_min", "score_max") else round(float(value), 2)
+        record["deviation_histogram"] = [int(c) for c in histogram.loc[key]]
+        records.append(record)
+    return records
+
+
+def _judgement_stats_records(exam_id):
+    rows = _fetch_tuples(
+        select(
+            Students.school_name,
+            Students.grade,
+            Faculties.university_id,
+            ExamJudgements.judgement_kyote.label("kyote"),
+            ExamJudgements.judgement_niji.label("niji"),
+            ExamJudgements.judgement_sougou.label("sougou"),
+        )
+        .join(ExamResults, ExamResults.result_id == ExamJudgements.result_id)
+        .join(Students, Students.student_id == ExamResults.student_id)
+        .join(Departments, Departments.department_id == ExamJudgements.department_id)
+        .join(Faculties, Faculties.faculty_id == Departments.faculty_id)
+        .where(ExamResults.exam_id == exam_id)
+    )
+    if not rows:
+        return []
+    df = pd.DataFrame(rows, columns=["school_name", "grade", "university_id", *JUDGEMENT_KINDS])
+    # 判定の種類ごとに縦持ちにし、判定なしは除外、A〜E 以外は other にまとめる
+    df = df.melt(id_vars=["school_name", "grade", "university_id"], value_vars=list(JUDGEMENT_KINDS), var_name="kind", value_name="judgement")
+    df = df[df["judgement"].notna() & (df["judgement"] != "")]
+    if df.empty:
+        return []
+    df["letter"] = df["judgement"].where(df["judgement"].isin(JUDGEMENT_LETTERS), "other")
+    df = _with_groups(df)
+
+    counts = (
+        df.groupby(["university_id", "group_by", "group_value", "kind", "letter"]).size()
+        .unstack(fill_value=0)
+        .reindex(columns=[*JUDGEMENT_LETTERS, "other"], fill_value=0)
+    )
+    return [
+        {
+            "exam_id": exam_id,
+            "university_id": int(university_id),
+            "group_by": group_by,
+            "group_value": group_value,
+            "kind": kind,
+            **{f"count_{letter.lower()}": int(c) for letter, c in zip(counts.columns, values)},
+        }
+        for (university_id, group_by, group_value, kind), values in zip(counts.index, counts.to_numpy())
+    ]
+
+
+def rebuild_exam_stats(exam_ids):
+    """指定模試の集計を作り直す（コミットは呼び出し元で行う）"""
+    exam_ids = sorted(set(exam_ids))
+    if not exam_ids:
+        return
+    invalidate_exam_stats(exam_ids)
+    now = datetime.utcnow()
+    for exam_id in exam_ids:
+        num_students = db.session.query(ExamResults.student_id).filter(ExamResults.exam_id == exam_id).count()
+        db.session.execute(insert(ExamStats), [
+            {"exam_id": exam_id, "num_students": num_students, "built_at": now}
+        ])
+        subject_records = _subject_stats_records(exam_id)
+        if subject_records:
+            db.session.execute(insert(ExamSubjectStats), subject_records)
+        judgement_records = _judgement_stats_records(exam_id)
+        if judgement_records:
+            db.session.execute(insert(ExamJudgementStats), judgement_records)
+
+
+def invalidate_exam_stats(exam_ids=None):
+    """
+    集計を破棄する（次回参照時に作り直される）
+    exam_ids 省略時は全模試
+    """
+    statements = [delete(ExamSubjectStats), delete(ExamJudgementStats), delete(ExamStats)]
+    if exam_ids is not None:
+        exam_ids = list(exam_ids)
+        if not exam_ids:
+            return
+        statements = [
+            delete(ExamSubjectStats).where(ExamSubjectStats.exam_id.in_(exam_ids)),
+            delete(ExamJudgementStats).where(ExamJudgementStats.exam_id.in_(exam_ids)),
+            delete(ExamStats).where(ExamStats.exam_id.in_(exam_ids)),
+        ]
+    for statement in statements:
+        db.session.execute(statement)
+
+
+def _get_or_build_stats(exam_id):
+    stats = db.session.get(ExamStats, exam_id)
+    if stats is not None:
+        return stats
+    if db.session.get(Exams, exam_id) is None:
+        return None
+    try:
+        rebuild_exam_stats([exam_id])
+        db.session.commit()
+    except IntegrityError:
+        # 別リクエストが同時に作成した場合はそちらを使う
+        db.session.rollback()
+    return db.session.get(ExamStats, exam_id)
+
+
+def get_exam_stats(exam_id, group_by="all", subject_code=None, university_id=None):
+    """
+    模試の集計を返す（group_by: all / school / grade、不正な値は ValueError）
+    - 戻り値: {"exam_id", "num_students", "built_at", "group_by", "deviation_edges", "subjects": [...], "judgements": [...]}、
+      模試が存在しない場合は None
+    """
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by は {', '.join(GROUP_BY)} のいずれかで指定してください")
+    stats = _get_or_build_stats(exam_id)
+    if stats is None:
+        return None
+
+    subject_query = (
+        db.session.query(ExamSubjectStats)
+        .filter(ExamSubjectStats.exam_id == exam_id, ExamSubjectStats.group_by == group_by)
+        .order_by(ExamSubjectStats.subject_code, ExamSubjectStats.group_value)
+    )
+    if subject_code is not None:
+        subject_query = subject_query.filter(ExamSubjectStats.subject_code == subject_code)
+    subject_names = get_subject_master()
+    subjects = [
+        {
+            "subject_code": s.subject_code,
+            "subject_name": subject_names.get(s.subject_code),
+            "group_value": s.group_value or None,
+            "num_students": s.num_students,
+            "score": {
+                "mean": s.score_mean, "stddev": s.score_stddev, "min": s.score_min, "max": s.score_max,
+                "p25": s.score_p25, "p50": s.score_p50, "p75": s.score_p75,
+            },
+            "deviation": {
+                "mean": s.deviation_mean, "stddev": s.deviation_stddev, "min": s.deviation_min, "max": s.deviation_max,
+                "p25": s.deviation_p25, "p50": s.deviation_p50, "p75": s.deviation_p75,
+                "histogram": s.deviation_histogram,
+            },
+        }
+        for s in subject_query
+    ]
+
+    judgement_query = (
+        db.session.query(ExamJudgementStats, Universities.university_name)
+        .join(Universities, Universities.university_id == ExamJudgementStats.university_id)
+        .filter(ExamJudgementStats.exam_id == exam_id, ExamJudgementStats.group_by == group_by)
+        .order_by(Universities.university_name, ExamJudgementStats.group_value, ExamJudgementStats.kind)
+    )
+    if university_id is not None:
+        judgement_query = judgement_query.filter(ExamJudgementStats.university_id == university_id)
+    judgements = [
+        {
+            "university_id": j.university_id,
+            "university_name": university_name,
+            "group_value": j.group_value or None,
+            "kind": j.kind,
+            "counts": {
+                "A": j.count_a, "B": j.count_b, "C": j.count_c, "D": j.count_d, "E": j.count_e,
+                "other": j.count_other,
+            },
+        }
+        for j, university_name in judgement_query
+    ]
+
+    return {
+        "exam_id": exam_id,
+        "num_students": stats.num_students,
+        "built_at": stats.built_at.isoformat(),
+        "group_by": group_by,
+        "deviation_edges": list(DEVIATION_EDGES),
+        "subjects": subjects,
+        "judgements": judgements,
+    }
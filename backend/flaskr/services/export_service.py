@@ -0,0 +1,85 @@
+# backend/flaskr/services/export_service.py
+# 模試結果一覧の CSV / XLSX 出力（ストリーミング）
+import csv
+import io
+import tempfile
+from openpyxl import Workbook
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_MIMETYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# 志望ごとの列（キー, 見出し）
+PREFERENCE_COLUMNS = (
+    ("university_name", "大学"),
+    ("faculty_name", "学部"),
+    ("department_name", "募集区分"),
+    ("judgement_kyote", "共テ"),
+    ("judgement_niji", "2次"),
+    ("judgement_sougou", "総合"),
+)
+
+# XLSX をメモリ上に組み立てる上限（超えた分は一時ファイルへ）
+XLSX_SPOOL_SIZE = 8 * 1024 * 1024
+# XLSX を送出する際のチャンクサイズ
+XLSX_CHUNK_SIZE = 64 * 1024
+
+
+def exam_results_header(num_preferences):
+    header = ["マナビス生番号", "氏名", "高校名"]
+    for i in range(1, num_preferences + 1):
+        header.extend(f"第{i}志望 {label}" for _, label in PREFERENCE_COLUMNS)
+    return header
+
+
+def exam_results_row(student, num_preferences):
+    """_group_exam_rows 形式の生徒1人を1行に展開する"""
+    row = [student["student_id"], student["name"], student["school_name"]]
+    for i in range(1, num_preferences + 1):
+        pref = student["志望"].get(i, {})
+        row.extend(pref.get(key, "") for key, _ in PREFERENCE_COLUMNS)
+    return row
+
+
+def stream_csv(num_preferences, students):
+    """
+    1行ずつ CSV（UTF-8 BOM 付き、Excel でそのまま開ける）を返すジェネレーター
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\r\n")
+
+    def flush():
+        data = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return data.encode("utf-8")
+
+    writer.writerow(exam_results_header(num_preferences))
+    yield "\ufeff".encode("utf-8") + flush()
+    for student in students:
+        writer.writerow(exam_results_row(student, num_preferences))
+        yield flush()
+
+
+def stream_xlsx(num_preferences, students, title="模試結果"):
+    """
+    openpyxl の write-only モードで XLSX を組み立てて返すジェネレーター
+    - 行は追加した時点で openpyxl の一時ファイルへ書き出されるため、人数によらずメモリ使用量は一定
+    - ZIP（XLSX）は全行の追加後に確定するため、送出はシートの組み立て完了後から始まる
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(exam_results_header(num_preferences))
+    for student in students:
+        ws.append(exam_results_row(student, num_preferences))
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE) as f:
+        wb.save(f)
+        f.seek(0)
+        while True:
+            chunk = f.read(XLSX_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
@@ -0,0 +1,368 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, update
+from werkzeug.datastructures import FileStorage
+from .. import db, metrics
+from ..models import ImportJobs
+from . import import_service, import_profiler
+
+logger = logging.getLogger(__name__)
+
+# アップロードファイルの一時保存先（ジョブ完了後に削除）
+JOB_DIR = os.getenv("IMPORT_JOB_DIR") or os.path.join(tempfile.gettempdir(), "manavis_import_jobs")
+# 1プロセスあたりの同時実行インポート数
+JOB_WORKERS = int(os.getenv("IMPORT_JOB_WORKERS", "1"))
+# ジョブの実行場所
+#   process:  API プロセスが起動するインポート専用の子プロセス（既定。インポートの CPU 処理がリクエスト処理のスレッドと GIL を取り合わない）
+#   thread:   API プロセス内のインポート専用スレッドプール（リクエスト処理のスレッドとは別）
+#   external: API プロセスは登録のみ行い、import_worker.py（別プロセス）が queued のジョブを取り出して実行する
+#             （JOB_DIR は API とワーカーで共有されていること）
+JOB_MODE = os.getenv("IMPORT_JOB_MODE", "process").strip().lower()
+# process / external でインポートを実行するプロセスの nice 値の増分（CPU をリクエスト処理に優先して割り当てる、0 で変更しない）
+JOB_NICE = int(os.getenv("IMPORT_JOB_NICE", "5"))
+# 同期エンドポイントでジョブの完了を待つ間の確認間隔（秒、external のみ）
+JOB_POLL_INTERVAL = float(os.getenv("IMPORT_JOB_POLL_INTERVAL", "0.5"))
+# 同期エンドポイントでジョブの完了を待つ上限（秒）。過ぎた場合は実行中のジョブ情報を返す（ジョブは続行する）
+JOB_SYNC_TIMEOUT = float(os.getenv("IMPORT_JOB_SYNC_TIMEOUT", "150"))
+# 実行中のジョブの heartbeat_at を更新する間隔（秒）
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("IMPORT_JOB_HEARTBEAT_INTERVAL", "10"))
+# heartbeat_at がこの秒数より古い running のジョブは、実行していたプロセスが終了したとみなして failed にする
+JOB_STALE_AFTER = float(os.getenv("IMPORT_JOB_STALE_AFTER", "120"))
+
+# kind -> (インポート関数, 保存時の拡張子, 進捗コールバック対応)
+IMPORT_RUNNERS = {
+    "exams_xlsx": (import_service.import_exams_from_xlsx, ".xlsx", True),
+    "students": (import_service.import_students_from_csv, ".csv", False),
+}
+
+_executor_lock = threading.Lock()
+_executor = None
+# process モードの子プロセス内のアプリ（_init_job_process で作成）
+_process_app = None
+
+
+class StaleImportJobError(RuntimeError):
+    """実行していたプロセスが終了し、heartbeat が途絶えたジョブ"""
+
+
+def _get_executor():
+    global _executor
+    # gthread ワーカーでは複数のリクエストスレッドから同時に呼ばれる
+    with _executor_lock:
+        if _executor is None:
+            # 前回のプロセスで実行中のまま残ったジョブを片付けてから受け付ける
+            fail_stale_jobs()
+            if JOB_MODE == "process":
+                # gthread ワーカーはスレッドを持つため fork せず、新しいインタープリターで起動する
+                _executor = ProcessPoolExecutor(
+                    max_workers=JOB_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_job_process,
+                )
+            else:
+                _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="import-job")
+        return _executor
+
+
+def _discard_executor(executor):
+    """異常終了した子プロセスのプール（BrokenProcessPool）を破棄し、次回の投入で作り直す"""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+
+def lower_job_priority():
+    """インポートを実行するプロセスの優先度を下げる（process モードの子プロセス・import_worker.py）"""
+    if JOB_NICE and hasattr(os, "nice"):
+        try:
+            os.nice(JOB_NICE)
+        except OSError:
+            logger.warning("インポートのプロセスの優先度を変更できませんでした", exc_info=True)
+
+
+def _init_job_process():
+    """process モードの子プロセスの初期化（優先度を下げ、ジョブの実行に使うアプリを作る）"""
+    global _process_app
+    lower_job_priority()
+    from .. import create_app
+    _process_app = create_app(import_process=True)
+
+
+def _run_job_in_process(job_id: str, kind: str, path: str, filename: str, profile=None):
+    _run_job(_process_app, job_id, kind, path, filename, profile)
+
+
+def _fail_lost_job(job_id: str, exc: BaseException):
+    """実行側のプロセスの異常終了などで結果が返らなかったジョブを failed にする（_run_job 自体は例外を送出しない）"""
+    with db.engine.begin() as conn:
+        conn.execute(
+            update(ImportJobs)
+            .where(ImportJobs.job_id == job_id, ImportJobs.status.in_(("queued", "running")))
+            .values(
+                status="failed",
+                error=f"インポートを実行するプロセスが異常終了しました: {exc}",
+                error_type=type(exc).__name__,
+                finished_at=datetime.utcnow(),
+            )
+        )
+
+
+def _on_job_done(app, executor, job_id: str, future):
+    if future.cancelled() or future.exception() is None:
+        return
+    if isinstance(future.exception(), BrokenProcessPool):
+        _discard_executor(executor)
+    with app.app_context():
+        _fail_lost_job(job_id, future.exception())
+
+
+def _submit(app, job_id: str, kind: str, path: str, filename: str, profile=None):
+    """インポート専用のプールへ投入する（子プロセスの異常終了でプールが使えない場合は作り直して1回だけ再投入）"""
+    for retry in (False, True):
+        executor = _get_executor()
+        try:
+            if JOB_MODE == "process":
+                future = executor.submit(_run_job_in_process, job_id, kind, path, filename, profile)
+            else:
+                future = executor.submit(_run_job, app, job_id, kind, path, filename, profile)
+        except BrokenProcessPool:
+            _discard_executor(executor)
+            if retry:
+                raise
+            continue
+        future.add_done_callback(lambda f: _on_job_done(app, executor, job_id, f))
+        return future
+
+
+def _job_to_dict(job: ImportJobs):
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "filename": job.filename,
+        "rows_processed": job.rows_processed,
+        "progress": job.progress,
+        "result": job.result,
+        "error": job.error,
+        "error_type": job.error_type,
+        "profile": job.profile,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _update_job(job_id: str, **values):
+    """インポート本体のトランザクションとは別接続で進捗を即時コミットする（heartbeat_at も更新する）"""
+    values.setdefault("heartbeat_at", datetime.utcnow())
+    with db.engine.begin() as conn:
+        conn.execute(update(ImportJobs).where(ImportJobs.job_id == job_id).values(**values))
+
+
+@contextmanager
+def _heartbeat(app, job_id: str):
+    """ブロックの実行中、進捗の書き込みが無くても JOB_HEARTBEAT_INTERVAL ごとに heartbeat_at を更新する"""
+    stop = threading.Event()
+
+    def beat():
+        with app.app_context():
+            while not stop.wait(JOB_HEARTBEAT_INTERVAL):
+                try:
+                    _update_job(job_id)
+                except Exception:
+                    logger.warning("インポートジョブ %s の heartbeat を更新できませんでした", job_id, exc_info=True)
+
+    thread = threading.Thread(target=beat, name="import-job-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _is_stale(last_seen):
+    return last_seen is None or last_seen < datetime.utcnow() - timedelta(seconds=JOB_STALE_AFTER)
+
+
+def fail_stale_jobs(job_id=None):
+    """
+    heartbeat が JOB_STALE_AFTER 秒より古い running のジョブを failed にする（job_id 指定時はそのジョブのみ）
+    - API プロセス・import_worker.py の強制終了などで running のまま残ったジョブを終わらせる
+    - 戻り値: failed にした件数
+    """
+    now = datetime.utcnow()
+    query = update(ImportJobs).where(
+        ImportJobs.status == "running",
+        func.coalesce(ImportJobs.heartbeat_at, ImportJobs.started_at) < now - timedelta(seconds=JOB_STALE_AFTER),
+    )
+    if job_id is not None:
+        query = query.where(ImportJobs.job_id == job_id)
+    with db.engine.begin() as conn:
+        failed = conn.execute(query.values(
+            status="failed",
+            error=f"インポートを実行していたプロセスの応答が {JOB_STALE_AFTER:g} 秒以上途絶えたため中断しました",
+            error_type=StaleImportJobError.__name__,
+            finished_at=now,
+        )).rowcount
+    if failed:
+        logger.warning("応答の途絶えたインポートジョブ %d 件を failed にしました", failed)
+    return failed
+
+
+def _job_path(job_id: str, kind: str):
+    _, ext, _ = IMPORT_RUNNERS[kind]
+    return os.path.join(JOB_DIR, f"{job_id}{ext}")
+
+
+def _enqueue(kind: str, file: FileStorage, profile=None):
+    """アップロードを保存してジョブを登録し、process / thread モードならインポート専用プールへ投入する（戻り値: (ジョブ, Future または None)）"""
+    if kind not in IMPORT_RUNNERS:
+        raise ValueError(f"未対応のインポート種別です: {kind}")
+    profile = (profile or "").strip().lower() or None
+    if profile and profile not in import_profiler.PROFILE_MODES:
+        raise ValueError(f"profile は {' / '.join(import_profiler.PROFILE_MODES)} のいずれかを指定してください: {profile}")
+
+    job_id = uuid.uuid4().hex
+    os.makedirs(JOB_DIR, exist_ok=True)
+    path = _job_path(job_id, kind)
+    file.save(path)
+
+    job = ImportJobs(job_id=job_id, kind=kind, status="queued", filename=file.filename, profile=profile)
+    db.session.add(job)
+    db.session.commit()
+
+    future = None
+    if JOB_MODE != "external":
+        future = _submit(current_app._get_current_object(), job_id, kind, path, file.filename, profile)
+    return job, future
+
+
+def submit_import_job(kind: str, file: FileStorage, profile=None):
+    """
+    アップロードをローカルディスクへ保存し、ジョブを登録してインポート用のワーカーで実行する
+    - 戻り値はジョブ情報（status=queued）。進捗は get_import_job で取得する
+    - profile（cprofile / pyinstrument）を指定するとこのジョブのプロファイルを保存する（省略時は IMPORT_PROFILE）
+    """
+    job, _ = _enqueue(kind, file, profile)
+    return _job_to_dict(job)
+
+
+def run_import_job(kind: str, file: FileStorage, profile=None):
+    """
+    submit_import_job と同じくインポート用のワーカーで実行し、完了まで待ってジョブ情報を返す（同期エンドポイント用）
+    - リクエスト処理のスレッドは待つだけで、インポート本体は専用プール・別プロセスで動く
+    - JOB_SYNC_TIMEOUT 秒を過ぎても終わらない場合は待つのをやめ、その時点のジョブ情報（queued / running）を返す
+    """
+    job, future = _enqueue(kind, file, profile)
+    job_id = job.job_id
+    if future is not None:
+        try:
+            future.result(timeout=JOB_SYNC_TIMEOUT)
+        except FutureTimeoutError:
+            pass
+        except Exception as e:
+            # 完了時のコールバックより先に戻る場合があるため、ここでも failed にしてから読み直す
+            _fail_lost_job(job_id, e)
+    else:
+        deadline = time.monotonic() + JOB_SYNC_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(JOB_POLL_INTERVAL)
+            status = db.session.query(ImportJobs.status).filter(ImportJobs.job_id == job_id).scalar()
+            # 読み取りのトランザクションを終えて次回は最新の状態を見る
+            db.session.rollback()
+            if status in ("succeeded", "failed"):
+                break
+    # 待つ前に読み込んだジョブ（status=queued）を破棄して読み直す
+    db.session.rollback()
+    return get_import_job(job_id)
+
+
+def claim_next_job():
+    """
+    queued のジョブを古い順に1件取り出して running にする（import_worker.py 用）
+    - 複数のワーカーが同時に取り出しても、status を条件にした UPDATE で1件を1ワーカーに限る
+    - 戻り値: (job_id, kind, path, filename, profile)、無ければ None
+    """
+    candidates = (
+        db.session.query(ImportJobs.job_id, ImportJobs.kind, ImportJobs.filename, ImportJobs.profile)
+        .filter(ImportJobs.status == "queued")
+        .order_by(ImportJobs.created_at)
+        .limit(10)
+        .all()
+    )
+    db.session.rollback()
+    for job_id, kind, filename, profile in candidates:
+        with db.engine.begin() as conn:
+            claimed = conn.execute(
+                update(ImportJobs)
+                .where(ImportJobs.job_id == job_id, ImportJobs.status == "queued")
+                .values(status="running", started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+            ).rowcount
+        if claimed:
+            return job_id, kind, _job_path(job_id, kind), filename, profile
+    return None
+
+
+def run_claimed_job(app, job_id: str, kind: str, path: str, filename: str, profile=None):
+    """claim_next_job で取り出したジョブを実行する"""
+    _run_job(app, job_id, kind, path, filename, profile, claimed=True)
+
+
+def _run_job(app, job_id: str, kind: str, path: str, filename: str, profile=None, claimed: bool = False):
+    runner, _, supports_progress = IMPORT_RUNNERS[kind]
+    started = time.perf_counter()
+    status = "failed"
+    with app.app_context():
+        if not claimed:
+            _update_job(job_id, status="running", started_at=datetime.utcnow())
+        try:
+            with _heartbeat(app, job_id), open(path, "rb") as f:
+                file = FileStorage(stream=f, filename=filename)
+                if supports_progress:
+                    def on_progress(p):
+                        _update_job(job_id, rows_processed=p["rows_processed"], progress=p)
+                    result = runner(file, progress=on_progress, profile=profile)
+                else:
+                    result = runner(file, profile=profile)
+            _update_job(
+                job_id,
+                status="succeeded",
+                rows_processed=result.get("rows_processed", result.get("total_in_file", 0)),
+                result=result,
+                finished_at=datetime.utcnow(),
+            )
+            status = "succeeded"
+        except Exception as e:
+            db.session.rollback()
+            _update_job(job_id, status="failed", error=str(e), error_type=type(e).__name__, finished_at=datetime.utcnow())
+        finally:
+            metrics.IMPORT_JOBS.labels(kind, status).inc()
+            metrics.IMPORT_JOB_SECONDS.labels(kind).observe(time.perf_counter() - started)
+            db.session.remove()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_import_job(job_id: str):
+    job = ImportJobs.query.get(job_id)
+    if not job:
+        return None
+    if job.status == "running" and _is_stale(job.heartbeat_at or job.started_at):
+        # 実行していたプロセスが終了したジョブは、ポーリングが終わるよう failed にして返す
+        if fail_stale_jobs(job_id):
+            db.session.refresh(job)
+    return _job_to_dict(job)
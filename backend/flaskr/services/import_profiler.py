@@ -0,0 +1,168 @@
+# backend/flaskr/services/import_profiler.py
+# インポートのフェーズごとの計測（所要時間・メモリ増減・処理行数）
+# - フェーズ（read / reshape / resolve / persist / rebuild）ごとに集計し、インポート終了時に JSON 1行のログ（INFO）に出す
+# - 同じ値を Prometheus のメトリクス（metrics.import_phase）にも記録する
+# - 常時の計測は時刻と RSS（/proc/self/statm）の読み取りのみ。フェーズごとのイベントは DEBUG ログが有効な場合だけ出す
+# - profile=cprofile / pyinstrument を渡したインポート（IMPORT_PROFILE を指定した場合は全件）のプロファイルを IMPORT_PROFILE_DIR に保存する（調査用）
+# - RSS はプロセス全体の値のため、同時に他の処理が動いている場合のメモリ増減は目安
+import cProfile
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "pyinstrument")
+# インポートごとの指定が無い場合の既定（cprofile / pyinstrument（pyinstrument パッケージが必要）、空なら無効）
+PROFILE = os.getenv("IMPORT_PROFILE", "").strip().lower()
+PROFILE_DIR = os.getenv("IMPORT_PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "manavis_import_profiles")
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+
+def _rss_bytes():
+    """現在の RSS（取得できない環境では None）"""
+    if _PAGE_SIZE is None:
+        return None
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _delta(after, before):
+    return None if after is None or before is None else after - before
+
+
+class ImportProfiler:
+    """インポート1件分のフェーズごとの集計"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.phases = {}  # フェーズ名 -> {"calls", "seconds", "rows", "rss_delta_bytes"}
+        self.notes = {}
+
+    @contextmanager
+    def phase(self, name):
+        """ブロックをフェーズとして計測する（ブロック内で p.rows に処理行数を設定する）"""
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        with metrics.import_phase(self.kind, name) as p:
+            try:
+                yield p
+            finally:
+                seconds = time.perf_counter() - start
+                rss_delta = _delta(_rss_bytes(), rss_before)
+                stats = self.phases.setdefault(name, {"calls": 0, "seconds": 0.0, "rows": 0, "rss_delta_bytes": None})
+                stats["calls"] += 1
+                stats["seconds"] += seconds
+                stats["rows"] += p.rows
+                if rss_delta is not None:
+                    stats["rss_delta_bytes"] = (stats["rss_delta_bytes"] or 0) + rss_delta
+                if logger.isEnabledFor(logging.DEBUG):
+                    self.event("phase", phase=name, seconds=round(seconds, 4), rows=p.rows, rss_delta_bytes=rss_delta)
+
+    def note(self, **values):
+        """終了時のログに含める値（スキップ件数など）"""
+        self.notes.update(values)
+
+    def event(self, name, **values):
+        """DEBUG レベルのイベントを出す（呼び出し側で重い値を作る場合は logger.isEnabledFor で確認すること）"""
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({"event": f"import_{name}", "kind": self.kind, **values}, ensure_ascii=False, default=str))
+
+    def summary(self):
+        return {
+            name: {
+                **stats,
+                "seconds": round(stats["seconds"], 4),
+                "rows_per_second": round(stats["rows"] / stats["seconds"], 1) if stats["seconds"] > 0 else None,
+            }
+            for name, stats in self.phases.items()
+        }
+
+
+def _start_profiler(mode):
+    if mode == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument がインストールされていないため cProfile で計測します")
+        else:
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def _dump_profiler(profiler, kind):
+    """プロファイルを保存してパスを返す（cProfile は .prof、pyinstrument は .html）"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{kind}_{datetime.now():%Y%m%d_%H%M%S_%f}_{os.getpid()}")
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = stem + ".prof"
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = stem + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    return path
+
+
+def profiled_import(kind):
+    """
+    インポート関数を計測するデコレーター（関数にはキーワード引数 profiler として ImportProfiler を渡す）
+    - 終了時（失敗時も）にフェーズごとの集計を JSON 1行のログに出す
+    - 呼び出し時のキーワード引数 profile（cprofile / pyinstrument、省略時は IMPORT_PROFILE）でプロファイルを保存する
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, profile=None, **kwargs):
+            profiler = ImportProfiler(kind)
+            code_profiler = None
+            mode = profile or PROFILE
+            if mode:
+                try:
+                    code_profiler = _start_profiler(mode)
+                except Exception:
+                    # 別スレッドのインポートを計測中の場合など
+                    logger.warning("インポートのプロファイルを開始できませんでした", exc_info=True)
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            status = "failed"
+            try:
+                result = func(*args, profiler=profiler, **kwargs)
+                status = "succeeded"
+                return result
+            finally:
+                record = {
+                    "event": "import_profile",
+                    "kind": kind,
+                    "status": status,
+                    "seconds": round(time.perf_counter() - start, 4),
+                    "rss_delta_bytes": _delta(_rss_bytes(), rss_before),
+                    "phases": profiler.summary(),
+                    **profiler.notes,
+                }
+                if code_profiler is not None:
+                    try:
+                        record["profile_path"] = _dump_profiler(code_profiler, kind)
+                    except Exception:
+                        logger.exception("インポートのプロファイルを保存できませんでした")
+                logger.info(json.dumps(record, ensure_ascii=False, default=str))
+        return wrapper
+    return decorator
@@ -1,14 +1,25 @@
 import io
 import pandas as pd
 import numpy as np
-from sqlalchemy import text
-from sqlalchemy.exc import IntegrityError
+from openpyxl import load_workbook
+from sqlalchemy import text, insert, update, tuple_, table, column
 from werkzeug.datastructures import FileStorage
-from .. import db
+from .. import db, metrics
 from ..models import (
     Students, ExamMaster, Exams, ExamResults, SubjectMaster, 
-    SubjectScores, Universities, Faculties, Departments, ExamJudgements
+    SubjectScores, ExamJudgements
 )
+from .bulk_ops import get_or_create_many, upsert_many
+from .master_resolver import MasterResolver
+from .import_profiler import profiled_import
+from .data_version import bump_data_version, STUDENTS_DATA, EXAMS_DATA
+from .exam_service import rebuild_exam_snapshots, invalidate_exam_snapshots, get_exam_master, get_subject_master
+from .exam_stats_service import rebuild_exam_stats, invalidate_exam_stats
+from .university_rollup_service import add_exam_rollups
+
+# 計測（メトリクス・ログ）上のインポート種別（インポートジョブの kind と同じ）
+STUDENTS_KIND = "students"
+EXAMS_KIND = "exams_xlsx"
 
 # 開催順（sort_key）の初期値マップ（exam_code -> sort_key）
 ORDER_BY_CODE = {
@@ -54,95 +65,119 @@ def _read_students_csv(file: FileStorage) -> pd.DataFrame:
     ]
     return df
 
-def _debug_df(title: str, df: pd.DataFrame):
-    """開発用: DFの内容をターミナルに出力（先頭10行・列名・shape）"""
-    try:
-        print(f"\n=== {title} ===")
-        print(f"shape={df.shape}")
-        print(f"columns={list(df.columns)}")
-        # 先頭10行
-        with pd.option_context("display.max_columns", None, "display.width", 200):
-            print(df.head(10).to_string(index=False))
-        print("=== end ===\n")
-    except Exception as e:
-        print(f"[debug print failed] {title}: {e}")
-
-def _fix_seq(table: str, id_col: str):
-    """PostgreSQLのシーケンスがズレた際に、最大IDへ合わせる"""
-    try:
-        db.session.execute(text(
-            f"SELECT setval(pg_get_serial_sequence('{table}','{id_col}'), "
-            f"(SELECT COALESCE(MAX({id_col}),0) FROM {table}))"
-        ))
-        db.session.commit()
-    except Exception:
-        db.session.rollback()
-
-def import_students_from_csv(file: FileStorage):
-    df = _read_students_csv(file)
-
-    # student_id が数値でない行は除外
-    df["student_id"] = pd.to_numeric(df["student_id"], errors="coerce")
-    df = df[df["student_id"].notna()]
-    df["student_id"] = df["student_id"].astype("int64")
-
-    # 文字列整形
-    for col in ["name", "name_kana", "school_name", "grade"]:
-        if col in df.columns:
-            df[col] = df[col].fillna("").map(lambda x: str(x).strip())
-
-    # 日付（例: 2025/7/12）を date に
-    if "admission_date" in df.columns:
-        df["admission_date"] = pd.to_datetime(
-            df["admission_date"], format="%Y/%m/%d", errors="coerce"
-        ).dt.date
-
-    # 同一 student_id は後勝ち
-    df = df.drop_duplicates(subset=["student_id"], keep="last")
-    file_ids = set(df["student_id"].tolist())
-
-    inserted, updated, skipped = 0, 0, 0
+# 生徒CSV取り込み用のステージング表（一時テーブル）
+_STUDENTS_STAGING = table(
+    "students_staging",
+    column("student_id"), column("name"), column("name_kana"),
+    column("school_name"), column("grade"), column("admission_date"),
+)
 
-    for _, r in df.iterrows():
-        sid = int(r["student_id"])
-        stu = Students.query.get(sid)
+@profiled_import(STUDENTS_KIND)
+def import_students_from_csv(file: FileStorage, *, profiler):
+    with profiler.phase("read") as phase:
+        df = _read_students_csv(file)
+        phase.rows = len(df)
+
+    with profiler.phase("reshape") as phase:
+        # student_id が数値でない行は除外
+        df["student_id"] = pd.to_numeric(df["student_id"], errors="coerce")
+        skipped_parse = int(df["student_id"].isna().sum())
+        metrics.IMPORT_SKIPPED_ROWS.labels(STUDENTS_KIND, "parse_error").inc(skipped_parse)
+        profiler.note(skipped_parse=skipped_parse)
+        df = df[df["student_id"].notna()]
+        df["student_id"] = df["student_id"].astype("int64")
+
+        # 文字列整形
+        for col in ["name", "name_kana", "school_name", "grade"]:
+            if col in df.columns:
+                df[col] = df[col].fillna("").map(lambda x: str(x).strip())
+
+        # 日付（例: 2025/7/12）を date に
+        if "admission_date" in df.columns:
+            df["admission_date"] = pd.to_datetime(
+                df["admission_date"], format="%Y/%m/%d", errors="coerce"
+            ).dt.date
+
+        # 同一 student_id は後勝ち
+        df = df.drop_duplicates(subset=["student_id"], keep="last")
+        file_ids = set(df["student_id"].tolist())
+        phase.rows = len(df)
+
+    if not file_ids:
+        db.session.commit()
+        return {"inserted": 0, "updated": 0, "skipped": 0, "total_in_file": 0}
 
-        # admission_date が欠損の新規はスキップ（NOT NULL制約）
-        if not stu and (r.get("admission_date") is None or pd.isna(r.get("admission_date"))):
-            skipped += 1
-            continue
+    with profiler.phase("resolve") as phase:
+        # ファイル内容をステージング表へ一括投入し、件数算出と反映をSQL側でまとめて行う
+        db.session.execute(text(
+            "CREATE TEMPORARY TABLE students_staging ("
+            " student_id INTEGER PRIMARY KEY, name VARCHAR, name_kana VARCHAR,"
+            " school_name VARCHAR, grade VARCHAR, admission_date DATE)"
+        ))
+        db.session.execute(insert(_STUDENTS_STAGING), [
+            {
+                "student_id": int(r.student_id),
+                "name": r.name or "",
+                "name_kana": r.name_kana or None,
+                "school_name": r.school_name or "",
+                "grade": r.grade or "",
+                "admission_date": None if pd.isna(r.admission_date) else r.admission_date,
+            }
+            for r in df.itertuples(index=False)
+        ])
+
+        # 既存 → updated、新規で入会日あり → inserted、新規で入会日なし → skipped（NOT NULL制約）
+        inserted, updated, skipped = db.session.execute(text(
+            "SELECT"
+            " COUNT(CASE WHEN s.student_id IS NULL AND st.admission_date IS NOT NULL THEN 1 END),"
+            " COUNT(s.student_id),"
+            " COUNT(CASE WHEN s.student_id IS NULL AND st.admission_date IS NULL THEN 1 END)"
+            " FROM students_staging st LEFT JOIN students s ON s.student_id = st.student_id"
+        )).one()
+        metrics.IMPORT_SKIPPED_ROWS.labels(STUDENTS_KIND, "no_admission_date").inc(skipped)
+        profiler.note(inserted=inserted, updated=updated, skipped_no_admission_date=skipped)
+
+        # 氏名・高校名が変わる生徒が受験した模試のスナップショットは破棄、
+        # 高校名・学年が変わる場合は集計（高校別・学年別の内訳）も破棄（いずれも次回参照時に作り直す）
+        changed = db.session.execute(text(
+            "SELECT DISTINCT r.exam_id,"
+            "  s.name IS DISTINCT FROM st.name OR s.school_name IS DISTINCT FROM st.school_name,"
+            "  s.school_name IS DISTINCT FROM st.school_name OR s.grade IS DISTINCT FROM st.grade"
+            " FROM exam_results r"
+            " JOIN students s ON s.student_id = r.student_id"
+            " JOIN students_staging st ON st.student_id = s.student_id"
+            " WHERE s.name IS DISTINCT FROM st.name OR s.school_name IS DISTINCT FROM st.school_name"
+            "  OR s.grade IS DISTINCT FROM st.grade"
+        )).all()
+        invalidate_exam_snapshots({exam_id for exam_id, snapshot_changed, _ in changed if snapshot_changed})
+        invalidate_exam_stats({exam_id for exam_id, _, stats_changed in changed if stats_changed})
+        phase.rows = len(file_ids)
+
+    with profiler.phase("persist") as phase:
+        # 新規は在籍で登録、既存は氏名等を更新（入会日は提供があれば更新、退会済みは在籍に戻す）
+        db.session.execute(text(
+            "INSERT INTO students (student_id, name, name_kana, school_name, grade, admission_date, status)"
+            " SELECT st.student_id, st.name, st.name_kana, st.school_name, st.grade,"
+            "        COALESCE(st.admission_date, s.admission_date), '在籍'"
+            " FROM students_staging st LEFT JOIN students s ON s.student_id = st.student_id"
+            " WHERE COALESCE(st.admission_date, s.admission_date) IS NOT NULL"
+            " ON CONFLICT (student_id) DO UPDATE SET"
+            " name = excluded.name, name_kana = excluded.name_kana,"
+            " school_name = excluded.school_name, grade = excluded.grade,"
+            " admission_date = excluded.admission_date,"
+            " status = CASE WHEN students.status = '退会' THEN '在籍' ELSE students.status END"
+        ))
 
-        if not stu:
-            stu = Students(
-                student_id=sid,
-                status="在籍",
-                admission_date=r["admission_date"],
-            )
-            inserted += 1
-        else:
-            updated += 1
-            # 退会済みがファイルに現れたら在籍に戻す運用
-            if stu.status == "退会":
-                stu.status = "在籍"
-            # 入会日は提供があれば更新
-            if r.get("admission_date") is not None and not pd.isna(r.get("admission_date")):
-                stu.admission_date = r["admission_date"]
-
-        stu.name = r.get("name") or ""
-        stu.name_kana = r.get("name_kana") or None
-        stu.school_name = r.get("school_name") or ""
-        stu.grade = r.get("grade") or ""
-        db.session.add(stu)
-
-    db.session.flush()
-
-    # ファイルに存在しない生徒は退会扱いに更新
-    if file_ids:
-        db.session.query(Students)\
-            .filter(~Students.student_id.in_(file_ids))\
-            .update({Students.status: "退会"}, synchronize_session=False)
+        # ファイルに存在しない生徒は退会扱いに更新
+        db.session.execute(text(
+            "UPDATE students SET status = '退会'"
+            " WHERE NOT EXISTS (SELECT 1 FROM students_staging st WHERE st.student_id = students.student_id)"
+        ))
+        db.session.execute(text("DROP TABLE students_staging"))
+        bump_data_version(STUDENTS_DATA)
 
-    db.session.commit()
+        db.session.commit()
+        phase.rows = inserted + updated
     return {
         "inserted": inserted,
         "updated": updated,
@@ -150,405 +185,461 @@ def import_students_from_csv(file: FileStorage):
         "total_in_file": len(file_ids),
     }
 
-def import_exams_from_xlsx(file: FileStorage):
-    raw = file.read()
-    bio = io.BytesIO(raw)
-    # すべて文字列で取り込む（欠損混在を吸収）
-    df = pd.read_excel(bio, engine="openpyxl", dtype=str)
-    _debug_df("Exams XLSX (raw)", df)
-
-    def _cleanup(s):
-        if pd.isna(s) or s is None:
-            return ""
-        return str(s).replace(" ", "").replace("　", "").strip()
-
-    # 校舎コード == 940 のみ（数値化して比較: '940', 940, 940.0 すべてOK）
-    if "校舎コード" not in df.columns:
-        raise ValueError("校舎コード 列が見つかりません")
-    
-    def _to_num(s):
-        try:
-            return int(float(str(s).strip()))
-        except Exception:
-            return np.nan
-    df = df[df["校舎コード"].map(_to_num) == 940].copy()
-    if df.empty:
-        return {"inserted": {}, "skipped_students": 0, "note": "対象行なし"}
-    _debug_df("Exams XLSX (after 校舎コード=940 filter)", df)
+# exam_type 判定
+KYOTE_CODES = {1, 2, 3, 4, 38, 66}
+KOU1KOU2_CODES = {61, 62, 63, 71, 72, 73, 74}  # 高1/高2模試
+KIJUTSU_CODES = {5, 6, 7, 65}  # 記述模試（高1/高2を除く）
+OP_CODES = {12, 13, 15, 16, 18, 19, 21, 22, 24, 25, 27, 31, 41, 42}
 
-    # 大学名i の分割（1..9）
-    for i in range(1, 10):
-        col = f"大学名{i}"
-        if col in df.columns:
-            def _split3(x):
-                s = "" if pd.isna(x) else str(x)
-                u = s[0:7]
-                f = s[7:12]
-                d = s[12:18]
-                return pd.Series([_cleanup(u), _cleanup(f), _cleanup(d)])
-            df[[f"大学名{i}", f"学部名{i}", f"募集区分名{i}"]] = df[col].apply(_split3)
-    _debug_df("Exams XLSX (after 大学/学部/募集区分 split)", df)
-
-    # コード突合
-    code_cache_uni = {}
-    code_cache_fac = {}
-
-    def get_university_id_by_name(name: str):
-        name = _cleanup(name)
-        if not name:
-            return None
-        if name in code_cache_uni:
-            return code_cache_uni[name]
-        u = Universities.query.filter(Universities.university_name == name).first()
-        if not u:
-            # 存在しなければ新規作成（都度マスタ更新）
-            try:
-                u = Universities(university_name=name)
-                db.session.add(u); db.session.flush()
-            except IntegrityError:
-                # PKシーケンスのズレ等に備えて修正後に再試行
-                db.session.rollback()
-                _fix_seq('universities', 'university_id')
-                u = Universities.query.filter(Universities.university_name == name).first()
-                if not u:
-                    u = Universities(university_name=name)
-                    db.session.add(u); db.session.flush()
-        code_cache_uni[name] = u.university_id
-        return u.university_id
-
-    def get_faculty_id_by_name(university_id, name: str):
-        name = _cleanup(name)
-        if not name or not university_id:
-            return None
-        key = (university_id, name)
-        if key in code_cache_fac:
-            return code_cache_fac[key]
-        f = Faculties.query.filter(
-            Faculties.university_id == university_id,
-            Faculties.faculty_name == name
-        ).first()
-        if not f:
-            # 存在しなければ新規作成（都度マスタ更新）
-            try:
-                f = Faculties(university_id=university_id, faculty_name=name)
-                db.session.add(f); db.session.flush()
-            except IntegrityError:
-                # PKシーケンスのズレ等に備えて修正後に再試行
-                db.session.rollback()
-                _fix_seq('faculties', 'faculty_id')
-                f = Faculties.query.filter(
-                    Faculties.university_id == university_id,
-                    Faculties.faculty_name == name
-                ).first()
-                if not f:
-                    f = Faculties(university_id=university_id, faculty_name=name)
-                    db.session.add(f); db.session.flush()
-        code_cache_fac[key] = f.faculty_id
-        return f.faculty_id
-
-    for i in range(1, 10):
-        uname_col = f"大学名{i}"
-        fname_col = f"学部名{i}"
-        if uname_col in df.columns:
-            ucode_col = f"大学コード{i}"
-            df[ucode_col] = df[uname_col].map(get_university_id_by_name)
-        if fname_col in df.columns:
-            fcode_col = f"学部コード{i}"
-            def _map_fac(row):
-                # 大学IDは原則「大学名i」から決定。取れない場合のみ既存IDを検証して使用。
-                uid = None
-                if uname_col in row:
-                    uid = get_university_id_by_name(row.get(uname_col))
-                if not uid:
-                    raw_uid = row.get(f"大学コード{i}")
-                    try:
-                        raw_uid_int = int(float(str(raw_uid).strip()))
-                    except Exception:
-                        raw_uid_int = None
-                    if raw_uid_int:
-                        # 既存Universitiesに存在するIDのみ採用（無ければNoneのまま）
-                        u = Universities.query.get(raw_uid_int)
-                        if u:
-                            uid = u.university_id
-                return get_faculty_id_by_name(uid, row.get(fname_col))
-            df[fcode_col] = df.apply(_map_fac, axis=1)
-    # コード付与後の抜粋をデバッグ出力（大学/学部コード関連のみ）
-    subset_cols = [c for c in df.columns if ("大学コード" in c or "学部コード" in c)]
-    _debug_df("Exams XLSX (after 大学/学部コード mapping)", df[subset_cols] if subset_cols else df)
-
-    # 必須列の解決
-    def find_col(candidates):
-        for c in candidates:
-            if c in df.columns:
-                return c
+def _exam_type_of(code):
+    try:
+        c = int(str(code))
+    except Exception:
+        return "不明"
+    if c in KYOTE_CODES:
+        return "共テ"
+    if c in KOU1KOU2_CODES:
+        return "高1/高2"
+    if c in KIJUTSU_CODES:
+        return "記述"
+    if c in OP_CODES:
+        return "OP"
+    return "不明"
+
+def _to_int(val):
+    try:
+        return int(float(str(val).strip()))
+    except Exception:
         return None
-    col_student = find_col(["マナビス生番号", "学籍番号", "student_id"])
-    col_year = find_col(["年度", "年", "exam_year"])
-    col_exam = find_col(["模試", "模試コード", "exam_code"])
-    if not (col_student and col_year and col_exam):
-        raise ValueError("必須列（マナビス生番号/年度/模試）が見つかりません")
-
-    # 重複チェック: 年度と模試名の組み合わせが既に存在するか確認
-    def _to_int_for_check(val):
-        try:
-            return int(float(str(val).strip()))
-        except Exception:
-            return None
-    
-    # ファイル内の年度と模試コードの組み合わせを取得（重複除去）
-    file_exam_combinations = set()
-    for idx, r in df.iterrows():
-        year = _to_int_for_check(r.get(col_year))
-        exam_code_val = _to_int_for_check(r.get(col_exam))
-        if year is not None and exam_code_val is not None:
-            file_exam_combinations.add((year, exam_code_val))
-    
-    # 既存のデータベースと照合
-    duplicate_exams = []
-    for year, exam_code_val in file_exam_combinations:
-        em = ExamMaster.query.get(exam_code_val)
-        if em:
-            exam_name = em.exam_name
-            # 同じ年度・模試コードのデータが既に存在するかチェック
-            existing = Exams.query.filter_by(exam_code=exam_code_val, exam_year=year).first()
-            if existing:
-                duplicate_exams.append({
-                    "year": year,
-                    "exam_name": exam_name
-                })
-    
-    # 重複がある場合は警告を返す
-    if duplicate_exams:
-        # 重複を年度・模試名でグループ化してメッセージを作成
-        messages = []
-        for dup in duplicate_exams:
-            messages.append(f"{dup['year']} {dup['exam_name']}")
-        raise ValueError(f"duplicate: {', '.join(messages)} のデータは既にインポート済みです")
-
-    # exam_type 判定
-    kyote_codes = {1, 2, 3, 4, 38, 66}
-    kou1kou2_codes = {61, 62, 63, 71, 72, 73, 74}  # 高1/高2模試
-    kijutsu_codes = {5, 6, 7, 65}  # 記述模試（高1/高2を除く）
-    op_codes = {12, 13, 15, 16, 18, 19, 21, 22, 24, 25, 27, 31, 41, 42}
 
-    def exam_type_of(code):
-        try:
-            c = int(str(code))
-        except Exception:
-            return "不明"
-        if c in kyote_codes:
-            return "共テ"
-        if c in kou1kou2_codes:
-            return "高1/高2"
-        if c in kijutsu_codes:
-            return "記述"
-        if c in op_codes:
-            return "OP"
-        return "不明"
+def _to_float(val):
+    try:
+        return float(val)
+    except Exception:
+        return None
 
+def _clean_str(s: pd.Series) -> pd.Series:
+    """欠損は空文字にし、半角/全角スペースを除去した文字列列を返す"""
+    return s.fillna("").astype(str).str.replace(r"[ 　]", "", regex=True).str.strip()
+
+def _to_int_series(s: pd.Series) -> pd.Series:
+    """_to_int のベクトル版（数値化できない値は <NA>）"""
+    stripped = s.astype("string").str.strip()
+    num = pd.to_numeric(stripped, errors="coerce").astype("float64")
+    num = num.where(np.isfinite(num))
+    out = pd.Series(np.trunc(num), index=s.index).astype("Int64")
+    # 全角数字など to_numeric が解釈しない値だけ Python 側で再判定
+    retry = out.isna() & stripped.fillna("").ne("")
+    if retry.any():
+        out[retry] = pd.array(s[retry].map(_to_int).tolist(), dtype="Int64")
+    return out
+
+def _int_or_zero(s: pd.Series) -> pd.Series:
+    """整数表記のみ採用し、空・変換不可は 0（s は _clean_str 済み）"""
+    ok = s.str.fullmatch(r"[+-]?[0-9]+")
+    out = pd.to_numeric(s.where(ok), errors="coerce")
+    retry = ~ok & s.ne("")
+    if retry.any():
+        out[retry] = s[retry].map(lambda x: _to_int(x) if x.lstrip("+-").isdigit() else None)
+    return out.fillna(0).astype("int64")
+
+def _float_or_zero(s: pd.Series) -> pd.Series:
+    """浮動小数として解釈し、空・変換不可は 0.0（s は _clean_str 済み）"""
+    out = pd.to_numeric(s.where(s.ne("")), errors="coerce").astype("float64")
+    retry = out.isna() & s.ne("")
+    if retry.any():
+        out[retry] = s[retry].map(_to_float).astype("float64")
+    return out.where(np.isfinite(out), 0.0)
+
+def _pick_col(df: pd.DataFrame, candidates):
+    for c in candidates:
+        if c in df.columns:
+            return c
+    return None
+
+def _reshape_scores(df: pd.DataFrame) -> pd.DataFrame:
+    """科NN/得NN/偏NN（01..26、01/1 両対応）の横持ちを 1行=1科目 の縦持ちへ変換する"""
+    parts = []
+    for n in range(1, 27):
+        nn2, nn1 = f"{n:02d}", f"{n}"
+        scode_col = _pick_col(df, [f"科{nn2}", f"科{nn1}"])
+        if not scode_col:
+            continue
+        score_col = _pick_col(df, [f"得{nn2}", f"得{nn1}"])
+        dev_col = _pick_col(df, [f"偏{nn2}", f"偏{nn1}"])
+        parts.append(pd.DataFrame({
+            "row_index": df.index,
+            "slot": n,
+            "subject_code": df[scode_col].to_numpy(),
+            "score": df[score_col].to_numpy() if score_col else None,
+            "deviation_value": df[dev_col].to_numpy() if dev_col else None,
+        }))
+    cols = ["row_index", "subject_code", "score", "deviation_value"]
+    if not parts:
+        return pd.DataFrame(columns=cols)
+
+    long = pd.concat(parts, ignore_index=True)
+    code = _clean_str(long["subject_code"])
+    long = long[code.str.isdigit()].copy()
+    long["subject_code"] = _to_int_series(code[long.index])
+    long = long[long["subject_code"].notna()]
+    long["subject_code"] = long["subject_code"].astype("int64")
+    long["score"] = _int_or_zero(_clean_str(long["score"]))
+    long["deviation_value"] = _float_or_zero(_clean_str(long["deviation_value"]))
+    # ファイル順（行→科目スロット）を維持して後勝ちの重複排除に備える
+    return long.sort_values(["row_index", "slot"], kind="stable")[cols].reset_index(drop=True)
+
+def _reshape_prefs(df: pd.DataFrame) -> pd.DataFrame:
+    """大学名i/評テi/評二i/評総i（1..9）の横持ちを 1行=1志望 の縦持ちへ変換する。
+    大学名i は固定長（大学7文字・学部5文字・募集区分6文字）で分割する。
+    """
+    empty = pd.Series("", index=df.index)
+    parts = []
+    for i in range(1, 10):
+        uni_col = f"大学名{i}"
+        if uni_col in df.columns:
+            raw = df[uni_col].fillna("").astype(str)
+            uname = _clean_str(raw.str.slice(0, 7))
+            fname = _clean_str(raw.str.slice(7, 12))
+            dname = _clean_str(raw.str.slice(12, 18))
+        else:
+            uname = empty
+            fname = _clean_str(df[f"学部名{i}"]) if f"学部名{i}" in df.columns else empty
+            dname = _clean_str(df[f"募集区分名{i}"]) if f"募集区分名{i}" in df.columns else empty
+        parts.append(pd.DataFrame({
+            "row_index": df.index,
+            "preference_order": i,
+            "university_name": uname.to_numpy(),
+            "faculty_name": fname.to_numpy(),
+            "department_name": dname.to_numpy(),
+            "judgement_kyote": (_clean_str(df[f"評テ{i}"]) if f"評テ{i}" in df.columns else empty).to_numpy(),
+            "judgement_niji": (_clean_str(df[f"評二{i}"]) if f"評二{i}" in df.columns else empty).to_numpy(),
+            "judgement_sougou": (_clean_str(df[f"評総{i}"]) if f"評総{i}" in df.columns else empty).to_numpy(),
+        }))
+    long = pd.concat(parts, ignore_index=True)
+    # 大学/学部/募集区分 も 評価も すべて空ならスキップ
+    has_any = long.drop(columns=["row_index", "preference_order"]).ne("").any(axis=1)
+    long = long[has_any]
+    return long.sort_values(["row_index", "preference_order"], kind="stable").reset_index(drop=True)
+
+def _exam_rows_to_frames(df: pd.DataFrame, col_student: str, col_year: str, col_exam: str):
+    """シートを DB に依存しない3つの縦持ちフレームへ変換する。
+    - base:   1行=1受験（row_index, student_id, year, exam_code と元の生値）
+    - scores: 1行=1科目（row_index, subject_code, score, deviation_value）
+    - prefs:  1行=1志望（row_index, preference_order, 大学/学部/募集区分名, 判定3種）
+    """
+    # student_id 数値化（'123456.0' も許容）。数値化できない行は無視
+    sid = _to_int_series(df[col_student])
+    df = df[sid.notna()]
+    base = pd.DataFrame({
+        "row_index": df.index.astype("int64"),
+        "student_id": sid[df.index].astype("int64").to_numpy(),
+        "student_id_raw": df[col_student].to_numpy(),
+        "year_raw": df[col_year].to_numpy(),
+        "exam_code_raw": df[col_exam].to_numpy(),
+        "year": _to_int_series(df[col_year]).to_numpy(),
+        "exam_code": _to_int_series(df[col_exam]).to_numpy(),
+    })
+    return base, _reshape_scores(df), _reshape_prefs(df)
+
+def _resolve_exam_frames(base: pd.DataFrame, scores: pd.DataFrame, prefs: pd.DataFrame, resolver: MasterResolver, exam_master: dict, subject_codes: set):
+    """
+    展開済みフレームの行を ID に解決する（Students 未登録・数値化できない行の除外、exams / exam_results / 学科の取得・作成）
+    - exam_master / subject_codes はインポート開始時に取得したコミット済みのマスタ
+    - 戻り値: {"inserted", "skipped_students", "skipped_students_rows", "skipped_parse", "skipped_parse_rows",
+      "scores": 書き込む科目スコア, "judgements": 書き込む志望・判定}
+    """
     inserted = {"exams": 0, "exam_results": 0, "subject_scores": 0, "judgements": 0}
-    skipped_students = 0
     skipped_students_rows = []  # 取り込めなかった行の詳細（Students未登録）
     skipped_parse_rows = []  # 年度/模試コードの数値化に失敗した行サンプル（先頭100件）
 
-    def _to_int(val):
-        try:
-            return int(float(str(val).strip()))
-        except Exception:
-            return None
-
-    for idx, r in df.iterrows():
-        # student_id 数値化（'123456.0' も許容）
-        sid_raw = r.get(col_student)
-        try:
-            sid = int(float(str(sid_raw).strip()))
-        except Exception:
-            continue
-        stu = Students.query.get(sid)
-        if not stu:
-            skipped_students += 1
-            # 何がスキップされたか記録（先頭100件まで）
-            if len(skipped_students_rows) < 100:
-                skipped_students_rows.append({
-                    "row_index": int(idx),
-                    "student_id_parsed": sid,
-                    "student_id_raw": sid_raw,
-                    "year_raw": r.get(col_year),
-                    "exam_code_raw": r.get(col_exam),
-                })
-            continue
-
-        # 年度・模試
-        year_raw = r.get(col_year)
-        exam_code_raw = r.get(col_exam)
-        year = _to_int(year_raw)
-        exam_code_val = _to_int(exam_code_raw)
-        if year is None or exam_code_val is None:
-            if len(skipped_parse_rows) < 100:
-                skipped_parse_rows.append({
-                    "row_index": int(idx),
-                    "student_id": sid,
-                    "year_raw": year_raw,
-                    "exam_code_raw": exam_code_raw
-                })
-            continue
-        etype = exam_type_of(exam_code_val)
-
-        # ExamMaster
-        em = ExamMaster.query.get(exam_code_val)
-        if not em:
-            em = ExamMaster(
-                exam_code=exam_code_val,
-                exam_name=str(exam_code_val),
-                sort_key=ORDER_BY_CODE.get(exam_code_val)
-            )
-            db.session.add(em); db.session.flush()
+    # Students 未登録の行を除外
+    sids = [int(s) for s in base["student_id"].unique()]
+    known = {s for (s,) in db.session.query(Students.student_id).filter(Students.student_id.in_(sids))} if sids else set()
+    is_known = base["student_id"].isin(known)
+    skipped = base[~is_known]
+    skipped_students = len(skipped)
+    for r in skipped.head(100).itertuples(index=False):
+        skipped_students_rows.append({
+            "row_index": int(r.row_index),
+            "student_id_parsed": int(r.student_id),
+            "student_id_raw": r.student_id_raw,
+            "year_raw": r.year_raw,
+            "exam_code_raw": r.exam_code_raw,
+        })
+    base = base[is_known]
+
+    # 年度・模試コードが数値化できない行を除外
+    bad = base["year"].isna() | base["exam_code"].isna()
+    for r in base[bad].head(100).itertuples(index=False):
+        skipped_parse_rows.append({
+            "row_index": int(r.row_index),
+            "student_id": int(r.student_id),
+            "year_raw": r.year_raw,
+            "exam_code_raw": r.exam_code_raw,
+        })
+    base = base[~bad].copy()
+    resolved = {
+        "inserted": inserted,
+        "skipped_students": skipped_students,
+        "skipped_students_rows": skipped_students_rows,
+        "skipped_parse": int(bad.sum()),
+        "skipped_parse_rows": skipped_parse_rows,
+        "scores": [],
+        "judgements": [],
+    }
+    if base.empty:
+        return resolved
+    base["year"] = base["year"].astype("int64")
+    base["exam_code"] = base["exam_code"].astype("int64")
+    base["exam_type"] = base["exam_code"].map(_exam_type_of)
+
+    # ExamMaster（未登録コードは仮名で作成、sort_key 未設定なら補完）
+    codes = [int(c) for c in base["exam_code"].unique()]
+    existing_codes = {c: exam_master[c]["sort_key"] for c in codes if c in exam_master}
+    # 未知のコードは同じトランザクション内の登録分も含めて DB で確認する
+    unknown = [c for c in codes if c not in existing_codes]
+    if unknown:
+        existing_codes.update(
+            db.session.query(ExamMaster.exam_code, ExamMaster.sort_key).filter(ExamMaster.exam_code.in_(unknown))
+        )
+    new_masters = [
+        {"exam_code": c, "exam_name": str(c), "sort_key": ORDER_BY_CODE.get(c)}
+        for c in codes if c not in existing_codes
+    ]
+    if new_masters:
+        db.session.execute(insert(ExamMaster), new_masters)
+    fill_sort = [
+        {"exam_code": c, "sort_key": ORDER_BY_CODE[c]}
+        for c, sk in existing_codes.items() if sk is None and c in ORDER_BY_CODE
+    ]
+    if fill_sort:
+        db.session.execute(update(ExamMaster), fill_sort)
+
+    # Exams
+    exam_keys = list(zip(base["exam_code"].tolist(), base["year"].tolist(), base["exam_type"].tolist()))
+    exam_map, inserted["exams"] = get_or_create_many(
+        Exams, [Exams.exam_code, Exams.exam_year, Exams.exam_type], Exams.exam_id, set(exam_keys),
+    )
+    base["exam_id"] = [exam_map[k] for k in exam_keys]
+
+    # ExamResults
+    result_keys = list(zip(base["student_id"].tolist(), base["exam_id"].tolist()))
+    result_map, inserted["exam_results"] = get_or_create_many(
+        ExamResults, [ExamResults.student_id, ExamResults.exam_id], ExamResults.result_id, set(result_keys),
+    )
+    base["result_id"] = [result_map[k] for k in result_keys]
+    row_to_result = base.set_index("row_index")["result_id"]
+
+    # 科目スコア（SubjectMaster に存在する科目のみ、同一 result/科目 は後勝ち）
+    sc = scores[scores["row_index"].isin(row_to_result.index) & scores["subject_code"].isin(subject_codes)].copy()
+    sc["result_id"] = sc["row_index"].map(row_to_result)
+    sc = sc.drop_duplicates(subset=["result_id", "subject_code"], keep="last")
+    resolved["scores"] = sc[["result_id", "subject_code", "score", "deviation_value"]].to_dict("records")
+
+    # 志望・判定（同一 result/志望順位 は後勝ち）
+    pf = prefs[prefs["row_index"].isin(row_to_result.index)].copy()
+    pf["result_id"] = pf["row_index"].map(row_to_result)
+    pf = pf.drop_duplicates(subset=["result_id", "preference_order"], keep="last")
+    dep_ids = resolver.resolve_department_ids(pf)
+    resolved["judgements"] = [
+        {
+            "result_id": int(r.result_id),
+            "preference_order": int(r.preference_order),
+            "department_id": dep_id,
+            "judgement_kyote": r.judgement_kyote or None,
+            "judgement_niji": r.judgement_niji or None,
+            "judgement_sougou": r.judgement_sougou or None,
+        }
+        for r, dep_id in zip(pf.itertuples(index=False), dep_ids.tolist())
+    ]
+    return resolved
+
+def _persist_exam_frames(resolved: dict):
+    """解決済みの科目スコア・志望判定を集合単位のクエリで subject_scores / exam_judgements へ書き込む"""
+    inserted = resolved["inserted"]
+    inserted["subject_scores"] = upsert_many(
+        SubjectScores, [SubjectScores.result_id, SubjectScores.subject_code], SubjectScores.score_id,
+        resolved["scores"], ["score", "deviation_value"],
+    )
+    inserted["judgements"] = upsert_many(
+        ExamJudgements, [ExamJudgements.result_id, ExamJudgements.preference_order], ExamJudgements.judgement_id,
+        resolved["judgements"], ["department_id", "judgement_kyote", "judgement_niji", "judgement_sougou"],
+    )
+    return inserted
+
+# ストリーミング読み込み時に1度にパイプラインへ流す行数
+XLSX_CHUNK_ROWS = 2000
+
+def _xlsx_cell_to_str(v):
+    """pd.read_excel(dtype=str) と同じ文字列表現に揃える（空セルは None）"""
+    if v is None:
+        return None
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v)
+
+def _xlsx_header(cells) -> list:
+    """見出し行を pandas と同じ規則で列名化する（空欄は Unnamed: n、重複は .1, .2 ...）"""
+    columns, seen = [], {}
+    for i, v in enumerate(cells):
+        name = f"Unnamed: {i}" if v is None else _xlsx_cell_to_str(v)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
         else:
-            if em.sort_key is None:
-                em.sort_key = ORDER_BY_CODE.get(exam_code_val)
-
-        # Exams（シーケンスずれに備えリトライ）
-        ex = Exams.query.filter_by(exam_code=exam_code_val, exam_year=year, exam_type=etype).first()
-        if not ex:
-            try:
-                ex = Exams(exam_code=exam_code_val, exam_year=year, exam_type=etype)
-                db.session.add(ex); db.session.flush()
-                inserted["exams"] += 1
-            except IntegrityError:
-                # PKシーケンスずれを修正して再試行
-                db.session.rollback()
-                try:
-                    db.session.execute(text(
-                        "SELECT setval(pg_get_serial_sequence('exams','exam_id'), "
-                        "(SELECT COALESCE(MAX(exam_id),0) FROM exams))"
-                    ))
-                    db.session.commit()
-                except Exception:
-                    db.session.rollback()
-                ex = Exams.query.filter_by(exam_code=exam_code_val, exam_year=year, exam_type=etype).first()
-                if not ex:
-                    ex = Exams(exam_code=exam_code_val, exam_year=year, exam_type=etype)
-                    db.session.add(ex); db.session.flush()
-                    inserted["exams"] += 1
-
-        # ExamResults（シーケンスずれに備えリトライ）
-        er = ExamResults.query.filter_by(student_id=sid, exam_id=ex.exam_id).first()
-        if not er:
-            try:
-                er = ExamResults(student_id=sid, exam_id=ex.exam_id)
-                db.session.add(er); db.session.flush()
-                inserted["exam_results"] += 1
-            except IntegrityError:
-                db.session.rollback()
-                try:
-                    db.session.execute(text(
-                        "SELECT setval(pg_get_serial_sequence('exam_results','result_id'), "
-                        "(SELECT COALESCE(MAX(result_id),0) FROM exam_results))"
-                    ))
-                    db.session.commit()
-                except Exception:
-                    db.session.rollback()
-                er = ExamResults.query.filter_by(student_id=sid, exam_id=ex.exam_id).first()
-                if not er:
-                    er = ExamResults(student_id=sid, exam_id=ex.exam_id)
-                    db.session.add(er); db.session.flush()
-                    inserted["exam_results"] += 1
-
-        # 科目スコア 01..26（01/1 両対応）
-        for n in range(1, 27):
-            nn2 = f"{n:02d}"
-            nn1 = f"{n}"
-            def pick(cols):
-                for c in cols:
-                    if c in df.columns:
-                        return c
-                return None
-            scode_col = pick([f"科{nn2}", f"科{nn1}"])
-            if not scode_col:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+def _iter_exam_xlsx_chunks(source, chunk_size: int = XLSX_CHUNK_ROWS):
+    """先頭シートを openpyxl の read_only モードで1行ずつ読み、
+    校舎コード == 940 の行だけを chunk_size 行ごとの DataFrame（全列文字列）として返す。
+    index はシート上のデータ行番号（見出しを除き0始まり）で、pd.read_excel と一致する。
+    """
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        columns = _xlsx_header(next(rows, ()))
+        # 校舎コード == 940 のみ（数値化して比較: '940', 940, 940.0 すべてOK）
+        if "校舎コード" not in columns:
+            raise ValueError("校舎コード 列が見つかりません")
+        pos = columns.index("校舎コード")
+        width = len(columns)
+
+        buf, index = [], []
+        for i, row in enumerate(rows):
+            if len(row) <= pos or _to_int(row[pos]) != 940:
                 continue
-            score_col = pick([f"得{nn2}", f"得{nn1}"])
-            dev_col = pick([f"偏{nn2}", f"偏{nn1}"])
+            values = [_xlsx_cell_to_str(v) for v in row[:width]]
+            values.extend([None] * (width - len(values)))
+            buf.append(values)
+            index.append(i)
+            if len(buf) >= chunk_size:
+                yield pd.DataFrame(buf, columns=columns, index=index)
+                buf, index = [], []
+        if buf:
+            yield pd.DataFrame(buf, columns=columns, index=index)
+    finally:
+        wb.close()
+
+def _check_duplicate_exams(combinations: set):
+    """年度と模試コードの組み合わせが既にインポート済みなら ValueError"""
+    if not combinations:
+        return
+    # 既存のデータベースと照合（1回のクエリで判定）
+    rows = (
+        db.session.query(Exams.exam_year, ExamMaster.exam_name)
+        .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code)
+        .filter(tuple_(Exams.exam_year, Exams.exam_code).in_(list(combinations)))
+        .distinct()
+        .all()
+    )
+    # 重複がある場合は警告を返す
+    if rows:
+        messages = [f"{year} {exam_name}" for year, exam_name in rows]
+        raise ValueError(f"duplicate: {', '.join(messages)} のデータは既にインポート済みです")
 
-            scode_str = _cleanup(r.get(scode_col))
-            if not scode_str.isdigit():
-                continue
-            scode = int(scode_str)
-            if not SubjectMaster.query.get(scode):
-                continue
-            score_val = 0
-            dev_val = 0.0
-            s_raw = r.get(score_col)
-            d_raw = r.get(dev_col)
-            if s_raw is not None and _cleanup(s_raw) != "":
-                try:
-                    score_val = int(_cleanup(s_raw))
-                except Exception:
-                    score_val = 0
-            if d_raw is not None and _cleanup(d_raw) != "":
-                try:
-                    dev_val = float(_cleanup(d_raw))
-                except Exception:
-                    dev_val = 0.0
-            ss = SubjectScores.query.filter_by(result_id=er.result_id, subject_code=scode).first()
-            if not ss:
-                ss = SubjectScores(result_id=er.result_id, subject_code=scode, score=score_val, deviation_value=dev_val)
-                db.session.add(ss)
-                inserted["subject_scores"] += 1
-            else:
-                ss.score = score_val
-                ss.deviation_value = dev_val
-
-        # 志望 1..9（大学/学部/募集区分 か 評価のいずれかがあれば登録）
-        for i in range(1, 10):
-            uname = _cleanup(r.get(f"大学名{i}")) if f"大学名{i}" in df.columns else ""
-            fname = _cleanup(r.get(f"学部名{i}")) if f"学部名{i}" in df.columns else ""
-            dname = _cleanup(r.get(f"募集区分名{i}")) if f"募集区分名{i}" in df.columns else ""
-            kyote = _cleanup(r.get(f"評テ{i}")) if f"評テ{i}" in df.columns else ""
-            niji = _cleanup(r.get(f"評二{i}")) if f"評二{i}" in df.columns else ""
-            sougou = _cleanup(r.get(f"評総{i}")) if f"評総{i}" in df.columns else ""
-
-            # 大学/学部/募集区分 も 評価も すべて空ならスキップ
-            if (not uname and not fname and not dname) and (not kyote and not niji and not sougou):
-                continue
+@profiled_import(EXAMS_KIND)
+def import_exams_from_xlsx(file: FileStorage, progress=None, *, profiler):
+    """
+    模試Excelを取り込む
+    - progress: チャンクごとに途中経過（rows_processed, inserted, skipped_*）を受け取るコールバック
+    """
+    inserted = {"exams": 0, "exam_results": 0, "subject_scores": 0, "judgements": 0}
+    skipped_students = 0
+    skipped_parse = 0
+    skipped_students_rows = []  # 取り込めなかった行の詳細（Students未登録、先頭100件）
+    skipped_parse_rows = []  # 年度/模試コードの数値化に失敗した行サンプル（先頭100件）
+    seen_combinations = set()
+    rows_processed = 0
+    col_student = col_year = col_exam = None
+    resolver = MasterResolver()
+    # 参照マスタは書き込み前に取得する（キャッシュへ未コミットの内容を載せないため）
+    exam_master = get_exam_master()
+    subject_codes = set(get_subject_master())
+
+    # 校舎コードで絞り込みながら一定行数ずつ読み込み、チャンク単位で変換・書き込みする
+    chunks = _iter_exam_xlsx_chunks(file.stream)
+    while True:
+        with profiler.phase("read") as phase:
+            df = next(chunks, None)
+            phase.rows = 0 if df is None else len(df)
+        if df is None:
+            break
+        if col_student is None:
+            profiler.event("first_chunk", rows=len(df), columns=list(df.columns))
+            # 必須列の解決
+            col_student = _pick_col(df, ["マナビス生番号", "学籍番号", "student_id"])
+            col_year = _pick_col(df, ["年度", "年", "exam_year"])
+            col_exam = _pick_col(df, ["模試", "模試コード", "exam_code"])
+            if not (col_student and col_year and col_exam):
+                raise ValueError("必須列（マナビス生番号/年度/模試）が見つかりません")
+
+        # 重複チェック: このインポートで初めて現れた年度・模試コードの組み合わせのみ照合
+        combinations = {
+            (y, c)
+            for y, c in zip(_to_int_series(df[col_year]).tolist(), _to_int_series(df[col_exam]).tolist())
+            if not pd.isna(y) and not pd.isna(c)
+        } - seen_combinations
+        _check_duplicate_exams(combinations)
+        seen_combinations |= combinations
+
+        # 行データを縦持ちフレームへ展開し、集合単位で書き込む
+        with profiler.phase("reshape") as phase:
+            base, scores, prefs = _exam_rows_to_frames(df, col_student, col_year, col_exam)
+            phase.rows = len(base)
+        with profiler.phase("resolve") as phase:
+            resolved = _resolve_exam_frames(base, scores, prefs, resolver, exam_master, subject_codes)
+            phase.rows = len(base)
+        with profiler.phase("persist") as phase:
+            chunk_inserted = _persist_exam_frames(resolved)
+            phase.rows = len(resolved["scores"]) + len(resolved["judgements"])
+        for k, v in chunk_inserted.items():
+            inserted[k] += v
+        skipped_students += resolved["skipped_students"]
+        skipped_parse += resolved["skipped_parse"]
+        skipped_students_rows.extend(resolved["skipped_students_rows"][:100 - len(skipped_students_rows)])
+        skipped_parse_rows.extend(resolved["skipped_parse_rows"][:100 - len(skipped_parse_rows)])
+        metrics.IMPORT_SKIPPED_ROWS.labels(EXAMS_KIND, "student_not_found").inc(resolved["skipped_students"])
+        metrics.IMPORT_SKIPPED_ROWS.labels(EXAMS_KIND, "parse_error").inc(resolved["skipped_parse"])
+        rows_processed += len(df)
+        if progress:
+            progress({
+                "rows_processed": rows_processed,
+                "inserted": dict(inserted),
+                "skipped_students": skipped_students,
+                "skipped_parse_rows": len(skipped_parse_rows),
+            })
+
+    if col_student is None:
+        return {"inserted": {}, "skipped_students": 0, "note": "対象行なし"}
 
-            # 大学・学部は名称基準で作成/取得（コード列が無い前提）
-            uid = get_university_id_by_name(uname) if uname else None
-            fid = None
-            if uid:
-                if fname:
-                    fid = get_faculty_id_by_name(uid, fname)
-                if fid is None:
-                    fid = get_faculty_id_by_name(uid, "未設定")
-
-            dep_id = None
-            if fid:
-                dep = Departments.query.filter_by(faculty_id=fid, department_name=dname or "未設定").first()
-                if not dep:
-                    dep = Departments(faculty_id=fid, department_name=dname or "未設定")
-                    db.session.add(dep); db.session.flush()
-                dep_id = dep.department_id
-
-            j = ExamJudgements.query.filter_by(result_id=er.result_id, preference_order=i).first()
-            if not j:
-                j = ExamJudgements(result_id=er.result_id, preference_order=i, department_id=dep_id,
-                                   judgement_kyote=kyote or None, judgement_niji=niji or None, judgement_sougou=sougou or None)
-                db.session.add(j)
-                inserted["judgements"] += 1
-            else:
-                j.department_id = dep_id
-                j.judgement_kyote = kyote or None
-                j.judgement_niji = niji or None
-                j.judgement_sougou = sougou or None
+    # 取り込んだ模試の整形済みスナップショット・集計を同じトランザクション内で作り直し、志望大学のロールアップへ加算する
+    with profiler.phase("rebuild") as phase:
+        if seen_combinations:
+            touched_exam_ids = [
+                exam_id for (exam_id,) in db.session.query(Exams.exam_id)
+                .filter(tuple_(Exams.exam_year, Exams.exam_code).in_(seen_combinations))
+            ]
+            rebuild_exam_snapshots(touched_exam_ids)
+            rebuild_exam_stats(touched_exam_ids)
+            add_exam_rollups(touched_exam_ids)
+            phase.rows = len(touched_exam_ids)
+        bump_data_version(EXAMS_DATA)
 
-    db.session.commit()
-    # スキップ詳細をログにも出力
+        db.session.commit()
+    resolver.publish()
+    # スキップ件数は終了時のログに、詳細（先頭10件）は DEBUG ログに出力
+    profiler.note(rows_processed=rows_processed, skipped_students=skipped_students, skipped_parse=skipped_parse)
     if skipped_students_rows:
-        _debug_df("Exams XLSX (skipped students sample)", pd.DataFrame(skipped_students_rows))
+        profiler.event("skipped_students", sample=skipped_students_rows[:10])
     if skipped_parse_rows:
-        _debug_df("Exams XLSX (skipped parse sample: year/exam_code)", pd.DataFrame(skipped_parse_rows))
+        profiler.event("skipped_parse", sample=skipped_parse_rows[:10])
     
     return {
         "inserted": inserted,
+        "rows_processed": rows_processed,
         "skipped_students": skipped_students,
         "skipped_students_rows": skipped_students_rows,
         "skipped_parse_rows": skipped_parse_rows
@@ -605,6 +696,7 @@ def seed_exam_master_data():
         else:
             em.exam_name = name
             em.sort_key = idx
+    bump_data_version(EXAMS_DATA)
     db.session.commit()
     return ExamMaster.query.count()
 
@@ -652,6 +744,7 @@ def seed_subject_master_data(file: FileStorage):
     
     if new_subjects:
         db.session.add_all(new_subjects)
+        bump_data_version(EXAMS_DATA)
         db.session.commit()
     result["subjects"] = SubjectMaster.query.count()
     
@@ -0,0 +1,109 @@
+# backend/flaskr/services/master_resolver.py
+# 大学・学部・募集区分マスタの名称 → ID 解決
+import pandas as pd
+from .. import db
+from ..cache_backend import cached_value, store_value, invalidate_value
+from ..models import Universities, Faculties, Departments
+from .bulk_ops import get_or_create_many
+from .data_version import EXAMS_DATA
+
+# ワーカー間で共有するハッシュマップ（cache_backend に模試データの世代番号単位で保存）
+#   universities: name -> university_id
+#   faculties:    (university_id, name) -> faculty_id
+#   departments:  (faculty_id, name) -> department_id
+MAPS_CACHE_NAME = "master_maps"
+MAPS_DEPENDS = (EXAMS_DATA,)
+
+
+def _load_maps():
+    return {
+        "universities": {
+            name: uid for uid, name in db.session.query(Universities.university_id, Universities.university_name)
+        },
+        "faculties": {
+            (uid, name): fid
+            for fid, uid, name in db.session.query(Faculties.faculty_id, Faculties.university_id, Faculties.faculty_name)
+        },
+        "departments": {
+            (fid, name): did
+            for did, fid, name in db.session.query(Departments.department_id, Departments.faculty_id, Departments.department_name)
+        },
+    }
+
+
+def _get_maps():
+    return cached_value(MAPS_CACHE_NAME, MAPS_DEPENDS, _load_maps)
+
+
+def invalidate_master_cache():
+    """マスタを直接更新した場合などに呼び出し、次回利用時に再ロードさせる"""
+    invalidate_value(MAPS_CACHE_NAME, MAPS_DEPENDS)
+
+
+class MasterResolver:
+    """
+    インポート1回分の名称 → ID 解決
+    - 既知の名称は共有マップから O(1) で解決し、SQL を発行しない
+    - 未知の名称はレベル（大学/学部/募集区分）ごとに1回の SELECT で確認し、
+      無ければ1回の複数行 INSERT で作成する
+    - 新規作成分はコミット前は自インポート内だけで参照し、publish() で共有マップへ反映する
+      （ロールバック時に存在しない ID が共有マップへ残らないようにするため）
+    - 共有マップはキャッシュ上の値そのものなので変更しない
+    """
+
+    def __init__(self):
+        self._shared = _get_maps()
+        self._pending = {"universities": {}, "faculties": {}, "departments": {}}
+
+    def _lookup(self, kind, key):
+        found = self._shared[kind].get(key)
+        if found is None:
+            found = self._pending[kind].get(key)
+        return found
+
+    def _resolve(self, kind, model, key_cols, id_col, keys):
+        missing = {k for k in keys if self._lookup(kind, k) is None}
+        if missing:
+            wrap = len(key_cols) == 1
+            found, _ = get_or_create_many(model, key_cols, id_col, [(k,) if wrap else k for k in missing])
+            for k, v in found.items():
+                self._pending[kind][k[0] if wrap else k] = v
+        return [self._lookup(kind, k) for k in keys]
+
+    def resolve_department_ids(self, prefs: pd.DataFrame) -> pd.Series:
+        """志望フレームの大学/学部/募集区分名から department_id を解決する。
+        大学名が空ならNone、学部名・募集区分名が空なら「未設定」で作成/取得する。
+        """
+        dep_ids = pd.Series(None, index=prefs.index, dtype=object)
+        has_uni = prefs["university_name"] != ""
+        if not has_uni.any():
+            return dep_ids
+        uni_names = prefs.loc[has_uni, "university_name"].tolist()
+        fac_names = prefs.loc[has_uni, "faculty_name"].replace("", "未設定").tolist()
+        dep_names = prefs.loc[has_uni, "department_name"].replace("", "未設定").tolist()
+
+        uids = self._resolve(
+            "universities", Universities, [Universities.university_name], Universities.university_id,
+            uni_names,
+        )
+        fids = self._resolve(
+            "faculties", Faculties, [Faculties.university_id, Faculties.faculty_name], Faculties.faculty_id,
+            list(zip(uids, fac_names)),
+        )
+        dep_ids.loc[has_uni] = self._resolve(
+            "departments", Departments, [Departments.faculty_id, Departments.department_name], Departments.department_id,
+            list(zip(fids, dep_names)),
+        )
+        return dep_ids
+
+    def publish(self):
+        """
+        コミット後に呼び出し、新規作成したマスタを加えたマップを新しい世代番号で保存する
+        （各ワーカーが全件ロードし直さずに済む。並行インポート分が欠けていても未知扱いで SELECT されるだけ）
+        """
+        if not any(self._pending.values()):
+            return
+        merged = {kind: {**self._shared[kind], **self._pending[kind]} for kind in self._shared}
+        store_value(MAPS_CACHE_NAME, MAPS_DEPENDS, merged)
+        self._shared = merged
+        self._pending = {"universities": {}, "faculties": {}, "departments": {}}
@@ -0,0 +1,162 @@
+# backend/flaskr/services/student_search_index.py
+# 生徒キーワード検索用の n-gram 転置インデックス
+import re
+import threading
+import unicodedata
+from array import array
+from collections import defaultdict
+from .. import db
+from ..cache_backend import current_versions
+from ..models import Students
+from .data_version import STUDENTS_DATA
+
+_WHITESPACE = re.compile(r"\s+")
+# ひらがな（ぁ〜ゖ）→ カタカナ（ァ〜ヶ）
+_HIRAGANA_TO_KATAKANA = {c: c + 0x60 for c in range(0x3041, 0x3097)}
+
+
+def normalize_text(value):
+    """
+    検索用の正規化
+    - NFKC で全角英数字 → 半角、半角カナ → 全角カナ
+    - 英字の大文字/小文字、空白（全角含む）の有無を無視
+    - ひらがなをカタカナに統一
+    """
+    if value is None:
+        return ""
+    s = unicodedata.normalize("NFKC", str(value)).casefold()
+    s = _WHITESPACE.sub("", s)
+    return s.translate(_HIRAGANA_TO_KATAKANA)
+
+
+def _bigrams(s):
+    return {s[i:i + 2] for i in range(len(s) - 1)}
+
+
+def _rank(fields, kw):
+    """完全一致 0 / 前方一致 1 / 部分一致 2 / 不一致 None"""
+    best = None
+    for f in fields:
+        if f == kw:
+            return 0
+        if f.startswith(kw):
+            best = 1
+        elif best is None and kw in f:
+            best = 2
+    return best
+
+
+class _StudentIndex:
+    """
+    マナビス生番号・氏名・カナ・高校名の正規化文字列に対する転置インデックス
+    - 2文字以上のキーワードは bigram の posting を積集合で絞り込み、候補だけを部分一致で確認する
+    - 1文字のキーワードは文字単位の posting を使う
+    - posting はフィールド単位で作成する（フィールドをまたいだ誤一致を防ぐ）
+    """
+
+    def __init__(self, students, version):
+        self.version = version
+        self.rows = []      # 表示用（student_id 昇順）
+        self.fields = []    # 正規化済み検索対象フィールド
+        grams = defaultdict(list)
+        chars = defaultdict(list)
+        for pos, s in enumerate(students):
+            self.rows.append({
+                "student_id": s.student_id,
+                "name": s.name,
+                "name_kana": s.name_kana,
+                "school_name": s.school_name,
+                "grade": s.grade,
+                "status": s.status,
+            })
+            fields = tuple(
+                normalize_text(v) for v in (s.student_id, s.name, s.name_kana, s.school_name)
+            )
+            self.fields.append(fields)
+            doc_grams, doc_chars = set(), set()
+            for f in fields:
+                doc_grams |= _bigrams(f)
+                doc_chars.update(f)
+            for g in doc_grams:
+                grams[g].append(pos)
+            for c in doc_chars:
+                chars[c].append(pos)
+        # 行位置の posting（昇順）は省メモリのため array で保持
+        self.grams = {g: array("I", p) for g, p in grams.items()}    # bigram -> 行位置
+        self.chars = {c: array("I", p) for c, p in chars.items()}    # 1文字 -> 行位置
+
+    def _candidates(self, kw):
+        if len(kw) == 1:
+            return self.chars.get(kw, ())
+        postings = []
+        for g in _bigrams(kw):
+            p = self.grams.get(g)
+            if p is None:
+                return ()
+            postings.append(p)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for p in postings[1:]:
+            candidates.intersection_update(p)
+            if not candidates:
+                break
+        return candidates
+
+    def search(self, keyword, statuses=None):
+        statuses = set(statuses) if statuses else None
+        kw = normalize_text(keyword)
+        if not kw:
+            # キーワードなしは全件（student_id 順）
+            return [
+                dict(r) for r in self.rows
+                if statuses is None or r["status"] in statuses
+            ]
+
+        hits = []
+        for pos in self._candidates(kw):
+            if statuses is not None and self.rows[pos]["status"] not in statuses:
+                continue
+            rank = _rank(self.fields[pos], kw)
+            if rank is not None:
+                hits.append((rank, pos))
+        # 一致の強さ → student_id の順（行位置は student_id 昇順）
+        hits.sort()
+        return [dict(self.rows[pos]) for _, pos in hits]
+
+
+# プロセス内で共有するインデックス（data_versions の世代番号が変わったら再構築）
+_lock = threading.Lock()
+_index = None
+
+
+def _build_index(version):
+    students = (
+        db.session.query(
+            Students.student_id, Students.name, Students.name_kana,
+            Students.school_name, Students.grade, Students.status,
+        )
+        .order_by(Students.student_id)
+        .all()
+    )
+    return _StudentIndex(students, version)
+
+
+def _get_index():
+    global _index
+    # 世代番号は cache_backend 経由で確認する（他ワーカーでのインポート等を検知する）
+    (version,) = current_versions((STUDENTS_DATA,))
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = _build_index(version)
+        return _index
+
+
+def invalidate_student_search_index():
+    """生徒データを直接更新した場合などに呼び出し、次回検索時に再構築させる"""
+    global _index
+    with _lock:
+        _index = None
+
+
+def search(keyword=None, statuses=None):
+    return _get_index().search(keyword, statuses)
@@ -4,8 +4,9 @@ from ..models import (
     Departments, Faculties, Universities,
     SubjectScores, SubjectMaster, ExamMaster
 )
-from sqlalchemy import or_, asc
+from sqlalchemy import asc
 from .. import db
+from . import student_search_index
 
 
 # ------------------------
@@ -13,39 +14,22 @@ from .. import db
 # ------------------------
 def search_students(keyword=None, statuses=None):
     """
-    生徒名・高校名・マナビス生番号（student_id）で部分一致検索
+    生徒名・カナ・高校名・マナビス生番号（student_id）で部分一致検索
+    - 全角/半角・ひらがな/カタカナの違いは無視する
+    - 完全一致 → 前方一致 → 部分一致、同順位は student_id 順
     """
-    query = Students.query
-    if keyword:
-        q = f"%{keyword}%"
-        query = query.filter(
-            or_(
-                Students.name.ilike(q),
-                Students.name_kana.ilike(q),
-                Students.school_name.ilike(q),
-                Students.student_id.cast(db.String).ilike(q)
-            )
-        )
-    # ステータスフィルタ（在籍/既卒/退会）
-    if statuses:
-        query = query.filter(Students.status.in_(statuses))
-    students = query.order_by(Students.student_id).all()
-    return [
-        {
-            "student_id": s.student_id,
-            "name": s.name,
-            "name_kana": s.name_kana,
-            "school_name": s.school_name,
-            "grade": s.grade,
-            "status": s.status,
-        }
-        for s in students
-    ]
+    return student_search_index.search(keyword, statuses)
 
 
 # ------------------------
 # 生徒詳細（模試・志望校・科目スコア）
 # ------------------------
+# 一括取得で1回のクエリにまとめる生徒数
+DETAIL_BATCH_SIZE = 200
+# 一括取得で student_ids に指定できる最大件数
+MAX_DETAIL_IDS = 2000
+
+
 def get_student_detail(student_id):
     """
     生徒IDから詳細情報を取得
@@ -57,72 +41,153 @@ def get_student_detail(student_id):
     student = Students.query.get(student_id)
     if not student:
         return None
+    return _build_details([student])[0]
+
+
+def iter_student_details(student_ids=None, statuses=None, grades=None, school_name=None):
+    """
+    複数生徒の詳細を get_student_detail と同じ形式で順に返すイテレーター
+    - student_ids 指定時はその順（重複は除く）。未登録の ID は {"student_id", "error"} を返す
+    - 未指定時は在籍状況・学年・高校名の条件に合う生徒を student_id 順に返す（条件は1つ以上必須）
+    - DETAIL_BATCH_SIZE 人ごとに4回のクエリ（生徒・模試結果・志望校・科目スコア）で取得する
+    - 引数の誤りは ValueError（呼び出し時点で送出し、取得は反復時に行う）
+    """
+    if student_ids:
+        try:
+            ids = list(dict.fromkeys(int(i) for i in student_ids))
+        except (TypeError, ValueError):
+            raise ValueError("student_ids は整数で指定してください")
+        if len(ids) > MAX_DETAIL_IDS:
+            raise ValueError(f"student_ids は {MAX_DETAIL_IDS} 件までです")
+        return _iter_details_by_ids(ids)
+    if not (statuses or grades or school_name):
+        raise ValueError("student_ids または status / grade / school_name を指定してください")
+    return _iter_details_by_filter(statuses, grades, school_name)
+
+
+def _iter_details_by_ids(ids):
+    for start in range(0, len(ids), DETAIL_BATCH_SIZE):
+        batch = ids[start:start + DETAIL_BATCH_SIZE]
+        students = {s.student_id: s for s in Students.query.filter(Students.student_id.in_(batch))}
+        details = {d["student_id"]: d for d in _build_details(list(students.values()))}
+        for student_id in batch:
+            yield details.get(student_id) or {"student_id": student_id, "error": "Student not found"}
+        # 長いストリームでセッションに読み込んだ行が溜まらないようにする
+        db.session.expunge_all()
+
+
+def _iter_details_by_filter(statuses, grades, school_name):
+    query = Students.query
+    if statuses:
+        query = query.filter(Students.status.in_(statuses))
+    if grades:
+        query = query.filter(Students.grade.in_(grades))
+    if school_name:
+        query = query.filter(Students.school_name == school_name)
+    last_id = None
+    while True:
+        page = query
+        if last_id is not None:
+            page = page.filter(Students.student_id > last_id)
+        students = page.order_by(Students.student_id).limit(DETAIL_BATCH_SIZE).all()
+        if not students:
+            return
+        last_id = students[-1].student_id
+        yield from _build_details(students)
+        db.session.expunge_all()
+        if len(students) < DETAIL_BATCH_SIZE:
+            return
+
 
-    # 生徒の模試結果一覧
+def _build_details(students):
+    """生徒（Students）のリストから詳細を組み立てる（人数によらず模試結果・志望校・科目スコアの3クエリ）"""
+    if not students:
+        return []
+    # 対象生徒の模試結果一覧
     exam_results = (
         db.session.query(ExamResults, Exams, ExamMaster)
         .join(Exams, Exams.exam_id == ExamResults.exam_id)
         .join(ExamMaster, ExamMaster.exam_code == Exams.exam_code)
-        .filter(ExamResults.student_id == student_id)
-        .order_by(asc(Exams.exam_year), asc(ExamMaster.sort_key), asc(Exams.exam_id))
+        .filter(ExamResults.student_id.in_([s.student_id for s in students]))
+        .order_by(ExamResults.student_id, asc(Exams.exam_year), asc(ExamMaster.sort_key), asc(Exams.exam_id))
         .all()
     )
 
-    exam_details = []
+    # 全模試分の志望校・科目スコアをそれぞれ1回のクエリで取得し、result_id ごとに振り分ける
+    result_ids = [er.result_id for er, _, _ in exam_results]
+    judgements_by_result = _load_judgements(result_ids)
+    scores_by_result = _load_scores(result_ids)
+
+    exams_by_student = {}
     for er, ex, em in exam_results:
-        # --- 志望校・判定情報 ---
-        judgements = (
-            db.session.query(ExamJudgements, Departments, Faculties, Universities)
-            .join(Departments, ExamJudgements.department_id == Departments.department_id)
-            .join(Faculties, Departments.faculty_id == Faculties.faculty_id)
-            .join(Universities, Faculties.university_id == Universities.university_id)
-            .filter(ExamJudgements.result_id == er.result_id)
-            .all()
-        )
-
-        # --- 科目スコア ---
-        subject_scores = (
-            db.session.query(SubjectScores, SubjectMaster)
-            .join(SubjectMaster, SubjectScores.subject_code == SubjectMaster.subject_code)
-            .filter(SubjectScores.result_id == er.result_id)
-            .all()
-        )
-
-        exam_details.append({
+        exams_by_student.setdefault(er.student_id, []).append({
             "exam_name": em.exam_name if em else None,
             "exam_year": ex.exam_year,
             "exam_type": ex.exam_type,
-            "judgements": [
-                {
-                    "university_name": u.university_name,
-                    "faculty_name": f.faculty_name,
-                    "department_name": d.department_name,
-                    "preference_order": j.preference_order,
-                    "judgement": (j.judgement_sougou or j.judgement_kyote or j.judgement_niji),
-                    "judgement_kyote": j.judgement_kyote,
-                    "judgement_niji": j.judgement_niji,
-                    "judgement_sougou": j.judgement_sougou
-                }
-                for j, d, f, u in judgements
-            ],
-            "scores": [
-                {
-                    "subject_code": s.subject_code,
-                    "subject_name": s.subject_name,
-                    "score": sc.score,
-                    "deviation_value": float(sc.deviation_value)
-                }
-                for sc, s in subject_scores
-            ]
+            "judgements": judgements_by_result.get(er.result_id, []),
+            "scores": scores_by_result.get(er.result_id, []),
+        })
+
+    return [
+        {
+            "student_id": student.student_id,
+            "name": student.name,
+            "name_kana": student.name_kana,
+            "school_name": student.school_name,
+            "grade": student.grade,
+            "status": student.status,
+            "admission_date": student.admission_date,
+            "exams": exams_by_student.get(student.student_id, []),
+        }
+        for student in students
+    ]
+
+
+def _load_judgements(result_ids):
+    """志望校・判定情報を result_id ごとにまとめて取得"""
+    grouped = {}
+    if not result_ids:
+        return grouped
+    rows = (
+        db.session.query(ExamJudgements, Departments, Faculties, Universities)
+        .join(Departments, ExamJudgements.department_id == Departments.department_id)
+        .join(Faculties, Departments.faculty_id == Faculties.faculty_id)
+        .join(Universities, Faculties.university_id == Universities.university_id)
+        .filter(ExamJudgements.result_id.in_(result_ids))
+        .order_by(ExamJudgements.result_id, ExamJudgements.judgement_id)
+        .all()
+    )
+    for j, d, f, u in rows:
+        grouped.setdefault(j.result_id, []).append({
+            "university_name": u.university_name,
+            "faculty_name": f.faculty_name,
+            "department_name": d.department_name,
+            "preference_order": j.preference_order,
+            "judgement": (j.judgement_sougou or j.judgement_kyote or j.judgement_niji),
+            "judgement_kyote": j.judgement_kyote,
+            "judgement_niji": j.judgement_niji,
+            "judgement_sougou": j.judgement_sougou
         })
+    return grouped
 
-    return {
-        "student_id": student.student_id,
-        "name": student.name,
-        "name_kana": student.name_kana,
-        "school_name": student.school_name,
-        "grade": student.grade,
-        "status": student.status,
-        "admission_date": student.admission_date,
-        "exams": exam_details
-    }
+
+def _load_scores(result_ids):
+    """科目スコアを result_id ごとにまとめて取得"""
+    grouped = {}
+    if not result_ids:
+        return grouped
+    rows = (
+        db.session.query(SubjectScores, SubjectMaster)
+        .join(SubjectMaster, SubjectScores.subject_code == SubjectMaster.subject_code)
+        .filter(SubjectScores.result_id.in_(result_ids))
+        .order_by(SubjectScores.result_id, SubjectScores.score_id)
+        .all()
+    )
+    for sc, s in rows:
+        grouped.setdefault(sc.result_id, []).append({
+            "subject_code": s.subject_code,
+            "subject_name": s.subject_name,
+            "score": sc.score,
+            "deviation_value": float(sc.deviation_value)
+        })
+    return grouped
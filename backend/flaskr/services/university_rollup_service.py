@@ -0,0 +1,156 @@
+# backend/flaskr/services/university_rollup_service.py
+# 志望大学・学部の人数と判定分布の年度別ロールアップ
+# - university_rollups に (年度, 模試タイプ, 大学, 学部, 志望順位) ごとの人数と A〜E 判定人数を持つ
+# - 模試インポート時に取り込んだ模試分の集計を同じトランザクション内で加算する（全判定の再走査はしない）
+# - 加算済みの模試は university_rollup_exams に記録し、未加算の模試（機能追加前の取り込み分）は参照時に加算する
+# - 判定は模試タイプに応じた代表値（共テは共テ判定・なければ2次判定、それ以外は2次判定。一覧の並び替えと同じ）
+from datetime import datetime
+from sqlalchemy import bindparam, delete, func, insert, select, text
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models import Exams, Faculties, Universities, UniversityRollups, UniversityRollupExams
+
+ROLLUP_LEVELS = ("university", "faculty")
+DEFAULT_RANKING_LIMIT = 20
+MAX_RANKING_LIMIT = 500
+JUDGEMENT_LETTERS = ("A", "B", "C", "D", "E")
+
+_COUNT_COLUMNS = ("num_students", "count_a", "count_b", "count_c", "count_d", "count_e", "count_other")
+
+# 指定模試の判定を (年度, 模試タイプ, 大学, 学部, 志望順位) で集計し、既存の行へ加算する
+_ADD_ROLLUPS = text(
+    "INSERT INTO university_rollups"
+    " (exam_year, exam_type, university_id, faculty_id, preference_order, " + ", ".join(_COUNT_COLUMNS) + ")"
+    " SELECT exam_year, exam_type, university_id, faculty_id, preference_order, COUNT(*),"
+    + "".join(f" SUM(CASE WHEN judgement = '{c}' THEN 1 ELSE 0 END)," for c in JUDGEMENT_LETTERS)
+    + " SUM(CASE WHEN judgement IN ('A', 'B', 'C', 'D', 'E') THEN 0 ELSE 1 END)"
+    " FROM ("
+    "  SELECT e.exam_year, e.exam_type, f.university_id, f.faculty_id, j.preference_order,"
+    "         CASE WHEN e.exam_type = :kyote_type THEN COALESCE(j.judgement_kyote, j.judgement_niji)"
+    "              ELSE j.judgement_niji END AS judgement"
+    "  FROM exam_judgements j"
+    "  JOIN exam_results r ON r.result_id = j.result_id"
+    "  JOIN exams e ON e.exam_id = r.exam_id"
+    "  JOIN departments d ON d.department_id = j.department_id"
+    "  JOIN faculties f ON f.faculty_id = d.faculty_id"
+    "  WHERE r.exam_id IN :exam_ids AND j.preference_order IS NOT NULL"
+    " ) x"
+    " WHERE true"
+    " GROUP BY exam_year, exam_type, university_id, faculty_id, preference_order"
+    " ON CONFLICT (exam_year, exam_type, university_id, faculty_id, preference_order) DO UPDATE SET "
+    + ", ".join(f"{c} = university_rollups.{c} + excluded.{c}" for c in _COUNT_COLUMNS)
+).bindparams(bindparam("exam_ids", expanding=True))
+
+
+def add_exam_rollups(exam_ids):
+    """
+    指定模試の判定をロールアップへ加算する（加算済みの模試は除外、コミットは呼び出し元で行う）
+    - 加算済みの記録を先に登録するため、同じ模試を同時に加算しようとした側は IntegrityError になる
+    """
+    exam_ids = set(exam_ids)
+    if not exam_ids:
+        return
+    exam_ids -= {
+        exam_id for (exam_id,) in
+        db.session.query(UniversityRollupExams.exam_id).filter(UniversityRollupExams.exam_id.in_(exam_ids))
+    }
+    if not exam_ids:
+        return
+    exam_ids = sorted(exam_ids)
+    now = datetime.utcnow()
+    db.session.execute(insert(UniversityRollupExams), [{"exam_id": e, "rolled_up_at": now} for e in exam_ids])
+    db.session.execute(_ADD_ROLLUPS, {"exam_ids": exam_ids, "kyote_type": "共テ"})
+
+
+def reset_university_rollups():
+    """ロールアップを全て破棄する（次回参照時に全模試分を加算し直す。マスタをDBで直接修正した場合など）"""
+    db.session.execute(delete(UniversityRollupExams))
+    db.session.execute(delete(UniversityRollups))
+
+
+def _ensure_rollups():
+    """未加算の模試があれば加算してコミットする"""
+    pending = [
+        exam_id for (exam_id,) in
+        db.session.query(Exams.exam_id)
+        .outerjoin(UniversityRollupExams, UniversityRollupExams.exam_id == Exams.exam_id)
+        .filter(UniversityRollupExams.exam_id.is_(None))
+    ]
+    if not pending:
+        return
+    try:
+        add_exam_rollups(pending)
+        db.session.commit()
+    except IntegrityError:
+        # 別リクエストが同時に加算した場合はそちらの結果を使う
+        db.session.rollback()
+
+
+def _ranking(year, exam_type, level, preference_max):
+    """指定年度の (大学[, 学部]) ごとの合計を人数の降順 → 名称順で返す"""
+    keys = [UniversityRollups.university_id, Universities.university_name]
+    if level == "faculty":
+        keys += [UniversityRollups.faculty_id, Faculties.faculty_name]
+    query = (
+        select(*keys, *(func.sum(getattr(UniversityRollups, c)).label(c) for c in _COUNT_COLUMNS))
+        .join(Universities, Universities.university_id == UniversityRollups.university_id)
+        .where(UniversityRollups.exam_year == year)
+        .group_by(*keys)
+    )
+    if level == "faculty":
+        query = query.join(Faculties, Faculties.faculty_id == UniversityRollups.faculty_id)
+    if exam_type:
+        query = query.where(UniversityRollups.exam_type == exam_type)
+    if preference_max is not None:
+        query = query.where(UniversityRollups.preference_order <= preference_max)
+    rows = db.session.execute(query).all()
+    # 名称順は DB の照合順序によらず Python 側でそろえる
+    rows.sort(key=lambda r: (-r.num_students, r.university_name, r.faculty_name if level == "faculty" else ""))
+    return rows
+
+
+def rank_universities(year=None, exam_type=None, level="university", preference_max=None, limit=DEFAULT_RANKING_LIMIT):
+    """
+    志望者数の多い順に大学（level="faculty" なら学部）を並べ、前年度との比較を付ける
+    - year 省略時は集計済みの最新年度、preference_max 指定時は第 N 志望までに限る
+    - 人数は志望順位ごとの人数の合計（同じ大学を複数の志望順位に挙げた生徒・複数の模試は延べで数える）
+    - 戻り値: (一覧, 対象件数, 年度)
+    """
+    if level not in ROLLUP_LEVELS:
+        raise ValueError(f"level は {', '.join(ROLLUP_LEVELS)} のいずれかで指定してください")
+    if preference_max is not None and preference_max < 1:
+        raise ValueError("preference_max は1以上で指定してください")
+    limit = min(limit or DEFAULT_RANKING_LIMIT, MAX_RANKING_LIMIT)
+
+    _ensure_rollups()
+    if year is None:
+        year = db.session.query(func.max(UniversityRollups.exam_year)).scalar()
+        if year is None:
+            return [], 0, None
+
+    rows = _ranking(year, exam_type, level, preference_max)
+    previous_rows = _ranking(year - 1, exam_type, level, preference_max)
+
+    def key_of(r):
+        return (r.university_id, r.faculty_id) if level == "faculty" else r.university_id
+
+    # 前年度のデータがない場合は比較値を None にする
+    previous = {key_of(r): (rank, r.num_students) for rank, r in enumerate(previous_rows, start=1)}
+    results = []
+    for rank, r in enumerate(rows[:limit], start=1):
+        entry = {"rank": rank, "university_id": r.university_id, "university_name": r.university_name}
+        if level == "faculty":
+            entry.update({"faculty_id": r.faculty_id, "faculty_name": r.faculty_name})
+        previous_rank, previous_num = previous.get(key_of(r), (None, 0))
+        entry.update({
+            "num_students": r.num_students,
+            "judgements": {
+                **{letter: getattr(r, f"count_{letter.lower()}") for letter in JUDGEMENT_LETTERS},
+                "other": r.count_other,
+            },
+            "previous_rank": previous_rank,
+            "previous_num_students": previous_num if previous_rows else None,
+            "delta": r.num_students - previous_num if previous_rows else None,
+        })
+        results.append(entry)
+    return results, len(rows), year
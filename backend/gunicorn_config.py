@@ -1,14 +1,35 @@
 # Gunicorn configuration file
+import glob
 import multiprocessing
+import os
+import tempfile
 
 # Server socket
 bind = "0.0.0.0:10000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
-worker_connections = 1000
+# gthread: 1プロセスで threads 本のリクエストを同時に処理する（DB 待ち・ストリーミング中も他のリクエストを受けられる）
+# sync:    1プロセス1リクエスト（従来の動作）
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# worker_connections は非同期ワーカー（gevent / eventlet）でのみ有効
+if worker_class in ("gevent", "eventlet"):
+    worker_connections = 1000
+# アプリ側のコネクションプールの自動設定（flaskr/db_engine.py）が参照するため、既定値も環境変数としてワーカーへ渡す
+os.environ["GUNICORN_WORKER_CLASS"] = worker_class
+os.environ["GUNICORN_WORKERS"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+# メトリクス（/metrics）をワーカー間で集計するための値の保存先（prometheus_client の import 前に設定する）
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "manavis_metrics"
+))
+# マスタープロセスで先に読み込んでおく（child_exit はシグナルハンドラーから呼ばれるため、そこで初めて import すると
+# 停止時に連続した SIGCHLD で読み込み途中のモジュールを参照して失敗する）
+from prometheus_client import multiprocess  # noqa: E402
+
 
 # タイムアウト設定
 timeout = 180
@@ -19,3 +40,16 @@ keepalive = 2
 accesslog = '-'
 errorlog = '-'
 loglevel = 'info'
+
+
+# Server hooks
+def on_starting(server):
+    # 前回起動時の値を破棄する
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(path, exist_ok=True)
+    for name in glob.glob(os.path.join(path, "*.db")):
+        os.remove(name)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+インポートジョブを API サーバーとは別のプロセスで実行するワーカー
+
+使用方法:
+    IMPORT_JOB_MODE=external python import_worker.py [--once]
+
+API サーバーを IMPORT_JOB_MODE=external で起動すると、アップロードされたインポートは
+ジョブとして登録されるだけになり、このワーカーが queued のジョブを古い順に取り出して実行します。
+重いインポートが API のワーカーのCPUを占有しないため、参照系のリクエストの応答が保たれます
+（ワーカーは IMPORT_JOB_NICE だけ優先度を下げて実行します）。
+複数起動した場合も1件のジョブは1つのワーカーだけが実行します。
+アップロードの保存先（IMPORT_JOB_DIR）は API サーバーと共有してください。
+
+--once を付けると queued のジョブが無くなった時点で終了します。
+"""
+import os
+import sys
+import time
+from flaskr import create_app, db
+from flaskr.services import import_job_service
+
+# queued のジョブが無いときの待ち時間（秒）
+POLL_INTERVAL = float(os.getenv("IMPORT_WORKER_POLL_INTERVAL", "1"))
+
+def main(once=False):
+    import_job_service.lower_job_priority()
+    app = create_app(import_process=True)
+    with app.app_context():
+        print(f"インポートワーカーを開始しました（pid={os.getpid()}）。", flush=True)
+        # 前回のワーカーで実行中のまま残ったジョブを片付ける
+        import_job_service.fail_stale_jobs()
+        while True:
+            claimed = import_job_service.claim_next_job()
+            if claimed is None:
+                db.session.remove()
+                if once:
+                    break
+                time.sleep(POLL_INTERVAL)
+                continue
+            job_id, kind, _, filename, _ = claimed
+            print(f"ジョブ {job_id}（{kind}: {filename}）を実行します。", flush=True)
+            import_job_service.run_claimed_job(app, *claimed)
+            print(f"ジョブ {job_id} が終了しました。", flush=True)
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if any(a != "--once" for a in args):
+        print(__doc__)
+        sys.exit(1)
+    try:
+        main(once="--once" in args)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+参照系とインポートを同時に流す負荷試験スクリプト（起動中の API サーバーに対して実行）
+
+使用方法:
+    python loadtest.py [--url http://localhost:10000] [--duration 30] [--readers 16]
+                       [--import-file students.csv] [--import-kind students] [--importers 2]
+                       [--path /api/exams/years ...]
+
+--readers 本のスレッドが参照系のパスを順に GET し続け、--import-file を指定した場合は
+--importers 本のスレッドが同期インポート（POST /api/imports/<kind>）を繰り返します。
+終了時にパスごとの件数・エラー数・p50 / p95 / p99 / 最大のレイテンシ（ミリ秒）を表示します。
+ワーカー設定（GUNICORN_WORKER_CLASS / GUNICORN_THREADS / IMPORT_JOB_MODE）を変えて比較してください。
+
+--path を省略した場合は、最新の模試の詳細・絞り込み・検索など主要な参照系を使います。
+"""
+import argparse
+import json
+import math
+import os
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    # 最近順位法
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+def request(url, data=None, headers=None, timeout=300):
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            body = resp.read()
+            return resp.status, body
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def default_paths(base):
+    """最新の模試を使った参照系のパス一覧"""
+    paths = [
+        "/api/exams/years",
+        "/api/exams/search?limit=20",
+        "/api/exams/universities/top",
+        "/api/students/search?q=1",
+    ]
+    status, body = request(base + "/api/exams/search?limit=1")
+    exams = json.loads(body) if status == 200 else []
+    if exams:
+        exam_id = exams[0]["exam_id"]
+        paths += [
+            f"/api/exams/{exam_id}?limit=50",
+            f"/api/exams/filter?exam_id={exam_id}&limit=50&include_top_universities=true",
+            f"/api/exams/{exam_id}/stats?group_by=school",
+        ]
+    return paths
+
+def multipart(path):
+    boundary = uuid.uuid4().hex
+    with open(path, "rb") as f:
+        content = f.read()
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    return body, {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+def main():
+    parser = argparse.ArgumentParser(description="参照系とインポートの混在負荷試験")
+    parser.add_argument("--url", default="http://localhost:10000")
+    parser.add_argument("--duration", type=float, default=30, help="計測時間（秒）")
+    parser.add_argument("--readers", type=int, default=16, help="参照系のスレッド数")
+    parser.add_argument("--path", action="append", dest="paths", help="参照系のパス（複数指定可）")
+    parser.add_argument("--import-file", help="インポートに使うファイル（省略時は参照系のみ）")
+    parser.add_argument("--import-kind", default="students", choices=["students", "exams_xlsx"])
+    parser.add_argument("--importers", type=int, default=1, help="インポートのスレッド数")
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    paths = args.paths or default_paths(base)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def record(name, elapsed, ok):
+        with lock:
+            latencies[name].append(elapsed * 1000)
+            if not ok:
+                errors[name] += 1
+
+    def reader(offset):
+        i = offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _ = request(base + path)
+            except Exception:
+                status = None
+            record(path, time.perf_counter() - start, status == 200)
+
+    def importer():
+        body, headers = multipart(args.import_file)
+        name = f"POST /api/imports/{args.import_kind}"
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status, _ = request(f"{base}/api/imports/{args.import_kind}", data=body, headers=headers)
+            except Exception:
+                status = None
+            # exams_xlsx の2回目以降は重複として 400 になる（解析までの負荷として扱う）
+            record(name, time.perf_counter() - start, status in (200, 400))
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    if args.import_file:
+        threads += [threading.Thread(target=importer) for _ in range(args.importers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"{'path':<70} {'count':>6} {'errors':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    reads = []
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        if not name.startswith("POST "):
+            reads.extend(values)
+        print(f"{name:<70} {len(values):>6} {errors[name]:>6} "
+              f"{percentile(values, 50):>8.1f} {percentile(values, 95):>8.1f} {percentile(values, 99):>8.1f} {values[-1]:>8.1f}")
+    reads.sort()
+    total_errors = sum(v for k, v in errors.items() if not k.startswith("POST "))
+    print(f"{'(参照系 合計)':<66} {len(reads):>6} {total_errors:>6} "
+          f"{percentile(reads, 50):>8.1f} {percentile(reads, 95):>8.1f} {percentile(reads, 99):>8.1f} {(reads or [float('nan')])[-1]:>8.1f}")
+    print(f"スループット（参照系）: {len(reads) / args.duration:.1f} req/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""add data_versions
+
+Revision ID: j1c2d3e4f5a6
+Revises: i0b1c2d3e4f5
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'j1c2d3e4f5a6'
+down_revision = 'i0b1c2d3e4f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    data_versions = op.create_table('data_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(data_versions, [{'name': 'students', 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('data_versions')
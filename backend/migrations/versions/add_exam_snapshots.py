@@ -0,0 +1,40 @@
+"""add exam_snapshots
+
+Revision ID: k2d3e4f5a6b7
+Revises: j1c2d3e4f5a6
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'k2d3e4f5a6b7'
+down_revision = 'j1c2d3e4f5a6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exam_snapshots',
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('num_students', sa.Integer(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exams.exam_id'], ),
+        sa.PrimaryKeyConstraint('exam_id')
+    )
+    op.create_table('exam_snapshot_rows',
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('school_name', sa.String(), nullable=False),
+        sa.Column('preferences', sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exam_snapshots.exam_id'], ),
+        sa.PrimaryKeyConstraint('exam_id', 'student_id')
+    )
+
+
+def downgrade():
+    op.drop_table('exam_snapshot_rows')
+    op.drop_table('exam_snapshots')
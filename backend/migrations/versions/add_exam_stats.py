@@ -0,0 +1,71 @@
+"""add exam_stats
+
+Revision ID: m4f5a6b7c8d9
+Revises: l3e4f5a6b7c8
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'm4f5a6b7c8d9'
+down_revision = 'l3e4f5a6b7c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('exam_stats',
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('num_students', sa.Integer(), nullable=False),
+        sa.Column('built_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exams.exam_id'], ),
+        sa.PrimaryKeyConstraint('exam_id')
+    )
+    op.create_table('exam_subject_stats',
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('subject_code', sa.Integer(), nullable=False),
+        sa.Column('group_by', sa.String(), nullable=False),
+        sa.Column('group_value', sa.String(), nullable=False),
+        sa.Column('num_students', sa.Integer(), nullable=False),
+        sa.Column('score_mean', sa.Float(), nullable=False),
+        sa.Column('score_stddev', sa.Float(), nullable=False),
+        sa.Column('score_min', sa.Integer(), nullable=False),
+        sa.Column('score_max', sa.Integer(), nullable=False),
+        sa.Column('score_p25', sa.Float(), nullable=False),
+        sa.Column('score_p50', sa.Float(), nullable=False),
+        sa.Column('score_p75', sa.Float(), nullable=False),
+        sa.Column('deviation_mean', sa.Float(), nullable=False),
+        sa.Column('deviation_stddev', sa.Float(), nullable=False),
+        sa.Column('deviation_min', sa.Float(), nullable=False),
+        sa.Column('deviation_max', sa.Float(), nullable=False),
+        sa.Column('deviation_p25', sa.Float(), nullable=False),
+        sa.Column('deviation_p50', sa.Float(), nullable=False),
+        sa.Column('deviation_p75', sa.Float(), nullable=False),
+        sa.Column('deviation_histogram', sa.JSON(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exam_stats.exam_id'], ),
+        sa.PrimaryKeyConstraint('exam_id', 'subject_code', 'group_by', 'group_value')
+    )
+    op.create_table('exam_judgement_stats',
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('university_id', sa.Integer(), nullable=False),
+        sa.Column('group_by', sa.String(), nullable=False),
+        sa.Column('group_value', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('count_a', sa.Integer(), nullable=False),
+        sa.Column('count_b', sa.Integer(), nullable=False),
+        sa.Column('count_c', sa.Integer(), nullable=False),
+        sa.Column('count_d', sa.Integer(), nullable=False),
+        sa.Column('count_e', sa.Integer(), nullable=False),
+        sa.Column('count_other', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exam_stats.exam_id'], ),
+        sa.PrimaryKeyConstraint('exam_id', 'university_id', 'group_by', 'group_value', 'kind')
+    )
+
+
+def downgrade():
+    op.drop_table('exam_judgement_stats')
+    op.drop_table('exam_subject_stats')
+    op.drop_table('exam_stats')
@@ -0,0 +1,24 @@
+"""add error_type to import_jobs
+
+Revision ID: o6b7c8d9e0f1
+Revises: n5a6b7c8d9e0
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'o6b7c8d9e0f1'
+down_revision = 'n5a6b7c8d9e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('error_type', sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('import_jobs', 'error_type')
@@ -0,0 +1,24 @@
+"""add heartbeat_at to import_jobs
+
+Revision ID: q8d9e0f1a2b3
+Revises: p7c8d9e0f1a2
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'q8d9e0f1a2b3'
+down_revision = 'p7c8d9e0f1a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('import_jobs', 'heartbeat_at')
@@ -0,0 +1,24 @@
+"""add profile to import_jobs
+
+Revision ID: p7c8d9e0f1a2
+Revises: o6b7c8d9e0f1
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'p7c8d9e0f1a2'
+down_revision = 'o6b7c8d9e0f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('import_jobs', sa.Column('profile', sa.String(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('import_jobs', 'profile')
@@ -0,0 +1,77 @@
+"""add lookup indexes and natural-key unique constraints
+
+Revision ID: i0b1c2d3e4f5
+Revises: h9a0b1c2d3e4
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'i0b1c2d3e4f5'
+down_revision = 'h9a0b1c2d3e4'
+branch_labels = None
+depends_on = None
+
+
+def _merge_duplicates(table, pk, key_cols, children=(), keep="MIN"):
+    """
+    一意制約を張る前に、自然キーが重複している行を1行へ統合する
+    - keep=MIN は最古の行を残して子テーブルの参照を付け替える（マスタ系）
+    - keep=MAX は最新の行を残す（インポートで後勝ち更新していた明細系）
+    - キーに NULL を含む行は対象外（一意制約では NULL 同士は重複しないため、統合すると消してはいけない行まで消える）
+    """
+    conn = op.get_bind()
+    keys = ", ".join(key_cols)
+    not_null = " AND ".join(f"{c} IS NOT NULL" for c in key_cols)
+    dup = (
+        f"SELECT {pk} AS dup_id, {keep}({pk}) OVER (PARTITION BY {keys}) AS keep_id FROM {table}"
+        f" WHERE {not_null}"
+    )
+    for child_table, fk in children:
+        conn.execute(text(
+            f"UPDATE {child_table} c SET {fk} = d.keep_id FROM ({dup}) d "
+            f"WHERE c.{fk} = d.dup_id AND d.dup_id <> d.keep_id"
+        ))
+    conn.execute(text(
+        f"DELETE FROM {table} t USING ({dup}) d "
+        f"WHERE t.{pk} = d.dup_id AND d.dup_id <> d.keep_id"
+    ))
+
+
+def upgrade():
+    # 既存データの重複を解消（親 → 子の順。付け替えで子側に新たな重複が生じるため）
+    _merge_duplicates('faculties', 'faculty_id', ['university_id', 'faculty_name'],
+                      children=[('departments', 'faculty_id')])
+    _merge_duplicates('departments', 'department_id', ['faculty_id', 'department_name'],
+                      children=[('exam_judgements', 'department_id')])
+    _merge_duplicates('exams', 'exam_id', ['exam_code', 'exam_year', 'exam_type'],
+                      children=[('exam_results', 'exam_id')])
+    _merge_duplicates('exam_results', 'result_id', ['student_id', 'exam_id'],
+                      children=[('subject_scores', 'result_id'), ('exam_judgements', 'result_id')])
+    _merge_duplicates('subject_scores', 'score_id', ['result_id', 'subject_code'], keep="MAX")
+    _merge_duplicates('exam_judgements', 'judgement_id', ['result_id', 'preference_order'], keep="MAX")
+
+    # インポート処理が前提としている自然キーの一意性（一意インデックスとして検索にも使われる）
+    op.create_unique_constraint('uq_faculties_university_id_faculty_name', 'faculties', ['university_id', 'faculty_name'])
+    op.create_unique_constraint('uq_departments_faculty_id_department_name', 'departments', ['faculty_id', 'department_name'])
+    op.create_unique_constraint('uq_exams_exam_code_exam_year_exam_type', 'exams', ['exam_code', 'exam_year', 'exam_type'])
+    op.create_unique_constraint('uq_exam_results_student_id_exam_id', 'exam_results', ['student_id', 'exam_id'])
+    op.create_unique_constraint('uq_subject_scores_result_id_subject_code', 'subject_scores', ['result_id', 'subject_code'])
+    op.create_unique_constraint('uq_exam_judgements_result_id_preference_order', 'exam_judgements', ['result_id', 'preference_order'])
+
+    # 模試詳細（exam_id で絞り込み）用
+    op.create_index('ix_exam_results_exam_id', 'exam_results', ['exam_id'])
+
+
+def downgrade():
+    op.drop_index('ix_exam_results_exam_id', table_name='exam_results')
+    op.drop_constraint('uq_exam_judgements_result_id_preference_order', 'exam_judgements', type_='unique')
+    op.drop_constraint('uq_subject_scores_result_id_subject_code', 'subject_scores', type_='unique')
+    op.drop_constraint('uq_exam_results_student_id_exam_id', 'exam_results', type_='unique')
+    op.drop_constraint('uq_exams_exam_code_exam_year_exam_type', 'exams', type_='unique')
+    op.drop_constraint('uq_departments_faculty_id_department_name', 'departments', type_='unique')
+    op.drop_constraint('uq_faculties_university_id_faculty_name', 'faculties', type_='unique')
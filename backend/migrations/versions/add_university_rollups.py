@@ -0,0 +1,47 @@
+"""add university_rollups
+
+Revision ID: n5a6b7c8d9e0
+Revises: m4f5a6b7c8d9
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'n5a6b7c8d9e0'
+down_revision = 'm4f5a6b7c8d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('university_rollups',
+        sa.Column('exam_year', sa.Integer(), nullable=False),
+        sa.Column('exam_type', sa.String(), nullable=False),
+        sa.Column('university_id', sa.Integer(), nullable=False),
+        sa.Column('faculty_id', sa.Integer(), nullable=False),
+        sa.Column('preference_order', sa.Integer(), nullable=False),
+        sa.Column('num_students', sa.Integer(), nullable=False),
+        sa.Column('count_a', sa.Integer(), nullable=False),
+        sa.Column('count_b', sa.Integer(), nullable=False),
+        sa.Column('count_c', sa.Integer(), nullable=False),
+        sa.Column('count_d', sa.Integer(), nullable=False),
+        sa.Column('count_e', sa.Integer(), nullable=False),
+        sa.Column('count_other', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['university_id'], ['universities.university_id'], ),
+        sa.ForeignKeyConstraint(['faculty_id'], ['faculties.faculty_id'], ),
+        sa.PrimaryKeyConstraint('exam_year', 'exam_type', 'university_id', 'faculty_id', 'preference_order')
+    )
+    op.create_table('university_rollup_exams',
+        sa.Column('exam_id', sa.Integer(), nullable=False),
+        sa.Column('rolled_up_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['exam_id'], ['exams.exam_id'], ),
+        sa.PrimaryKeyConstraint('exam_id')
+    )
+
+
+def downgrade():
+    op.drop_table('university_rollup_exams')
+    op.drop_table('university_rollups')
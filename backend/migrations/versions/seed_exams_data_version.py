@@ -0,0 +1,27 @@
+"""seed exams data_version
+
+Revision ID: l3e4f5a6b7c8
+Revises: k2d3e4f5a6b7
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'l3e4f5a6b7c8'
+down_revision = 'k2d3e4f5a6b7'
+branch_labels = None
+depends_on = None
+
+
+data_versions = sa.table('data_versions', sa.column('name', sa.String()), sa.column('version', sa.BigInteger()))
+
+
+def upgrade():
+    op.bulk_insert(data_versions, [{'name': 'exams', 'version': 0}])
+
+
+def downgrade():
+    op.execute(data_versions.delete().where(data_versions.c.name == 'exams'))
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+模試詳細の整形済みスナップショットと模試ごとの集計を作り直すスクリプト
+
+使用方法:
+    python rebuild_exam_snapshots.py [exam_id ...]
+
+exam_id を省略した場合は全模試を作り直します（志望大学のロールアップも破棄し、次回参照時に集計し直します）。
+大学・学部・学科名や生徒情報をDBで直接修正した場合に実行してください。
+（学年別の集計は実行時点の学年で作り直されます）
+"""
+import sys
+from flaskr import create_app, db
+from flaskr.models import Exams
+from flaskr.services.exam_service import rebuild_exam_snapshots, invalidate_exam_snapshots
+from flaskr.services.exam_stats_service import rebuild_exam_stats, invalidate_exam_stats
+from flaskr.services.university_rollup_service import reset_university_rollups
+from flaskr.services.data_version import bump_data_version, EXAMS_DATA
+
+def main(exam_ids):
+    app = create_app()
+    with app.app_context():
+        if not exam_ids:
+            exam_ids = [exam_id for (exam_id,) in db.session.query(Exams.exam_id)]
+            # 削除済みの模試の分も含めて全件破棄してから作り直す
+            invalidate_exam_snapshots()
+            invalidate_exam_stats()
+            # 志望大学のロールアップは次回参照時に全模試分を加算し直す
+            reset_university_rollups()
+        rebuild_exam_snapshots(exam_ids)
+        rebuild_exam_stats(exam_ids)
+        # 各ワーカーのレスポンスキャッシュも破棄させる
+        bump_data_version(EXAMS_DATA)
+        db.session.commit()
+        print(f"{len(exam_ids)} 件の模試のスナップショット・集計を作り直しました。")
+
+if __name__ == "__main__":
+    try:
+        ids = [int(a) for a in sys.argv[1:]]
+    except ValueError:
+        print(__doc__)
+        sys.exit(1)
+    main(ids)
@@ -15,26 +15,54 @@ export const fetchNames = async ({ year, exam_type }) => {
   return res.data;
 };
 
-export const searchExams = async ({ year, exam_type, name }) => {
+export const searchExams = async ({ year, exam_type, name, limit, offset }) => {
   const res = await axiosClient.get("/exams/search", {
-    params: { year, exam_type, name },
+    params: { year, exam_type, name, limit, offset },
   });
-  return res.data;
+  // 総件数はレスポンスヘッダー（X-Total-Count）で返る
+  return { rows: res.data, total: Number(res.headers["x-total-count"] ?? res.data.length) };
+};
+
+// 総人数・次ページのカーソルはレスポンスヘッダー（X-Total-Count / X-Next-Cursor）で返る
+const toPage = (res) => ({
+  rows: res.data,
+  total: Number(res.headers["x-total-count"] ?? res.data.length),
+  nextCursor: res.headers["x-next-cursor"] || null,
+});
+
+export const fetchExamResults = async (examId, { limit, cursor } = {}) => {
+  const res = await axiosClient.get(`/exams/${examId}`, { params: { limit, cursor } });
+  return toPage(res);
 };
 
-export const fetchExamResults = async (examId) => {
-  const res = await axiosClient.get(`/exams/${examId}`);
+// 模試の集計（group_by: "all" | "school" | "grade"）。科目別の得点・偏差値分布と大学別の判定人数
+export const fetchExamStats = async (examId, { group_by, subject_code, university_id } = {}) => {
+  const res = await axiosClient.get(`/exams/${examId}/stats`, { params: { group_by, subject_code, university_id } });
   return res.data;
 };
 
+// 志望者数ランキング（前年度比付き）。集計した年度は X-Exam-Year ヘッダーで返る
+export const fetchUniversityRanking = async ({ year, exam_type, level, preference_max, limit } = {}) => {
+  const res = await axiosClient.get("/exams/universities/ranking", { params: { year, exam_type, level, preference_max, limit } });
+  return {
+    rows: res.data,
+    total: Number(res.headers["x-total-count"] ?? res.data.length),
+    year: res.headers["x-exam-year"] ? Number(res.headers["x-exam-year"]) : null,
+  };
+};
+
 export const fetchTopUniversities = async () => {
   const res = await axiosClient.get("/exams/universities/top");
   return res.data;
 };
 
-export const filterExamResults = async ({ exam_id, name, university, university_id, faculty, order_min, order_max, include_top_universities }) => {
+// 絞り込み結果のファイル出力URL（format: "csv" | "xlsx"）。ブラウザのダウンロードとしてストリーミングで受け取る
+export const getExamResultsExportUrl = (params, format) =>
+  axiosClient.getUri({ url: "/exams/filter", params: { ...params, limit: undefined, cursor: undefined, format } });
+
+export const filterExamResults = async ({ exam_id, name, university, university_id, faculty, order_min, order_max, include_top_universities, limit, cursor }) => {
   const res = await axiosClient.get("/exams/filter", {
-    params: { exam_id, name, university, university_id, faculty, order_min, order_max, include_top_universities },
+    params: { exam_id, name, university, university_id, faculty, order_min, order_max, include_top_universities, limit, cursor },
   });
-  return res.data;
+  return toPage(res);
 };
@@ -29,3 +29,37 @@ export const updateAcademicYear = async () => {
 };
 
 
+
+// バックグラウンドインポート: ジョブを登録してジョブIDを受け取る
+export const startImportJob = async (kind, file) => {
+  const fd = new FormData();
+  fd.append("file", file);
+  const res = await axiosClient.post(`/imports/jobs/${kind}`, fd, {
+    headers: { "Content-Type": "multipart/form-data" },
+  });
+  return res.data;
+};
+
+export const fetchImportJob = async (jobId) => {
+  const res = await axiosClient.get(`/imports/jobs/${jobId}`);
+  return res.data;
+};
+
+// ジョブが終了（succeeded/failed）するまでポーリングし、途中経過は onProgress に渡す
+// timeoutMs を過ぎても終了しない場合はエラーにする（ジョブ自体はサーバー側で続行・失敗扱いになる）
+export const waitForImportJob = async (jobId, onProgress, intervalMs = 1000, timeoutMs = 30 * 60 * 1000) => {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const job = await fetchImportJob(jobId);
+    if (job.status === "succeeded" || job.status === "failed") {
+      return job;
+    }
+    if (Date.now() >= deadline) {
+      throw new Error(
+        `インポートが ${Math.round(timeoutMs / 60000)} 分以内に終了しませんでした（ジョブID: ${jobId}、状態: ${job.status}）`
+      );
+    }
+    if (onProgress) onProgress(job);
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+};
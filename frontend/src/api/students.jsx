@@ -14,4 +14,15 @@ export const fetchStudents = async (keyword, statuses) => {
 export const fetchStudentDetail = async (studentId) => {
   const res = await axiosClient.get(`/students/${studentId}`);
   return res.data;
-};
\ No newline at end of file
+};
+
+// 複数生徒の詳細を一括取得（レスポンスは1行1名の NDJSON）
+// studentIds を指定しない場合は { status, grade, school_name } の条件で取得する
+export const fetchStudentDetails = async (studentIds, filters = {}) => {
+  const body = Array.isArray(studentIds) && studentIds.length > 0 ? { student_ids: studentIds } : filters;
+  const res = await axiosClient.post("/students/details", body, { responseType: "text" });
+  return res.data
+    .split("\n")
+    .filter((line) => line.trim() !== "")
+    .map((line) => JSON.parse(line));
+};
@@ -1,12 +1,20 @@
-import React, { useEffect, useState, useMemo } from "react";
+import React, { useEffect, useState, useMemo, useRef } from "react";
 import { useParams, Link } from "react-router-dom";
-import { fetchExamResults, filterExamResults, searchExams, fetchTopUniversities } from "../../api/exams";
+import { fetchExamResults, filterExamResults, searchExams, fetchTopUniversities, getExamResultsExportUrl } from "../../api/exams";
 import { Breadcrumb } from "@/components/layout/Breadcrumb";
 import { getJudgmentColor } from "../../utils/subject-utils";
 
+const PAGE_SIZE = 100;
+
 const ExamsDetail = () => {
   const { examId } = useParams();
   const [rows, setRows] = useState([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  // 現在の一覧（全件 or 絞り込み）の次ページ取得関数
+  const fetchPageRef = useRef(null);
+  // 現在の一覧の条件（ファイル出力に使用）
+  const exportParamsRef = useRef({});
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const [examName, setExamName] = useState("");
@@ -21,14 +29,25 @@ const ExamsDetail = () => {
   const [orderMax, setOrderMax] = useState("1");
   const [topUniversities, setTopUniversities] = useState([]);
 
+  const showFirstPage = async (fetchPage) => {
+    fetchPageRef.current = fetchPage;
+    const data = await fetchPage(undefined);
+    setRows(data.rows || []);
+    setTotal(data.total || 0);
+    setNextCursor(data.nextCursor);
+  };
+
+  const loadMore = async () => {
+    const data = await fetchPageRef.current(nextCursor);
+    setRows((prev) => [...prev, ...(data.rows || [])]);
+    setNextCursor(data.nextCursor);
+  };
+
   const load = async () => {
     try {
       setLoading(true);
-      const data = await fetchExamResults(examId);
-      // get_exam_results returns { exam_id, exam_year, exam_type, exam_name, num_students }? In current backend it returns formatted table.
-      // We expect an array of rows; if it's an object, keep it as single row list.
-      const list = Array.isArray(data) ? data : (data && data.rows ? data.rows : []);
-      setRows(list.length ? list : (Array.isArray(data) ? data : []));
+      exportParamsRef.current = { exam_id: examId };
+      await showFirstPage((cursor) => fetchExamResults(examId, { limit: PAGE_SIZE, cursor }));
     } catch (e) {
       setError("読み込みに失敗しました");
     } finally {
@@ -45,7 +64,7 @@ const ExamsDetail = () => {
     // 模試名と年度を取得
     const fetchExamInfo = async () => {
       try {
-        const exams = await searchExams({});
+        const { rows: exams } = await searchExams({});
         const exam = exams.find((e) => e.exam_id === Number(examId));
         if (exam) {
           setExamName(exam.exam_name);
@@ -77,7 +96,7 @@ const ExamsDetail = () => {
     try {
       const includeTopUniversities = universityId === "ALL";
       const normalizedUniversityId = includeTopUniversities ? "" : universityId;
-      const data = await filterExamResults({
+      const params = {
         exam_id: examId,
         name: name || undefined,
         university: (includeTopUniversities || normalizedUniversityId) ? undefined : (university || undefined), // �v���_�E���I�����̓e�L�X�g���͂𖳎�
@@ -86,14 +105,18 @@ const ExamsDetail = () => {
         order_min: orderMin || undefined,
         order_max: orderMax || undefined,
         include_top_universities: includeTopUniversities || undefined,
-      });
-      const list = Array.isArray(data) ? data : [];
-      setRows(list);
+      };
+      exportParamsRef.current = params;
+      await showFirstPage((cursor) => filterExamResults({ ...params, limit: PAGE_SIZE, cursor }));
     } finally {
       setLoading(false);
     }
   };
 
+  const exportResults = (format) => {
+    window.location.href = getExamResultsExportUrl(exportParamsRef.current, format);
+  };
+
   const handleUniversitySelectChange = (value) => {
     setUniversityId(value);
     // プルダウン選択時はテキスト入力をクリア
@@ -396,15 +419,31 @@ const ExamsDetail = () => {
             }}
           >
             <div
-              className="px-6 py-4"
+              className="px-6 py-4 flex items-center justify-between"
               style={{
                 backgroundColor: "#006580",
                 borderBottom: "1px solid #e5eef3"
               }}
             >
               <p className="text-sm font-medium text-white">
-                検索結果 {rows.length}件
+                検索結果 {total}件
               </p>
+              <div className="flex gap-2">
+                <button
+                  onClick={() => exportResults("csv")}
+                  className="px-3 py-1 rounded text-xs font-medium"
+                  style={{ backgroundColor: "#ffffff", color: "#006580" }}
+                >
+                  CSV出力
+                </button>
+                <button
+                  onClick={() => exportResults("xlsx")}
+                  className="px-3 py-1 rounded text-xs font-medium"
+                  style={{ backgroundColor: "#ffffff", color: "#006580" }}
+                >
+                  Excel出力
+                </button>
+              </div>
             </div>
             <div className="overflow-x-auto">
               <table className="w-full">
@@ -661,6 +700,17 @@ const ExamsDetail = () => {
                 </tbody>
               </table>
             </div>
+            {nextCursor && (
+              <div className="px-6 py-4 text-center">
+                <button
+                  onClick={loadMore}
+                  className="px-6 py-2 rounded-md text-sm font-medium transition hover:underline"
+                  style={{ color: "#1BA4C3" }}
+                >
+                  さらに表示（{rows.length} / {total}件）
+                </button>
+              </div>
+            )}
           </div>
         ) : (
           <div
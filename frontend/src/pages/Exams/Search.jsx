@@ -3,6 +3,9 @@ import { Link } from "react-router-dom";
 import { fetchYears, fetchTypes, fetchNames, searchExams } from "../../api/exams";
 import { Breadcrumb } from "@/components/layout/Breadcrumb";
 
+// 1回の検索で取得する件数
+const PAGE_SIZE = 100;
+
 const ExamsSearch = () => {
   const [years, setYears] = useState([]);
   const [types, setTypes] = useState([]);
@@ -13,6 +16,7 @@ const ExamsSearch = () => {
   const [name, setName] = useState("");
 
   const [rows, setRows] = useState([]);
+  const [total, setTotal] = useState(0);
 
   useEffect(() => {
     (async () => {
@@ -39,9 +43,24 @@ const ExamsSearch = () => {
     })();
   }, [examType, year]);
 
+  const fetchPage = (offset) =>
+    searchExams({
+      year: year || undefined,
+      exam_type: examType || undefined,
+      name: name || undefined,
+      limit: PAGE_SIZE,
+      offset,
+    });
+
   const doSearch = async () => {
-    const data = await searchExams({ year: year || undefined, exam_type: examType || undefined, name: name || undefined });
-    setRows(data || []);
+    const data = await fetchPage(0);
+    setRows(data.rows || []);
+    setTotal(data.total || 0);
+  };
+
+  const loadMore = async () => {
+    const data = await fetchPage(rows.length);
+    setRows((prev) => [...prev, ...(data.rows || [])]);
   };
 
   return (
@@ -269,6 +288,17 @@ const ExamsSearch = () => {
                   ))}
                 </tbody>
               </table>
+              {rows.length < total && (
+                <div className="px-6 py-4 text-center">
+                  <button
+                    onClick={loadMore}
+                    className="px-6 py-2 rounded-md text-sm font-medium transition hover:underline"
+                    style={{ color: "#1BA4C3" }}
+                  >
+                    さらに表示（{rows.length} / {total}件）
+                  </button>
+                </div>
+              )}
             </div>
           </div>
         )}
@@ -1,5 +1,5 @@
 import React, { useState } from "react";
-import { uploadExamsXlsx } from "../../api/imports";
+import { startImportJob, waitForImportJob } from "../../api/imports";
 import { Breadcrumb } from "@/components/layout/Breadcrumb";
 
 export default function ImportExams() {
@@ -11,8 +11,15 @@ export default function ImportExams() {
     if (!file) return;
     setBusy(true);
     try {
-      const res = await uploadExamsXlsx(file);
-      setLog(JSON.stringify(res, null, 2));
+      const job = await startImportJob("exams_xlsx", file);
+      const done = await waitForImportJob(job.job_id, (j) => {
+        setLog(`処理中... ${j.rows_processed}行\n` + JSON.stringify(j.progress || {}, null, 2));
+      });
+      if (done.status === "failed") {
+        setLog(done.error);
+      } else {
+        setLog(JSON.stringify({ ok: true, ...done.result }, null, 2));
+      }
     } catch (e) {
       // 重複エラーの場合は特別なメッセージを表示
       if (e?.response?.data?.error === "duplicate") {
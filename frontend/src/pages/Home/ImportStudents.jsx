@@ -1,5 +1,5 @@
 import React, { useState } from "react";
-import { uploadStudentsCsv } from "../../api/imports";
+import { startImportJob, waitForImportJob } from "../../api/imports";
 import { Breadcrumb } from "@/components/layout/Breadcrumb";
 
 export default function ImportStudents() {
@@ -11,8 +11,15 @@ export default function ImportStudents() {
     if (!file) return;
     setBusy(true);
     try {
-      const res = await uploadStudentsCsv(file);
-      setLog(JSON.stringify(res, null, 2));
+      const job = await startImportJob("students", file);
+      const done = await waitForImportJob(job.job_id, (j) => {
+        setLog(`処理中... ${j.rows_processed}行\n` + JSON.stringify(j.progress || {}, null, 2));
+      });
+      if (done.status === "failed") {
+        setLog(done.error);
+      } else {
+        setLog(JSON.stringify({ ok: true, ...done.result }, null, 2));
+      }
     } catch (e) {
       setLog(String(e));
     } finally {